@@ -7,7 +7,7 @@ cf_shield_fix.py
 1) bootstrap：用可視瀏覽器人工通過 Cloudflare，將 cookie 存成 storage state。
 2) test：帶著 storage state 開啟指定英雄頁，檢測是否仍被擋。
 
-整合方式：拿到可用的 storage state 後，把你的主程式的 new_context 改成使用 storage_state 路徑即可。
+整合方式：src/scrape_lolalytics.py 與 src/scrape_daemon.py 會以 --state（預設 data/cf_state.json）載入這份 storage state。
 
 用法：
   # 第一步：人工通過（會開視窗）
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+bench_set_index.py
+比較 pick_build 的逐列掃描路徑（use_index=False）與 SetIndex 路徑（use_index=True）：
+- 先確認兩者輸出（順序、rationale）完全一致；
+- 再各跑 --repeat 次，輸出平均耗時與加速比。
+
+用法：
+  python scripts/bench_set_index.py --winning data/processed/varus_aram_winning.csv --sets data/processed/varus_aram_sets.csv --topk 400 --cover 100
+  python scripts/bench_set_index.py --synthetic 5000 --items 200 --topk 5000 --cover 1e9
+"""
+import argparse, os, random, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.algo import load_winning_items, load_built_sets, pick_build
+from src.io_schema import WinningItem, BuiltSet
+
+
+def synthetic(n_sets: int, n_items: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = [f"item{i:03d}" for i in range(n_items)]
+    # 少數熱門裝備，讓共現與支撐度有意義
+    weights = [1.0 / (i + 1) for i in range(n_items)]
+    winning = [WinningItem(name=n, win_rate=rng.uniform(0.45, 0.6), pick_rate=rng.uniform(0.0, 0.5), sample_size=0) for n in names]
+    sets = []
+    for _ in range(n_sets):
+        items = []
+        while len(items) < 5:
+            it = rng.choices(names, weights=weights)[0]
+            if it not in items:
+                items.append(it)
+        sets.append(BuiltSet(items=items, set_win_rate=rng.uniform(30, 70),
+                             set_pick_rate=rng.uniform(0.01, 2.0), set_sample_size=rng.randint(2, 500)))
+    return winning, sets
+
+
+def _time(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--winning", default="data/processed/varus_aram_winning.csv")
+    ap.add_argument("--sets", default="data/processed/varus_aram_sets.csv")
+    ap.add_argument("--synthetic", type=int, default=0, help="以 N 筆隨機套裝取代 CSV 輸入")
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--topk", type=int, default=50)
+    ap.add_argument("--cover", type=float, default=0.80)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        winning, sets = synthetic(args.synthetic, args.items)
+    else:
+        winning, sets = load_winning_items(args.winning), load_built_sets(args.sets)
+
+    kw = dict(explain=True, topk=args.topk, cover=args.cover)
+    scan = pick_build(winning, sets, use_index=False, **kw)
+    indexed = pick_build(winning, sets, use_index=True, **kw)
+    same = repr(scan) == repr(indexed)
+    print(f"[check] identical={same} order={indexed.order} top_sets_used={indexed.rationale['top_sets_used']}")
+    if not same:
+        print("[error] list-scan and indexed outputs differ")
+        sys.exit(1)
+
+    t_scan = _time(lambda: pick_build(winning, sets, use_index=False, **kw), args.repeat)
+    t_idx = _time(lambda: pick_build(winning, sets, use_index=True, **kw), args.repeat)
+    print(f"[bench] list-scan {t_scan * 1e3:.3f} ms | indexed {t_idx * 1e3:.3f} ms | speedup x{t_scan / max(t_idx, 1e-12):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 param(
   [string]$Heroes = "varus",
-  [switch]$ShowBrowser
+  [switch]$ShowBrowser,
+  [switch]$Force   # 忽略 outputs/_build_manifest.json，全部重算
 )
 
 $heroes = $Heroes -split '[,\s]+' | Where-Object { $_ }
@@ -39,10 +40,12 @@ foreach ($h in $heroes) {
 
   if ($winRows -le 1 -or $setRows -le 1) { throw "empty csv for $h" }
 
-  & python -m src.main --winning $win --sets $set --out $json --explain --topk 50 --cover 0.8
+  # 輸入 CSV、參數與程式版本都沒變時，main / render_build 會直接略過
+  $forceArg = @(); if ($Force) { $forceArg = @("--force") }
+  & python -m src.main --winning $win --sets $set --out $json --explain --topk 50 --cover 0.8 @forceArg
   if ($LASTEXITCODE -ne 0) { throw "algo failed for $h" }
 
-  & python src/render_build.py --sets_csv $set --out_md $md --topk 50
+  & python src/render_build.py --sets_csv $set --out_md $md --topk 50 @forceArg
   if ($LASTEXITCODE -ne 0) { throw "render failed for $h" }
 }
 
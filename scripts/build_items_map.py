@@ -1,10 +1,26 @@
 # -*- coding: utf-8 -*-
-import argparse, os, csv, json, datetime, requests
+"""
+build_items_map.py
+由 Data Dragon 的 item.json 產出 items_map_{ver}.csv，最新版本另複製為 items_map.csv。
+
+- 線上：取最新版本（或 --version），下載的 JSON 另存到 {dump-dir}/{ver}/{lang}/item.json；
+- --offline：不連網，改讀 {dump-dir} 中已存的 JSON（也可指向測試 fixture）；--all-versions 重建全部已存版本，
+  供歷史回填一次建好，不必逐版本重抓。
+每個版本第一次建立時登記於 items_versions.json（first_seen），正規化依抓取日期對應版本時使用；
+最後編譯單版本與多版本查詢快照（見 src/item_index.py）。
+"""
+import argparse, os, csv, json, datetime, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.item_index import VERSIONS_REGISTRY, compile_snapshot, load_item_history, version_key, versioned_maps
+
 VERSIONS_URL = "https://ddragon.leagueoflegends.com/api/versions.json"
 DATA_URL = "https://ddragon.leagueoflegends.com/cdn/{ver}/data/{lang}/item.json"
+DEF_DUMP_DIR = "data/ref/ddragon"
+FIELDS = ["item_id", "en_name", "zh_tw_name", "tags", "ddragon_version"]
 
 
 def fetch_json(url):
+    import requests  # 只有線上模式需要
     r = requests.get(url, timeout=30)
     r.raise_for_status()
     return r.json()
@@ -15,21 +31,55 @@ def ensure_dir(p):
         os.makedirs(p, exist_ok=True)
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--lang", default="zh_TW")
-    ap.add_argument("--out", default="data/ref/items_map.csv")
-    args = ap.parse_args()
+def _now():
+    return datetime.datetime.now().astimezone().isoformat()
+
+
+def dump_path(dump_dir, ver, lang):
+    return os.path.join(dump_dir, ver, lang, "item.json")
 
-    versions = fetch_json(VERSIONS_URL)
-    ver = versions[0]
 
-    data_zh = fetch_json(DATA_URL.format(ver=ver, lang=args.lang))
-    data_en = fetch_json(DATA_URL.format(ver=ver, lang="en_US"))
+def save_dump(dump_dir, ver, lang, data):
+    p = dump_path(dump_dir, ver, lang)
+    ensure_dir(os.path.dirname(p))
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    meta = os.path.join(dump_dir, ver, "meta.json")
+    if not os.path.exists(meta):
+        with open(meta, "w", encoding="utf-8") as f:
+            json.dump({"first_seen": _now()}, f, ensure_ascii=False, indent=2)
 
+
+def load_dump(dump_dir, ver, lang):
+    with open(dump_path(dump_dir, ver, lang), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dumped_versions(dump_dir, lang):
+    """dump-dir 中同時有 {lang} 與 en_US 的版本，由舊到新。"""
+    if not os.path.isdir(dump_dir):
+        return []
+    vers = [v for v in os.listdir(dump_dir)
+            if os.path.exists(dump_path(dump_dir, v, lang)) and os.path.exists(dump_path(dump_dir, v, "en_US"))]
+    return sorted(vers, key=version_key)
+
+
+def dump_first_seen(dump_dir, ver, lang):
+    meta = os.path.join(dump_dir, ver, "meta.json")
+    try:
+        with open(meta, encoding="utf-8") as f:
+            seen = json.load(f).get("first_seen")
+        if seen:
+            return seen
+    except (OSError, ValueError):
+        pass
+    ts = os.path.getmtime(dump_path(dump_dir, ver, lang))
+    return datetime.datetime.fromtimestamp(ts).astimezone().isoformat()
+
+
+def build_rows(data_zh, data_en, ver):
     items_zh = data_zh.get("data", {})
     items_en = data_en.get("data", {})
-
     rows = []
     for item_id, meta_zh in items_zh.items():
         meta_en = items_en.get(item_id, {})
@@ -40,41 +90,108 @@ def main():
             "tags": ",".join(meta_en.get("tags", [])),
             "ddragon_version": ver,
         })
+    return sorted(rows, key=lambda x: x["item_id"])
 
-    out_dir = os.path.dirname(os.path.abspath(args.out))
-    ensure_dir(out_dir)
 
-    # 版本化輸出：items_map_{ver}.csv + 最新副本 items_map.csv
+def write_versioned(rows, out_dir, ver):
     versioned = os.path.join(out_dir, f"items_map_{ver}.csv")
     with open(versioned, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["item_id","en_name","zh_tw_name","tags","ddragon_version"])
+        w = csv.DictWriter(f, fieldnames=FIELDS)
         w.writeheader()
-        for r in sorted(rows, key=lambda x: x["item_id"]):
+        for r in rows:
             w.writerow(r)
+    return versioned
+
+
+def register_version(out_dir, ver, first_seen, row_count):
+    """items_versions.json：已登記的版本保留原本的 first_seen。"""
+    path = os.path.join(out_dir, VERSIONS_REGISTRY)
+    reg = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            reg = json.load(f)
+    rec = reg.setdefault(ver, {"first_seen": first_seen})
+    rec["row_count"] = row_count
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(reg.items(), key=lambda kv: version_key(kv[0]))), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
 
-    # 複製一份為 items_map.csv（避免 Windows 權限問題不用 symlink）
-    with open(versioned, "r", encoding="utf-8") as src, open(args.out, "w", encoding="utf-8") as dst:
-        dst.write(src.read())
-
-    # 寫入中繼資料
-    meta_path = os.path.join(out_dir, "items_map_meta.json")
-    meta = {
-        "ddragon_version": ver,
-        "generated_at": datetime.datetime.now().astimezone().isoformat(),
-        "row_count": len(rows),
-        "source": {
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lang", default="zh_TW")
+    ap.add_argument("--out", default="data/ref/items_map.csv")
+    ap.add_argument("--dump-dir", default=DEF_DUMP_DIR, help="item.json 存放處：{dump-dir}/{ver}/{lang}/item.json")
+    ap.add_argument("--offline", action="store_true", help="不連網，只用 --dump-dir 已存的 JSON")
+    ap.add_argument("--version", default=None, help="指定 ddragon 版本（預設最新）")
+    ap.add_argument("--all-versions", action="store_true", help="--offline 時重建 dump-dir 中全部版本")
+    args = ap.parse_args()
+
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    ensure_dir(out_dir)
+
+    if args.offline:
+        available = dumped_versions(args.dump_dir, args.lang)
+        if not available:
+            raise SystemExit(f"[error] no item.json dumps under {args.dump_dir}")
+        if args.all_versions:
+            targets = available
+        elif args.version:
+            if args.version not in available:
+                raise SystemExit(f"[error] version {args.version} not dumped under {args.dump_dir}")
+            targets = [args.version]
+        else:
+            targets = available[-1:]
+        sources = {v: {"dump": os.path.join(args.dump_dir, v)} for v in targets}
+    else:
+        ver = args.version or fetch_json(VERSIONS_URL)[0]
+        for lang in dict.fromkeys([args.lang, "en_US"]):
+            save_dump(args.dump_dir, ver, lang, fetch_json(DATA_URL.format(ver=ver, lang=lang)))
+        targets = [ver]
+        sources = {ver: {
             "versions": VERSIONS_URL,
             "item_zh": DATA_URL.format(ver=ver, lang=args.lang),
             "item_en": DATA_URL.format(ver=ver, lang="en_US"),
-        },
-    }
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-
-    print(f"Wrote: {versioned}")
-    print(f"Wrote: {args.out}")
-    print(f"Wrote: {meta_path}")
+        }}
+
+    row_counts = {}
+    for ver in targets:
+        rows = build_rows(load_dump(args.dump_dir, ver, args.lang), load_dump(args.dump_dir, ver, "en_US"), ver)
+        versioned = write_versioned(rows, out_dir, ver)
+        register_version(out_dir, ver, dump_first_seen(args.dump_dir, ver, args.lang), len(rows))
+        row_counts[ver] = len(rows)
+        print(f"Wrote: {versioned}")
+
+    # 只有最新版本才複製為 items_map.csv（回填舊版本不覆蓋目前的對照表）
+    latest = list(versioned_maps(out_dir))[-1]
+    if latest in targets:
+        versioned = os.path.join(out_dir, f"items_map_{latest}.csv")
+        # 複製一份為 items_map.csv（避免 Windows 權限問題不用 symlink）
+        with open(versioned, "r", encoding="utf-8") as src, open(args.out, "w", encoding="utf-8") as dst:
+            dst.write(src.read())
+
+        # 寫入中繼資料
+        meta_path = os.path.join(out_dir, "items_map_meta.json")
+        meta = {
+            "ddragon_version": latest,
+            "generated_at": _now(),
+            "row_count": row_counts[latest],
+            "source": sources[latest],
+        }
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        print(f"Wrote: {args.out}")
+        print(f"Wrote: {meta_path}")
+
+    # 預先編譯查詢快照：單版本 items_index_{ver}.pkl 與多版本 items_history.pkl
+    aliases = os.path.join(out_dir, "item_aliases.csv")
+    if os.path.exists(args.out):
+        snap, _ = compile_snapshot(args.out, aliases)
+        print(f"Wrote: {snap}")
+    hist = load_item_history(out_dir, aliases)
+    print(f"[ok] item history: versions={len(hist.versions)} ({', '.join(hist.versions)})")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
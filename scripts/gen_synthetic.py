@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+gen_synthetic.py
+產生與抓取器輸出同格式的合成 winning / sets CSV，供 benchmark 與壓力測試：
+- 裝備熱門度呈 1/rank 分布（少數熱門裝備，共現與支撐度才有意義）；
+- 每套 5 件不重複，以 Gumbel top-k 一次向量化抽樣；
+- 檔名沿用 {hero}_{mode}_{tier}_{patch}d_{winning|sets}.csv，可直接餵給 pipeline / normalize。
+
+用法：
+  python scripts/gen_synthetic.py --out-dir data/synthetic --champions 170 --sets 5000 --items 200
+"""
+from __future__ import annotations
+import argparse, os
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+IMG_URL = "https://cdn5.lolalytics.com/item64/{id}.webp"
+BASE_ID = 3000
+
+
+def item_names(n_items: int) -> List[str]:
+    return [f"item{i:03d}" for i in range(n_items)]
+
+
+def synthetic_frames(n_sets: int, n_items: int = 200, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """回傳 (winning_df, sets_df)，欄位同 scrape_lolalytics 的輸出。"""
+    rng = np.random.default_rng(seed)
+    names = np.array(item_names(n_items), dtype=object)
+    imgs = np.array([IMG_URL.format(id=BASE_ID + i) for i in range(n_items)], dtype=object)
+    logw = -np.log(np.arange(1, n_items + 1))
+    # Gumbel top-k：每列取 5 個不重複、依權重抽樣的裝備
+    keys = logw + rng.gumbel(size=(n_sets, n_items))
+    picks = np.argpartition(-keys, 5, axis=1)[:, :5]
+    sets_df = pd.DataFrame({
+        "items": ["|".join(r) for r in names[picks].tolist()],
+        "items_img": ["|".join(r) for r in imgs[picks].tolist()],
+        "set_win_rate": rng.uniform(30, 70, n_sets).round(2),
+        "set_pick_rate": rng.uniform(0.01, 2.0, n_sets).round(2),
+        "set_sample_size": rng.integers(2, 500, n_sets),
+    })
+    win_df = pd.DataFrame({
+        "img": imgs,
+        "name": names,
+        "win_rate": rng.uniform(0.45, 0.6, n_items).round(4),
+        "pick_rate": rng.uniform(0.0, 0.5, n_items).round(4),
+        "sample_size": rng.integers(0, 5000, n_items),
+    })
+    return win_df, sets_df
+
+
+def write_roster(out_dir: str, n_champions: int, n_sets: int, n_items: int = 200, *,
+                 mode: str = "aram", tier: str = "d2_plus", patch: str = "7", seed: int = 0) -> List[str]:
+    """寫出 n_champions 名英雄的 CSV；回傳各英雄名稱（champ000…）。"""
+    os.makedirs(out_dir, exist_ok=True)
+    heroes = []
+    for k in range(n_champions):
+        hero = f"champ{k:03d}"
+        win_df, sets_df = synthetic_frames(n_sets, n_items, seed + k)
+        stem = os.path.join(out_dir, f"{hero}_{mode}_{tier}_{patch}d")
+        win_df.to_csv(stem + "_winning.csv", index=False, encoding="utf-8")
+        sets_df.to_csv(stem + "_sets.csv", index=False, encoding="utf-8")
+        heroes.append(hero)
+    return heroes
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out-dir", default="data/synthetic")
+    ap.add_argument("--champions", type=int, default=170)
+    ap.add_argument("--sets", type=int, default=5000, help="每名英雄的套裝數")
+    ap.add_argument("--items", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    heroes = write_roster(args.out_dir, args.champions, args.sets, args.items, seed=args.seed)
+    print(f"[ok] {len(heroes)} champion(s) x {args.sets} sets -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+loadtest_build_service.py
+對 src.build_service 發送大量 /build 查詢，回報延遲百分位數（p50 / p90 / p99 / max）與吞吐量。
+- concurrency 個 keep-alive 連線同時送出請求；
+- 查詢依序輪流各英雄與 --topk 值，第一輪為冷查詢（未命中快取），之後多為快取命中；
+- 分別列出 cached / computed 的延遲，確認命中路徑的成本。
+
+用法：
+  python -m src.build_service --data-dir data/processed &
+  python scripts/loadtest_build_service.py --url http://127.0.0.1:8770 --requests 2000 --concurrency 16
+"""
+from __future__ import annotations
+import argparse, asyncio, json, time
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+
+class Conn:
+    """最小的 HTTP/1.1 keep-alive 用戶端（只處理 Content-Length 回應）。"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, target: str) -> Tuple[int, Dict]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode("latin-1"))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, keep = 0, True
+        while True:
+            h = await self.reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            if k.strip().lower() == "content-length":
+                length = int(v)
+            elif k.strip().lower() == "connection" and v.strip().lower() == "close":
+                keep = False
+        body = json.loads(await self.reader.readexactly(length)) if length else {}
+        if not keep:
+            await self.close()
+        return status, body
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return float("nan")
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+def summarize(name: str, xs: List[float]) -> str:
+    return (f"{name:<9} n={len(xs):<6} p50={pct(xs, 50):.2f}ms p90={pct(xs, 90):.2f}ms "
+            f"p99={pct(xs, 99):.2f}ms max={max(xs) if xs else float('nan'):.2f}ms")
+
+
+async def run(url: str, n: int, concurrency: int, topks: List[int], cover: float) -> Dict:
+    u = urlsplit(url)
+    host, port = u.hostname or "127.0.0.1", u.port or 80
+    probe = Conn(host, port)
+    status, body = await probe.get("/champions")
+    await probe.close()
+    champs = body.get("champions", []) if status == 200 else []
+    if not champs:
+        raise SystemExit(f"[error] no champions served by {url}")
+    queries = [urlencode({**c, "topk": k, "cover": cover}) for k in topks for c in champs]
+
+    lat: Dict[str, List[float]] = {"all": [], "cached": [], "computed": []}
+    errors: Dict[int, int] = {}
+    counter = iter(range(n))
+
+    async def worker():
+        conn = Conn(host, port)
+        try:
+            for i in counter:
+                t0 = time.perf_counter()
+                status, body = await conn.get("/build?" + queries[i % len(queries)])
+                ms = (time.perf_counter() - t0) * 1e3
+                if status != 200:
+                    errors[status] = errors.get(status, 0) + 1
+                    continue
+                lat["all"].append(ms)
+                lat["cached" if body.get("cached") else "computed"].append(ms)
+        finally:
+            await conn.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    elapsed = time.perf_counter() - t0
+    return {"lat": lat, "errors": errors, "elapsed_s": elapsed, "queries": len(queries)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8770")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--topk", type=int, nargs="+", default=[50], help="輪流查詢的 topk 值（增加不同的快取 key）")
+    ap.add_argument("--cover", type=float, default=0.80)
+    args = ap.parse_args()
+
+    res = asyncio.run(run(args.url, args.requests, args.concurrency, args.topk, args.cover))
+    lat = res["lat"]
+    for name in ("all", "cached", "computed"):
+        if lat[name]:
+            print(f"[info] {summarize(name, lat[name])}")
+    rps = len(lat["all"]) / res["elapsed_s"] if res["elapsed_s"] else 0.0
+    print(f"[ok] {len(lat['all'])} ok / {sum(res['errors'].values())} error(s) over {res['queries']} distinct queries "
+          f"in {res['elapsed_s']:.2f}s ({rps:.0f} req/s)")
+    if res["errors"]:
+        print(f"[warn] status counts: {res['errors']}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-import argparse, os, re
+import argparse, os, re, sys
 import pandas as pd
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.item_index import DEF_ALIASES, DEF_ITEMS_MAP, load_item_index
 
 def ensure_dir(p): os.makedirs(p, exist_ok=True)
 
@@ -22,23 +24,6 @@ def _slug(s):
     s = re.sub(r"[^a-z0-9]+","-", s).strip("-")
     return s
 
-def _load_items_map(path):
-    m = pd.read_csv(path, dtype={"item_id":int, "en_name":str, "zh_tw_name":str})
-    # 建立反查
-    m["key_en"] = m["en_name"].str.lower()
-    return m
-
-def _find_item(row_name, items_map):
-    """row_name 可能是數字ID或英文名"""
-    s = _norm_str(row_name)
-    if s is None: return None
-    if s.isdigit():
-        hit = items_map[items_map["item_id"]==int(s)]
-        return hit.iloc[0] if len(hit) else None
-    key = s.lower()
-    hit = items_map[items_map["key_en"]==key]
-    return hit.iloc[0] if len(hit) else None
-
 def _split_set(x):
     # 支援 "item1..item5" 欄位，或單欄位用逗號/空白/| 分隔
     if isinstance(x, (list, tuple)): return list(x)[:5]
@@ -47,7 +32,7 @@ def _split_set(x):
     parts = re.split(r"[,\|\s]+", s)
     return [p for p in parts if p][:5]
 
-def normalize_sets(df, items_map):
+def normalize_sets(df, find):
     # 可能欄位別名
     champ_col = next((c for c in df.columns if c.lower() in ["champion","champ","character"]), None)
     games_col = next((c for c in df.columns if c.lower() in ["games","matches","count"]), None)
@@ -75,13 +60,11 @@ def normalize_sets(df, items_map):
         # 映射
         item_ids, item_en, item_zh = [], [], []
         for it in raw_items[:5]:
-            hit = _find_item(it, items_map)
+            hit = find(it)
             if hit is None:
                 item_ids.append(None); item_en.append(_norm_str(it)); item_zh.append(None)
             else:
-                item_ids.append(int(hit["item_id"]))
-                item_en.append(hit["en_name"])
-                item_zh.append(hit["zh_tw_name"])
+                item_ids.append(hit[0]); item_en.append(hit[1]); item_zh.append(hit[2])
 
         out_rows.append({
             "champion": champ,
@@ -107,7 +90,7 @@ def normalize_sets(df, items_map):
         })
     return pd.DataFrame(out_rows)
 
-def normalize_winning(df, items_map):
+def normalize_winning(df, find):
     item_col = next((c for c in df.columns if c.lower() in ["item","item_name","name"]), None)
     games_col = next((c for c in df.columns if c.lower() in ["games","matches","count"]), None)
     win_col   = next((c for c in df.columns if c.lower() in ["winrate","win%","win_rate","wr"]), None)
@@ -119,12 +102,12 @@ def normalize_winning(df, items_map):
         games = int(r.get(games_col, 0) or 0) if games_col else None
         winrt = _norm_rate(r.get(win_col)) if win_col else None
         pickr = _norm_rate(r.get(pick_col)) if pick_col else None
-        hit = _find_item(item_raw, items_map)
+        hit = find(item_raw)
 
         out_rows.append({
-            "item_id": int(hit["item_id"]) if hit is not None else None,
-            "item_en": hit["en_name"] if hit is not None else _norm_str(item_raw),
-            "item_zh": hit["zh_tw_name"] if hit is not None else None,
+            "item_id": hit[0] if hit is not None else None,
+            "item_en": hit[1] if hit is not None else _norm_str(item_raw),
+            "item_zh": hit[2] if hit is not None else None,
             "games": games,
             "winrate": winrt,
             "pickrate": pickr
@@ -135,17 +118,21 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--sets", default="data/raw/sets.csv")
     ap.add_argument("--winning", default="data/raw/winning.csv")
-    ap.add_argument("--items-map", default="data/ref/items_map.csv")
+    ap.add_argument("--items-map", default=DEF_ITEMS_MAP)
+    ap.add_argument("--item-aliases", default=DEF_ALIASES)
+    ap.add_argument("--resolve-aliases", action="store_true",
+                    help="另以中文名、別名與去符號比對解析裝備（預設只認 ID 與英文名，輸出同舊版）")
     ap.add_argument("--out-dir", default="data/processed")
     args = ap.parse_args()
 
-    items_map = _load_items_map(args.items_map)
+    idx = load_item_index(args.items_map, args.item_aliases)
+    find = idx.find if args.resolve_aliases else idx.find_en
 
     df_sets = pd.read_csv(args.sets)
     df_win  = pd.read_csv(args.winning)
 
-    out_sets = normalize_sets(df_sets, items_map)
-    out_win  = normalize_winning(df_win, items_map)
+    out_sets = normalize_sets(df_sets, find)
+    out_win  = normalize_winning(df_win, find)
 
     ensure_dir(args.out_dir)
     out_sets.to_csv(os.path.join(args.out_dir, "sets_normalized.csv"), index=False, encoding="utf-8")
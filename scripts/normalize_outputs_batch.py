@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
 """
-normalize_outputs_batch.py — v6.6
+normalize_outputs_batch.py — v7.0
 變更：
+- --items-version auto|<patch>：每個檔案依抓取時間（帳本或 mtime）或指定 patch 對應 items_map 版本（多版本區間索引）；預設 current 與舊版相同。
+- --workers N：依英雄分派到 process pool，各 worker 寫自己的英雄輸出與 parquet 分區；彙整檔與稽核檔依英雄順序串流 append，不再全部留在記憶體後 concat。輸出與逐一處理相同。
+- 裝備查表改用 src.item_index 的共用解析器與預先編譯快照（data/ref/items_index_{ver}.pkl），不再每次 iterrows 建表。
+- 正規化與稽核改為欄位運算（不再逐列 iterrows）；裝備 token 依唯一值查表一次。輸出檔與 v6.6 逐位元組相同。
 - 移除所有 winrate/pickrate 的 0~1 縮放。字串去掉 % 後，直接轉成浮點數，允許 >1。
 - 保留 v6.5 的稽核與欄位輸出；_audit_winning_not_in_sets.csv 維持輸出。
 """
 from __future__ import annotations
-import argparse, os, re, glob, json, datetime, csv
-from typing import Optional, Tuple
+import argparse, os, re, glob, json, datetime, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from pathlib import Path
-
-ItemT = tuple[int, str, str | None]
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.columnar import FORMATS, DEF_FORMAT, HAVE_ARROW, write_dataset
+from src.item_index import ItemIndex, DEF_ALIASES, DEF_ITEMS_MAP, load_item_history, load_item_index, read_items_map_version
+from src.scrape_ledger import JobLedger, LEDGER_PATH
 
 ITEM_COL_RE = re.compile(r"item[1-5]$", re.IGNORECASE)
 FNAME_RE = re.compile(r"^(?P<champ>[^_]+)_(?P<middle>.+?)_(?P<window>\d+d)_(?P<kind>sets|winning)\.csv$", re.IGNORECASE)
@@ -31,33 +40,6 @@ def ensure_dir(p: str):
         os.makedirs(p, exist_ok=True)
 
 
-def _to_float(v):
-    """去除 % 與逗號，保留原始數值（不除以 100）。"""
-    if v is None or (isinstance(v, float) and pd.isna(v)):
-        return None
-    if isinstance(v, (int, float)):
-        return float(v)
-    try:
-        s = str(v).strip().replace('%','').replace(',','')
-        return float(s) if s != '' else None
-    except Exception:
-        return None
-
-
-def _to_int(v):
-    if v is None or pd.isna(v):
-        return None
-    if isinstance(v, int):
-        return v
-    s = str(v).strip().replace(',','').replace(' ','')
-    if not s:
-        return None
-    try:
-        return int(float(s))
-    except ValueError:
-        return None
-
-
 def _norm_str(s):
     return None if pd.isna(s) else str(s).strip()
 
@@ -68,10 +50,6 @@ def _slug(s):
     return re.sub(r"[^a-z0-9]+","-", s).strip("-")
 
 
-def _norm_key(s: str):
-    return re.sub(r"[^a-z0-9\u4e00-\u9fff]+", "", s.lower())
-
-
 def _col(df: pd.DataFrame, keys: set):
     lower_map = {c.lower(): c for c in df.columns}
     for k in keys:
@@ -83,15 +61,6 @@ def _col(df: pd.DataFrame, keys: set):
     return None
 
 
-def split_set(x):
-    if isinstance(x, (list, tuple)):
-        return list(x)[:5]
-    if pd.isna(x):
-        return []
-    parts = re.split(r"[,\|\s]+", str(x))
-    return [p for p in parts if p][:5]
-
-
 def parse_meta_from_name(name: str):
     m = FNAME_RE.match(name)
     if not m:
@@ -101,94 +70,94 @@ def parse_meta_from_name(name: str):
     return {"champion": d["champ"], "window": d["window"], "kind": d["kind"].lower(), "tag": tag, "mode": mode, "tier": tier}
 
 
-# 物品索引（O(1) 查詢）＋別名
-class ItemIndex:
-    def __init__(self, df: pd.DataFrame, alias_csv: str | None):
-        self.by_id: dict[int, ItemT] = {}
-        self.key_en: dict[str, ItemT] = {}
-        self.key_zh: dict[str, ItemT] = {}
-        self.norm_en: dict[str, ItemT] = {}
-        self.norm_zh: dict[str, ItemT] = {}
-        for _, r in df.iterrows():
-            tup: ItemT = (int(r["item_id"]), r["en_name"], r.get("zh_tw_name"))
-            self.by_id[int(r["item_id"])] = tup
-            if isinstance(r["en_name"], str):
-                k = r["en_name"].lower(); self.key_en[k] = tup; self.norm_en[_norm_key(k)] = tup
-            if isinstance(r.get("zh_tw_name"), str):
-                z = r["zh_tw_name"].lower(); self.key_zh[z] = tup; self.norm_zh[_norm_key(z)] = tup
-        self.alias: dict[str, ItemT | None] = {}
-        if alias_csv and os.path.exists(alias_csv):
-            with open(alias_csv, newline='', encoding='utf-8') as f:
-                for row in csv.DictReader(f):
-                    zh = (row.get('alias_zh') or '').strip(); en = (row.get('alias_en') or '').strip().lower(); iid = (row.get('item_id') or '').strip()
-                    key = _norm_key(zh) if zh else None
-                    tgt: Optional[ItemT] = None
-                    if iid.isdigit():
-                        tgt = self.by_id.get(int(iid))
-                    if tgt is None and en:
-                        tgt = self.key_en.get(en) or self.norm_en.get(_norm_key(en))
-                    if key:
-                        self.alias[key] = tgt
-
-    def find(self, token) -> Optional[ItemT]:
-        s = _norm_str(token)
-        if s is None:
-            return None
-        if s.isdigit():
-            return self.by_id.get(int(s))
-        norm = _norm_key(s); low = s.lower()
-        return (self.alias.get(norm) or self.key_en.get(low) or self.key_zh.get(low)
-                or self.norm_en.get(norm) or self.norm_zh.get(norm))
-
-
-def load_items_map(path: str) -> pd.DataFrame:
-    return pd.read_csv(path, dtype={"item_id": int, "en_name": str, "zh_tw_name": str})
-
-
-def read_items_map_version(items_map_path: str) -> str:
-    meta_path = os.path.join(os.path.dirname(os.path.abspath(items_map_path)), "items_map_meta.json")
-    if os.path.exists(meta_path):
-        try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                return json.load(f).get("ddragon_version") or ""
-        except Exception:
-            pass
-    m = re.search(r"items_map_([0-9.]+)\.csv$", items_map_path)
-    return m.group(1) if m else ""
-
-
 def _item_index(col_name: str) -> int:
     m = re.search(r"(\d+)$", str(col_name))
     return int(m.group(1)) if m else 999
 
 
+def _to_float_col(s: pd.Series) -> pd.Series:
+    """去除 % 與逗號，保留原始數值（不除以 100）；數值欄直接轉 float。"""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+    t = s.astype(str).str.strip().str.replace("%", "", regex=False).str.replace(",", "", regex=False)
+    return pd.to_numeric(t, errors="coerce").where(s.notna())
+
+
+def _to_int_col(s: pd.Series) -> pd.Series:
+    """去掉逗號與空白後轉數字，小數無條件捨去（同 int(float(x))）。"""
+    if pd.api.types.is_numeric_dtype(s):
+        v = s.astype(float)
+    else:
+        t = s.astype(str).str.strip().str.replace(",", "", regex=False).str.replace(" ", "", regex=False)
+        v = pd.to_numeric(t, errors="coerce").where(s.notna())
+    return pd.Series(np.trunc(v.to_numpy(dtype=float)), index=s.index)
+
+
+def _norm_str_col(s: pd.Series) -> pd.Series:
+    return s.astype(str).str.strip().astype(object).where(s.notna(), None)
+
+
+def _slug_col(s: pd.Series) -> pd.Series:
+    return (s.fillna("").astype(str).str.lower()
+            .str.replace(r"[^a-z0-9]+", "-", regex=True).str.strip("-"))
+
+
+def _lookup_col(tokens: pd.Series, idx: ItemIndex) -> tuple[pd.Series, pd.Series, pd.Series]:
+    """對欄位的唯一值各查一次 ItemIndex，再依 factorize 代碼展開回每列。
+
+    回傳 (item_id, item_en, item_zh)；未命中時 item_en 為原字串（_norm_str），其餘為 None。
+    """
+    codes, uniques = pd.factorize(tokens, use_na_sentinel=True)
+    table = []
+    for tok in uniques:
+        hit = idx.find(tok)
+        table.append(hit if hit is not None else (None, _norm_str(tok), None))
+    table.append((None, None, None))  # 代碼 -1（NaN）
+    arr = np.empty((len(table), 3), dtype=object)
+    for i, t in enumerate(table):
+        arr[i, 0], arr[i, 1], arr[i, 2] = t
+    picked = arr[codes]
+    return (pd.Series(picked[:, 0], index=tokens.index, dtype=object),
+            pd.Series(picked[:, 1], index=tokens.index, dtype=object),
+            pd.Series(picked[:, 2], index=tokens.index, dtype=object))
+
+
+def _split_set_col(s: pd.Series) -> pd.DataFrame:
+    """以 , | 空白切分套裝字串，去掉空字串後取前 5 件；回傳 5 欄 token（不足補 NaN）。"""
+    parts = s.astype(str).where(s.notna(), "").str.split(r"[,\|\s]+", regex=True).explode()
+    parts = parts[parts.notna() & (parts != "")]
+    pos = parts.groupby(level=0).cumcount()
+    parts, pos = parts[pos < 5], pos[pos < 5]
+    wide = pd.DataFrame({"tok": parts.values, "pos": pos.values, "row": parts.index}).pivot(index="row", columns="pos", values="tok")
+    return wide.reindex(index=s.index, columns=range(5))
+
+
 def normalize_sets(df: pd.DataFrame, idx: ItemIndex) -> tuple[pd.DataFrame, dict]:
     champ_col = _col(df, CHAMP_KEYS); games_col = _col(df, GAMES_KEYS)
     win_col = _col(df, WIN_KEYS); pick_col = _col(df, PICK_KEYS)
     item_cols = [c for c in df.columns if ITEM_COL_RE.fullmatch(c)]; set_col = _col(df, SET_KEYS)
-    rows = []
-    for _, r in df.iterrows():
-        champ = _norm_str(r.get(champ_col, "")) if champ_col else ""
-        games = _to_int(r.get(games_col)) if games_col else None
-        winrt = _to_float(r.get(win_col)) if win_col else None
-        pickr = _to_float(r.get(pick_col)) if pick_col else None
-        raw_items = [r.get(ic) for ic in sorted(item_cols, key=_item_index)] if item_cols else (split_set(r.get(set_col)) if set_col else [])
-        item_ids, item_en, item_zh = [], [], []
-        for it in raw_items[:5]:
-            hit = idx.find(it)
-            if hit is None:
-                item_ids.append(None); item_en.append(_norm_str(it)); item_zh.append(None)
-            else:
-                item_ids.append(hit[0]); item_en.append(hit[1]); item_zh.append(hit[2])
-        while len(item_ids) < 5:
-            item_ids.append(None); item_en.append(None); item_zh.append(None)
-        rows.append({
-            "champion": champ, "champion_slug": _slug(champ), "games": games, "winrate": winrt, "pickrate": pickr,
-            "item_id1": item_ids[0], "item_id2": item_ids[1], "item_id3": item_ids[2], "item_id4": item_ids[3], "item_id5": item_ids[4],
-            "item_en1": item_en[0],  "item_en2": item_en[1],  "item_en3": item_en[2],  "item_en4": item_en[3],  "item_en5": item_en[4],
-            "item_zh1": item_zh[0],  "item_zh2": item_zh[1],  "item_zh3": item_zh[2],  "item_zh4": item_zh[3],  "item_zh5": item_zh[4],
-        })
-    out = pd.DataFrame(rows)
+    n = len(df)
+    none = pd.Series([None] * n, index=df.index, dtype=object)
+    data: dict[str, pd.Series] = {}
+    if n:
+        champ = _norm_str_col(df[champ_col]) if champ_col else pd.Series([""] * n, index=df.index, dtype=object)
+        data["champion"] = champ
+        data["champion_slug"] = _slug_col(champ)
+        data["games"] = _to_int_col(df[games_col]) if games_col else none
+        data["winrate"] = _to_float_col(df[win_col]) if win_col else none
+        data["pickrate"] = _to_float_col(df[pick_col]) if pick_col else none
+        if item_cols:
+            tokens = [df[c] for c in sorted(item_cols, key=_item_index)][:5]
+        elif set_col:
+            wide = _split_set_col(df[set_col])
+            tokens = [wide[i] for i in range(5)]
+        else:
+            tokens = []
+        looked = [_lookup_col(t, idx) for t in tokens]
+        for i in range(5):
+            ids, en, zh = looked[i] if i < len(looked) else (none, none, none)
+            data[f"item_id{i+1}"], data[f"item_en{i+1}"], data[f"item_zh{i+1}"] = ids, en, zh
+    out = pd.DataFrame(data)
     cols = [
         "source_file","window","source_tag","source_mode","source_tier","source_champion",
         "champion","champion_slug","games","winrate","pickrate",
@@ -199,7 +168,7 @@ def normalize_sets(df: pd.DataFrame, idx: ItemIndex) -> tuple[pd.DataFrame, dict
     for c in cols:
         if c not in out.columns:
             out[c] = None
-    out = out[cols]
+    out = out[cols].reset_index(drop=True)
     for c in ["games","item_id1","item_id2","item_id3","item_id4","item_id5"]:
         out[c] = pd.to_numeric(out[c], errors="coerce").astype("Int64")
     flags = {"has_winrate": win_col is not None, "has_pickrate": pick_col is not None}
@@ -209,52 +178,260 @@ def normalize_sets(df: pd.DataFrame, idx: ItemIndex) -> tuple[pd.DataFrame, dict
 def normalize_winning(df: pd.DataFrame, idx: ItemIndex) -> tuple[pd.DataFrame, dict]:
     item_col = _col(df, ITEM_KEYS); games_col = _col(df, GAMES_KEYS)
     win_col = _col(df, WIN_KEYS); pick_col = _col(df, PICK_KEYS); img_col = _col(df, IMG_KEYS)
-    rows = []
-    for _, r in df.iterrows():
-        item_raw = r.get(item_col); games = _to_int(r.get(games_col)) if games_col else None
-        winrt = _to_float(r.get(win_col)) if win_col else None
-        pickr = _to_float(r.get(pick_col)) if pick_col else None
-        hit = idx.find(item_raw)
-        if not hit and img_col:
-            tok = r.get(img_col)
-            try:
-                m = re.search(r"/(\d+)\\.webp$", str(tok))
-                iid = int(m.group(1)) if m else None
-            except Exception:
-                iid = None
-            if iid is not None:
-                hit = idx.by_id.get(iid)
-        rows.append({
-            "item_id": hit[0] if hit else None,
-            "item_en": hit[1] if hit else _norm_str(item_raw),
-            "item_zh": hit[2] if hit else None,
-            "games": games, "winrate": winrt, "pickrate": pickr,
-        })
-    out = pd.DataFrame(rows)
+    n = len(df)
+    none = pd.Series([None] * n, index=df.index, dtype=object)
+    data: dict[str, pd.Series] = {}
+    if n:
+        ids, en, zh = _lookup_col(df[item_col] if item_col else none, idx)
+        if img_col:
+            # 名稱查不到時，改由圖片 URL 的數字 id 反查
+            miss = ids.isna()
+            iid = pd.to_numeric(df[img_col].astype(str).str.extract(r"/(\d+)\\.webp$")[0], errors="coerce")
+            by_img = iid[miss & iid.notna()].map(lambda v: idx.by_id.get(int(v)))
+            by_img = by_img[by_img.notna()]
+            if len(by_img):
+                ids.loc[by_img.index] = [t[0] for t in by_img]
+                en.loc[by_img.index] = [t[1] for t in by_img]
+                zh.loc[by_img.index] = [t[2] for t in by_img]
+        data = {
+            "item_id": ids, "item_en": en, "item_zh": zh,
+            "games": _to_int_col(df[games_col]) if games_col else none,
+            "winrate": _to_float_col(df[win_col]) if win_col else none,
+            "pickrate": _to_float_col(df[pick_col]) if pick_col else none,
+        }
+    out = pd.DataFrame(data)
     cols = ["source_file","window","source_tag","source_mode","source_tier","source_champion","item_id","item_en","item_zh","games","winrate","pickrate"]
     for c in cols:
         if c not in out.columns:
             out[c] = None
-    out = out[cols]
+    out = out[cols].reset_index(drop=True)
     for c in ["games","item_id"]:
         out[c] = pd.to_numeric(out[c], errors="coerce").astype("Int64")
     flags = {"has_winrate": win_col is not None, "has_pickrate": pick_col is not None}
     return out, flags
 
 
+CTX_COLS = ["source_file","source_champion","window","source_tag"]
+FRONT_COLS = ["source_file","window","source_tag","source_mode","source_tier","source_champion"]
+PARTITION = ["source_champion","source_mode","source_tier","window"]
+
+
+def _audit_missing(out: list, norm: pd.DataFrame, mask: pd.Series, kind: str):
+    recs = norm.loc[mask, CTX_COLS].to_dict("records")
+    out.extend({"kind": kind, **r} for r in recs)
+
+
+def _audit_rates(out: list, norm: pd.DataFrame, fields: list[str], kind: str):
+    # 逐列、欄位依 fields 順序（與原本逐列檢查的輸出順序一致）；不再檢查 0~1 範圍
+    bad = [(c, norm[c].isna().to_numpy()) for c in fields]
+    if not any(m.any() for _, m in bad):
+        return
+    ctx = norm[CTX_COLS].to_dict("records")
+    vals = {c: norm[c].tolist() for c in fields}
+    for i in np.flatnonzero(np.logical_or.reduce([m for _, m in bad])):
+        for c, m in bad:
+            if m[i]:
+                out.append({"kind": kind, **ctx[i], "field": c, "value": vals[c][i]})
+
+
+def _with_source(norm: pd.DataFrame, p: str, meta: dict | None, champ: str) -> pd.DataFrame:
+    norm["source_file"] = os.path.basename(p)
+    if meta:
+        norm["window"] = meta["window"]; norm["source_tag"] = meta["tag"]; norm["source_mode"] = meta.get("mode"); norm["source_tier"] = meta.get("tier")
+    else:
+        norm["window"] = norm["source_tag"] = norm["source_mode"] = norm["source_tier"] = None
+    norm["source_champion"] = champ
+    return norm
+
+
+def _index_for(task: dict, path: str) -> ItemIndex:
+    """該檔對應的解析器：有指定版本時取多版本索引中的該版本，否則為目前的 items_map（快照每個 worker 只載入一次）。"""
+    ver = task["items_versions"].get(path)
+    if ver is None:
+        return load_item_index(task["items_map"], task["item_aliases"])
+    ref_dir = os.path.dirname(os.path.abspath(task["items_map"]))
+    return load_item_history(ref_dir, task["item_aliases"]).at(ver)
+
+
+def _scrape_dates(ledger_path: str) -> dict[str, str]:
+    """帳本中成功抓取的輸出檔 → 完成時間（以絕對路徑與檔名兩種 key 對應）。"""
+    dates = {}
+    for rec in JobLedger(ledger_path).latest.values():
+        if rec.get("status") != "ok":
+            continue
+        for p in rec.get("outputs", {}).values():
+            dates[os.path.abspath(p)] = dates[os.path.basename(p)] = rec["finished_at"]
+    return dates
+
+
+def resolve_items_versions(paths: list[str], mode: str, items_map: str, aliases: str, ledger_path: str) -> dict[str, str]:
+    """mode: current → {}（全部用目前的 items_map）；auto → 依帳本的抓取時間（沒有記錄則用檔案 mtime）；
+    其他值視為 patch（如 15.18）。回傳 {檔案: ddragon 版本}。"""
+    if mode == "current" or not paths:
+        return {}
+    hist = load_item_history(os.path.dirname(os.path.abspath(items_map)), aliases)
+    if mode != "auto":
+        ver = hist.version_for(patch=mode)
+        return {p: ver for p in paths}
+    dates = _scrape_dates(ledger_path)
+    out = {}
+    for p in paths:
+        when = dates.get(os.path.abspath(p)) or dates.get(os.path.basename(p))
+        if when is None:
+            when = datetime.datetime.fromtimestamp(os.path.getmtime(p)).astimezone().isoformat()
+        out[p] = hist.version_for(date=when)
+    return out
+
+
+def normalize_champion(task: dict) -> dict:
+    """單一英雄：讀檔、正規化、稽核並寫出該英雄的輸出；可在 process pool 的 worker 中執行。
+
+    回傳 {"champion", "sets", "winning", "audit_missing", "audit_rates", "audit_win_not_in_sets"}；
+    只在需要寫彙整 CSV 時帶回 sets / winning 表格，否則為 None。
+    """
+    champ, out_dir, fmt = task["champion"], task["out_dir"], task["format"]
+    write_csv = fmt in ("csv", "both")
+    audit_missing_rows, audit_rate_rows, audit_win_not_in_sets_rows = [], [], []
+    out_dir_champ = os.path.join(out_dir, champ.lower())
+    if write_csv:
+        ensure_dir(out_dir_champ)
+
+    # sets
+    merged_sets = []
+    for p, meta in task["sets"]:
+        norm, flags = normalize_sets(pd.read_csv(p), _index_for(task, p))
+        norm = _with_source(norm, p, meta, champ)
+        if norm["champion"].isna().all() or (norm["champion"].astype(str).str.strip()=="").all():
+            norm["champion"] = champ
+        if norm["champion_slug"].isna().all() or (norm["champion_slug"].astype(str).str.strip()=="").all():
+            norm["champion_slug"] = _slug(champ)
+        norm = norm[FRONT_COLS + [c for c in norm.columns if c not in FRONT_COLS]]
+        mm = []
+        for i in range(1,6):
+            mm.append(norm[f"item_id{i}"].isna() & (norm[f"item_en{i}"].notna() | norm[f"item_zh{i}"].notna()))
+        miss_mask = pd.concat(mm, axis=1).any(axis=1)
+        _audit_missing(audit_missing_rows, norm, miss_mask, "sets")
+        fields = [c for c, ok in (("winrate", flags["has_winrate"]),("pickrate", flags["has_pickrate"])) if ok]
+        _audit_rates(audit_rate_rows, norm, fields, "sets")
+        merged_sets.append(norm)
+    if merged_sets:
+        df_sets_all = pd.concat(merged_sets, ignore_index=True).sort_values(["champion_slug","games"], ascending=[True, False], kind="mergesort")
+        if write_csv:
+            df_sets_all.to_csv(os.path.join(out_dir_champ, "sets_normalized.csv"), index=False, encoding="utf-8")
+    else:
+        df_sets_all = pd.DataFrame(columns=["item_id1","item_id2","item_id3","item_id4","item_id5"])  # 空佔位
+
+    # winning
+    merged_win = []
+    for p, meta in task["winning"]:
+        norm, flags = normalize_winning(pd.read_csv(p), _index_for(task, p))
+        norm = _with_source(norm, p, meta, champ)
+        norm = norm[FRONT_COLS + [c for c in norm.columns if c not in FRONT_COLS]]
+        miss_mask = norm["item_id"].isna() & (norm["item_en"].notna() | norm["item_zh"].notna())
+        _audit_missing(audit_missing_rows, norm, miss_mask, "winning")
+        fields = [c for c, ok in (("winrate", flags["has_winrate"]),("pickrate", flags["has_pickrate"])) if ok]
+        _audit_rates(audit_rate_rows, norm, fields, "winning")
+        merged_win.append(norm)
+    if merged_win:
+        df_win_all = pd.concat(merged_win, ignore_index=True).sort_values(["item_id","games"], ascending=[True, False], kind="mergesort")
+        if write_csv:
+            df_win_all.to_csv(os.path.join(out_dir_champ, "winning_normalized.csv"), index=False, encoding="utf-8")
+    else:
+        df_win_all = pd.DataFrame(columns=["item_id","item_en","item_zh"])  # 空佔位
+
+    # 覆蓋稽核：winning 中出現但 sets 完全未出現的 item（逐英雄）
+    if not df_win_all.empty:
+        id_cols = [f"item_id{i}" for i in range(1,6) if f"item_id{i}" in df_sets_all.columns]
+        set_item_ids = pd.unique(df_sets_all[id_cols].stack().dropna().astype(int).to_numpy()) if id_cols else []
+        w = df_win_all.dropna(subset=["item_id"])
+        w = w[~w["item_id"].astype(int).isin(set_item_ids)]
+        for r in w.to_dict("records"):
+            audit_win_not_in_sets_rows.append({
+                "source_champion": champ,
+                "item_id": int(r["item_id"]),
+                "item_en": r.get("item_en"),
+                "item_zh": r.get("item_zh"),
+                "window": r.get("window"),
+                "source_tag": r.get("source_tag"),
+                "source_file": r.get("source_file"),
+            })
+
+    # parquet 依英雄分區，各 worker 直接寫自己的分區
+    if fmt != "csv":
+        for kind, df in (("sets", df_sets_all if merged_sets else None), ("winning", df_win_all if merged_win else None)):
+            if df is not None:
+                write_dataset(df, os.path.join(out_dir, "parquet", kind), PARTITION)
+
+    return {"champion": champ,
+            "sets": df_sets_all if (write_csv and merged_sets) else None,
+            "winning": df_win_all if (write_csv and merged_win) else None,
+            "audit_missing": audit_missing_rows, "audit_rates": audit_rate_rows,
+            "audit_win_not_in_sets": audit_win_not_in_sets_rows}
+
+
+class CsvAppender:
+    """分段 append 的 CSV：第一段寫表頭；沒有任何列時依 empty 寫出空檔（None = 不建立檔案）。"""
+
+    def __init__(self, path: str, empty: str | None = None):
+        self.path, self.empty, self.rows = path, empty, 0
+        self._f = None
+
+    def append(self, part) -> None:
+        df = part if isinstance(part, pd.DataFrame) else pd.DataFrame(part)
+        if df.empty:
+            return
+        if self._f is None:
+            self._f = open(self.path, "w", encoding="utf-8", newline="")
+        df.to_csv(self._f, index=False, header=self.rows == 0)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+        elif self.empty is not None:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(self.empty)
+
+
+def _ordered_results(tasks: list[dict], workers: int):
+    """依 tasks 順序逐一產出結果；最多 2×workers 個英雄同時在處理或等待取用，記憶體不隨英雄數成長。"""
+    if workers <= 1 or len(tasks) <= 1:
+        for t in tasks:
+            yield normalize_champion(t)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+        it = iter(tasks)
+        pending = deque(ex.submit(normalize_champion, t) for t in itertools.islice(it, workers * 2))
+        while pending:
+            res = pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(normalize_champion, nxt))
+            yield res
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in-dir", default="data/raw")
     ap.add_argument("--glob-sets", default=None)
     ap.add_argument("--glob-winning", default=None)
     ap.add_argument("--hero", default=None)
-    ap.add_argument("--items-map", default="data/ref/items_map.csv")
-    ap.add_argument("--item-aliases", default="data/ref/item_aliases.csv")
+    ap.add_argument("--items-map", default=DEF_ITEMS_MAP)
+    ap.add_argument("--item-aliases", default=DEF_ALIASES)
     ap.add_argument("--out-dir", default="data/processed")
+    ap.add_argument("--format", choices=FORMATS, default=os.getenv("LOL_FORMAT", DEF_FORMAT),
+                    help="parquet = 另寫 {out-dir}/parquet/{sets,winning}/ 分區資料集（需 pyarrow）；稽核檔一律 CSV")
+    ap.add_argument("--items-version", default="current",
+                    help="current = 一律用 items_map.csv；auto = 依抓取時間（帳本或檔案 mtime）對應版本；或指定 patch（如 15.18）")
+    ap.add_argument("--ledger", default=LEDGER_PATH, help="--items-version auto 讀取抓取時間的帳本")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="依英雄分派到 process pool；0 = os.cpu_count()，1 = 本行程內逐一處理")
     args = ap.parse_args()
+    if args.format != "csv" and not HAVE_ARROW:
+        ap.error("--format parquet/both requires pyarrow (pip install pyarrow)")
+    write_csv = args.format in ("csv", "both")
 
-    items_df = load_items_map(args.items_map)
-    idx = ItemIndex(items_df, args.item_aliases)
+    load_item_index(args.items_map, args.item_aliases)  # 先在主行程編好快照，worker 只需讀取
     ddragon_ver = read_items_map_version(args.items_map)
 
     in_dir = Path(args.in_dir); ensure_dir(args.out_dir)
@@ -265,150 +442,61 @@ def main():
     by_hero_sets, by_hero_win = {}, {}
     modes, tiers, windows = set(), set(), set()
 
-    for p in set_files:
-        name = os.path.basename(p); meta = parse_meta_from_name(name)
-        champ = (meta or {}).get("champion") or name.split("_")[0]
-        if args.hero and champ.lower() != args.hero.lower():
-            continue
-        by_hero_sets.setdefault(champ, []).append((p, meta))
-        if meta:
-            if meta.get("mode"): modes.add(meta["mode"]) 
-            if meta.get("tier"): tiers.add(meta["tier"]) 
-            if meta.get("window"): windows.add(meta["window"]) 
-
-    for p in winning_files:
-        name = os.path.basename(p); meta = parse_meta_from_name(name)
-        champ = (meta or {}).get("champion") or name.split("_")[0]
-        if args.hero and champ.lower() != args.hero.lower():
-            continue
-        by_hero_win.setdefault(champ, []).append((p, meta))
-        if meta:
-            if meta.get("mode"): modes.add(meta["mode"]) 
-            if meta.get("tier"): tiers.add(meta["tier"]) 
-            if meta.get("window"): windows.add(meta["window"]) 
-
-    all_sets_frames, all_win_frames = [], []
-    audit_missing_rows, audit_rate_rows = [], []
-    audit_win_not_in_sets_rows = []
-
-    def audit_rates(row: pd.Series, fields: list[str], ctx: dict):
-        for c in fields:
-            v = row.get(c)
-            bad = v is None or pd.isna(v)  # 不再檢查 0~1 範圍
-            if bad:
-                audit_rate_rows.append({**ctx, "field": c, "value": v})
-
-    for champ in sorted(set(by_hero_sets.keys()) | set(by_hero_win.keys())):
-        out_dir_champ = os.path.join(args.out_dir, champ.lower()); ensure_dir(out_dir_champ)
-
-        # sets
-        merged_sets = []
-        for p, meta in by_hero_sets.get(champ, []):
-            df = pd.read_csv(p)
-            norm, flags = normalize_sets(df, idx)
-            norm["source_file"] = os.path.basename(p)
-            if meta:
-                norm["window"] = meta["window"]; norm["source_tag"] = meta["tag"]; norm["source_mode"] = meta.get("mode"); norm["source_tier"] = meta.get("tier")
-            else:
-                norm["window"] = norm["source_tag"] = norm["source_mode"] = norm["source_tier"] = None
-            norm["source_champion"] = champ
-            if norm["champion"].isna().all() or (norm["champion"].astype(str).str.strip()=="").all():
-                norm["champion"] = champ
-            if norm["champion_slug"].isna().all() or (norm["champion_slug"].astype(str).str.strip()=="").all():
-                norm["champion_slug"] = _slug(champ)
-            front = ["source_file","window","source_tag","source_mode","source_tier","source_champion"]
-            norm = norm[front + [c for c in norm.columns if c not in front]]
-            mm = []
-            for i in range(1,6):
-                mm.append(norm[f"item_id{i}"].isna() & (norm[f"item_en{i}"].notna() | norm[f"item_zh{i}"].notna()))
-            miss_mask = pd.concat(mm, axis=1).any(axis=1)
-            for _, r in norm[miss_mask].iterrows():
-                audit_missing_rows.append({"kind": "sets","source_file": r["source_file"],"source_champion": champ,"window": r["window"],"source_tag": r["source_tag"]})
-            fields = [c for c, ok in (("winrate", flags["has_winrate"]),("pickrate", flags["has_pickrate"])) if ok]
-            for _, r in norm.iterrows():
-                audit_rates(r, fields, {"kind":"sets","source_file":r["source_file"],"source_champion":champ,"window":r["window"],"source_tag":r["source_tag"]})
-            merged_sets.append(norm)
-        if merged_sets:
-            df_sets_all = pd.concat(merged_sets, ignore_index=True).sort_values(["champion_slug","games"], ascending=[True, False], kind="mergesort")
-            df_sets_all.to_csv(os.path.join(out_dir_champ, "sets_normalized.csv"), index=False, encoding="utf-8")
-            all_sets_frames.append(df_sets_all)
-        else:
-            df_sets_all = pd.DataFrame(columns=["item_id1","item_id2","item_id3","item_id4","item_id5"])  # 空佔位
-
-        # winning
-        merged_win = []
-        for p, meta in by_hero_win.get(champ, []):
-            df = pd.read_csv(p)
-            norm, flags = normalize_winning(df, idx)
-            norm["source_file"] = os.path.basename(p)
+    for files, by_hero in ((set_files, by_hero_sets), (winning_files, by_hero_win)):
+        for p in files:
+            name = os.path.basename(p); meta = parse_meta_from_name(name)
+            champ = (meta or {}).get("champion") or name.split("_")[0]
+            if args.hero and champ.lower() != args.hero.lower():
+                continue
+            by_hero.setdefault(champ, []).append((p, meta))
             if meta:
-                norm["window"] = meta["window"]; norm["source_tag"] = meta["tag"]; norm["source_mode"] = meta.get("mode"); norm["source_tier"] = meta.get("tier")
-            else:
-                norm["window"] = norm["source_tag"] = norm["source_mode"] = norm["source_tier"] = None
-            norm["source_champion"] = champ
-            front = ["source_file","window","source_tag","source_mode","source_tier","source_champion"]
-            norm = norm[front + [c for c in norm.columns if c not in front]]
-            miss_mask = norm["item_id"].isna() & (norm["item_en"].notna() | norm["item_zh"].notna())
-            for _, r in norm[miss_mask].iterrows():
-                audit_missing_rows.append({"kind": "winning","source_file": r["source_file"],"source_champion": champ,"window": r["window"],"source_tag": r["source_tag"]})
-            fields = [c for c, ok in (("winrate", flags["has_winrate"]),("pickrate", flags["has_pickrate"])) if ok]
-            for _, r in norm.iterrows():
-                audit_rates(r, fields, {"kind":"winning","source_file":r["source_file"],"source_champion":champ,"window":r["window"],"source_tag":r["source_tag"]})
-            merged_win.append(norm)
-        if merged_win:
-            df_win_all = pd.concat(merged_win, ignore_index=True).sort_values(["item_id","games"], ascending=[True, False], kind="mergesort")
-            df_win_all.to_csv(os.path.join(out_dir_champ, "winning_normalized.csv"), index=False, encoding="utf-8")
-            all_win_frames.append(df_win_all)
-        else:
-            df_win_all = pd.DataFrame(columns=["item_id","item_en","item_zh"])  # 空佔位
-
-        # 覆蓋稽核：winning 中出現但 sets 完全未出現的 item（逐英雄）
-        if not df_win_all.empty:
-            set_item_ids = set()
-            for i in range(1,6):
-                if f"item_id{i}" in df_sets_all.columns:
-                    set_item_ids.update(df_sets_all[f"item_id{i}"].dropna().astype(int).tolist())
-            for _, r in df_win_all.dropna(subset=["item_id"]).iterrows():
-                iid = int(r["item_id"])
-                if iid not in set_item_ids:
-                    audit_win_not_in_sets_rows.append({
-                        "source_champion": champ,
-                        "item_id": iid,
-                        "item_en": r.get("item_en"),
-                        "item_zh": r.get("item_zh"),
-                        "window": r.get("window"),
-                        "source_tag": r.get("source_tag"),
-                        "source_file": r.get("source_file"),
-                    })
-
-    # 彙整輸出
-    if all_sets_frames:
-        pd.concat(all_sets_frames, ignore_index=True).to_csv(os.path.join(args.out_dir, "all_sets_normalized.csv"), index=False, encoding="utf-8")
-    if all_win_frames:
-        pd.concat(all_win_frames, ignore_index=True).to_csv(os.path.join(args.out_dir, "all_winning_normalized.csv"), index=False, encoding="utf-8")
-
-    # 稽核輸出
-    if audit_missing_rows:
-        pd.DataFrame(audit_missing_rows).to_csv(os.path.join(args.out_dir, "_audit_items_missing.csv"), index=False, encoding="utf-8")
-    else:
-        open(os.path.join(args.out_dir, "_audit_items_missing.csv"), "w", encoding="utf-8").write("")
-
-    if audit_rate_rows:
-        pd.DataFrame(audit_rate_rows).to_csv(os.path.join(args.out_dir, "_audit_rates.csv"), index=False, encoding="utf-8")
-    else:
-        open(os.path.join(args.out_dir, "_audit_rates.csv"), "w", encoding="utf-8").write("")
-
-    if audit_win_not_in_sets_rows:
-        pd.DataFrame(audit_win_not_in_sets_rows).to_csv(os.path.join(args.out_dir, "_audit_winning_not_in_sets.csv"), index=False, encoding="utf-8")
+                if meta.get("mode"): modes.add(meta["mode"])
+                if meta.get("tier"): tiers.add(meta["tier"])
+                if meta.get("window"): windows.add(meta["window"])
+
+    used_files = [p for by_hero in (by_hero_sets, by_hero_win) for files in by_hero.values() for p, _ in files]
+    items_versions = resolve_items_versions(used_files, args.items_version, args.items_map, args.item_aliases, args.ledger)
+    tasks = [{"champion": champ, "sets": by_hero_sets.get(champ, []), "winning": by_hero_win.get(champ, []),
+              "items_map": args.items_map, "item_aliases": args.item_aliases, "out_dir": args.out_dir,
+              "format": args.format,
+              "items_versions": {p: items_versions[p] for p, _ in by_hero_sets.get(champ, []) + by_hero_win.get(champ, [])
+                                 if p in items_versions}}
+             for champ in sorted(set(by_hero_sets.keys()) | set(by_hero_win.keys()))]
+    workers = args.workers or (os.cpu_count() or 1)
+
+    # 彙整與稽核檔依英雄順序串流 append，不在記憶體保留全部英雄的表格
+    def out(name: str) -> str:
+        return os.path.join(args.out_dir, name)
+
+    all_sets = CsvAppender(out("all_sets_normalized.csv")) if write_csv else None
+    all_win = CsvAppender(out("all_winning_normalized.csv")) if write_csv else None
+    audits = {"audit_missing": CsvAppender(out("_audit_items_missing.csv"), empty=""),
+              "audit_rates": CsvAppender(out("_audit_rates.csv"), empty=""),
+              "audit_win_not_in_sets": CsvAppender(out("_audit_winning_not_in_sets.csv"))}
+    try:
+        for res in _ordered_results(tasks, workers):
+            if write_csv:
+                if res["sets"] is not None:
+                    all_sets.append(res["sets"])
+                if res["winning"] is not None:
+                    all_win.append(res["winning"])
+            for key, w in audits.items():
+                w.append(res[key])
+    finally:
+        for w in [all_sets, all_win, *audits.values()]:
+            if w is not None:
+                w.close()
 
     # 中繼資料 _meta.json
-    meta = {"ddragon_version": ddragon_ver, "modes": sorted(modes), "tiers": sorted(tiers), "windows": sorted(windows),
+    meta = {"ddragon_version": ddragon_ver,
+            "items_versions": {v: list(items_versions.values()).count(v) for v in sorted(set(items_versions.values()))},
+            "modes": sorted(modes), "tiers": sorted(tiers), "windows": sorted(windows),
             "run_at": datetime.datetime.now().astimezone().isoformat(), "inputs": {"in_dir": str(in_dir)},
-            "counts": {"set_files": len(set_files), "winning_files": len(winning_files), "champions": len(set(by_hero_sets.keys()) | set(by_hero_win.keys()))}}
+            "counts": {"set_files": len(set_files), "winning_files": len(winning_files), "champions": len(tasks)}}
     with open(os.path.join(args.out_dir, "_meta.json"), "w", encoding="utf-8") as f:
         json.dump(meta, f, ensure_ascii=False, indent=2)
 
-    print("Done.")
+    print(f"Done. champions={len(tasks)} workers={min(workers, max(len(tasks), 1))}")
 
 
 if __name__ == "__main__":
@@ -2,8 +2,12 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 import numpy as np
-import pandas as pd
 from .io_schema import WinningItem, BuiltSet
+from . import set_index as sx
+from .columnar import read_table, items_of
+from .set_table import SetTable, top_k_order
+from .set_stats import SetStats, stats_for
+from .spans import Tracer, NULL_TRACER
 
 @dataclass
 class BuildResult:
@@ -13,63 +17,63 @@ class BuildResult:
 
 EPS = 1e-9
 
+@dataclass(frozen=True)
+class Thresholds:
+    """pick_build 的固定門檻下限（預設即原本寫死的值）；src.sweep 以網格搜尋調整。"""
+    pick_floor: float = 0.10    # PickCut = max(P50, pick_floor)
+    tau_floor: float = 0.5      # Tau = max(共現頻率中位數, tau_floor)
+    support_floor: float = 0.25  # SupportCut = max(support_floor, 已選支撐度中位數)
+    lift_min: float = 1.02      # 支撐度不足時，勝率 lift 需大於此值才收
+
+DEFAULT_THRESHOLDS = Thresholds()
+
 def _logit(p: float) -> float:
     p = min(max(p, EPS), 1 - EPS)
     return np.log(p / (1 - p))
 
 def load_winning_items(path: str) -> List[WinningItem]:
-    df = pd.read_csv(path)
+    df = read_table(path)
     return [
-        WinningItem(
-            name=row["name"],
-            win_rate=float(row["win_rate"]),
-            pick_rate=float(row["pick_rate"]),
-            sample_size=int(row["sample_size"]),
-        )
-        for _, row in df.iterrows()
+        WinningItem(name=name, win_rate=float(wr), pick_rate=float(pr), sample_size=int(n))
+        for name, wr, pr, n in zip(df["name"], df["win_rate"], df["pick_rate"], df["sample_size"])
     ]
 
 def load_built_sets(path: str) -> List[BuiltSet]:
-    df = pd.read_csv(path)
-    sets: List[BuiltSet] = []
-    for _, row in df.iterrows():
-        items = [s.strip() for s in str(row["items"]).split("|") if s.strip()]
-        sets.append(
-            BuiltSet(
-                items=items,
-                set_win_rate=float(row["set_win_rate"]),
-                set_pick_rate=float(row["set_pick_rate"]),
-                set_sample_size=int(row["set_sample_size"]),
-            )
-        )
-    return sets
-
-def _dynamic_candidates(winning: List[WinningItem]) -> Tuple[List[WinningItem], Dict]:
-    import numpy as np
-    pr = np.array([w.pick_rate for w in winning], dtype=float)
-    wr = np.array([w.win_rate for w in winning], dtype=float)
-    ss = np.array([w.sample_size for w in winning], dtype=float)
-
-    P25 = float(np.percentile(pr, 25)) if pr.size else 0.0
-    P50 = float(np.percentile(pr, 50)) if pr.size else 0.0
-    P75 = float(np.percentile(pr, 75)) if pr.size else 0.0
-    W50 = float(np.percentile(wr, 50)) if wr.size else 0.0
-    W75 = float(np.percentile(wr, 75)) if wr.size else 0.0
-    GlobalAvgWin = float(np.average(wr, weights=np.maximum(ss, 1))) if wr.size else 0.5
-    max_pick = float(pr.max()) if pr.size else 0.0
+    """CSV 或同名 .parquet（有 item1..5 固定欄位時不必再拆 | 字串）。"""
+    df = read_table(path)
+    return [
+        BuiltSet(items=items, set_win_rate=float(wr), set_pick_rate=float(pr), set_sample_size=int(n))
+        for items, wr, pr, n in zip(items_of(df), df["set_win_rate"], df["set_pick_rate"], df["set_sample_size"])
+    ]
+
+def load_set_table(path: str) -> SetTable:
+    """一次讀表、不建立逐列物件的 sets 載入；pick_build 可直接使用。"""
+    return SetTable.from_frame(read_table(path))
+
+def load_sets(path: str, topk: int, cover: float) -> SetTable | SetStats:
+    """有相符的預先計算統計（*.stats.npz）就只讀它，否則讀整張 sets 表。"""
+    return stats_for(path, topk, cover) or load_set_table(path)
+
+def _dynamic_candidates(winning: List[WinningItem], pick_floor: float = 0.10) -> Tuple[List[WinningItem], Dict]:
+    n = len(winning)
+    pr = np.fromiter((w.pick_rate for w in winning), dtype=float, count=n)
+    wr = np.fromiter((w.win_rate for w in winning), dtype=float, count=n)
+    ss = np.fromiter((w.sample_size for w in winning), dtype=float, count=n)
+
+    # 一次算完同一陣列的多個分位數（只排序一次）
+    P25, P50, P75 = (float(x) for x in np.percentile(pr, [25, 50, 75])) if n else (0.0, 0.0, 0.0)
+    W50, W75 = (float(x) for x in np.percentile(wr, [50, 75])) if n else (0.0, 0.0)
+    GlobalAvgWin = float(np.average(wr, weights=np.maximum(ss, 1))) if n else 0.5
+    max_pick = float(pr.max()) if n else 0.0
 
     # 原始門檻
-    PickCut = max(P50, 0.10)
+    PickCut = max(P50, pick_floor)
     WinCut  = max(W50, GlobalAvgWin)
 
     def select_by(pick_cut, win_cut, cold_mult):
-        C = []
-        for w in winning:
-            base_ok = (w.pick_rate >= pick_cut and w.win_rate >= win_cut)
-            high_win_cold_fix = (w.win_rate >= W75 and w.pick_rate >= cold_mult * max_pick)
-            if base_ok or high_win_cold_fix:
-                C.append(w)
-        return C
+        base_ok = (pr >= pick_cut) & (wr >= win_cut)
+        high_win_cold_fix = (wr >= W75) & (pr >= cold_mult * max_pick)
+        return [winning[i] for i in np.flatnonzero(base_ok | high_win_cold_fix)]
 
     C0 = select_by(PickCut, WinCut, cold_mult=0.50)
 
@@ -77,33 +81,35 @@ def _dynamic_candidates(winning: List[WinningItem]) -> Tuple[List[WinningItem],
     if not C0:
         C0 = select_by(max(P25, 0.05), W50, cold_mult=0.30)
 
-    # 回退2：若仍為空，取 win*pick 前 8 作為候選
+    # 回退2：若仍為空，取 win*pick 前 8 作為候選（穩定排序，同分維持原順序）
     if not C0:
-        C0 = sorted(winning, key=lambda w: w.win_rate * w.pick_rate, reverse=True)[:8]
+        C0 = [winning[i] for i in np.argsort(-(wr * pr), kind="stable")[:8]]
 
     meta = dict(P25=P25, P50=P50, P75=P75, W50=W50, W75=W75,
                 GlobalAvgWin=GlobalAvgWin, PickCut=PickCut, WinCut=WinCut, max_pick=max_pick)
     return C0, meta
 
-def _topK_sets(sets: List[BuiltSet], K: int = 50, cover: float = 0.80) -> List[BuiltSet]:
+def _topK_sets(sets: List[BuiltSet] | SetTable, K: int = 50, cover: float = 0.80) -> List[BuiltSet] | SetTable:
+    if isinstance(sets, SetTable):
+        return sets.top_k(K, cover)
     if not sets:
         return []
-    import pandas as pd
-    df = pd.DataFrame([{"i": i, "samples": s.set_sample_size, "pick": s.set_pick_rate} for i, s in enumerate(sets)])
-    if df.empty:
-        return []
-    df = df.sort_values(by=["samples", "pick"], ascending=[False, False])
-    ordered = [sets[int(i)] for i in df["i"].tolist()]
-    out, cum_pick = [], 0.0
-    for s in ordered:
-        out.append(s)
-        cum_pick += s.set_pick_rate
-        if len(out) >= K or cum_pick >= cover:
-            break
-    return out
-
-
-def _cooccur_freq(cands: List[WinningItem], top_sets: List[BuiltSet]) -> Dict[str, float]:
+    samples = np.fromiter((s.set_sample_size for s in sets), dtype=np.int64, count=len(sets))
+    pick = np.fromiter((s.set_pick_rate for s in sets), dtype=float, count=len(sets))
+    return [sets[int(i)] for i in top_k_order(samples, pick, K, cover)]
+
+def _resolve_top_sets(sets: List[BuiltSet] | SetTable | SetStats, topk: int, cover: float) -> List[BuiltSet] | SetTable:
+    """pick_build 與 exact 引擎共用的 top-K 步驟；預先計算的統計直接取其 top-K。"""
+    if isinstance(sets, SetStats):
+        if not sets.matches(topk, cover):
+            raise ValueError(f"stats built for topk={sets.topk} cover={sets.cover}, requested topk={topk} cover={cover}")
+        return sets.top
+    return _topK_sets(sets, K=topk, cover=cover if sets else 0.10)
+
+
+def _cooccur_freq(cands: List[WinningItem], top_sets: List[BuiltSet] | sx.SetIndex) -> Dict[str, float]:
+    if isinstance(top_sets, sx.SetIndex):
+        return sx.cooccur_freq([c.name for c in cands], top_sets)
     freq: Dict[str, float] = {}
     K = max(len(top_sets), 1)
     for c in cands:
@@ -114,15 +120,32 @@ def _cooccur_freq(cands: List[WinningItem], top_sets: List[BuiltSet]) -> Dict[st
 def _score_item(w: WinningItem, weight: float) -> float:
     return 0.6 * _logit(w.win_rate) + 0.4 * np.log(max(w.pick_rate, EPS)) + np.log(max(weight, EPS))
 
-def _support(selected: List[str], sets_sub: List[BuiltSet]) -> Tuple[float, List[BuiltSet]]:
+def _support(selected: List[str], sets_sub: List[BuiltSet] | sx.SetIndex) -> Tuple[float, List[BuiltSet] | np.ndarray]:
+    if isinstance(sets_sub, sx.SetIndex):
+        return sx.support(selected, sets_sub)
     # 篩掉不含全部 selected 的套裝
     filt = [s for s in sets_sub if all(it in s.items for it in selected)]
     K = max(len(sets_sub), 1)
     return (len(filt) / K, filt)
 
-def _conditional_choice(selected4: List[str], remain: List[WinningItem], sets_sub: List[BuiltSet]) -> str:
+def _mean_win(sub: List[BuiltSet] | np.ndarray, sets_sub: List[BuiltSet] | sx.SetIndex) -> float:
+    # sub 為 _support 的第二個回傳值：list 路徑是套裝列表，索引路徑是 mask
+    if isinstance(sets_sub, sx.SetIndex):
+        return sx.mean_win(sub, sets_sub)
+    return np.average([s.set_win_rate for s in sub]) if sub else 0.0
+
+def _weight_by_item(cands: List[WinningItem], top_sets: List[BuiltSet] | sx.SetIndex) -> Dict[str, float]:
+    if isinstance(top_sets, sx.SetIndex):
+        return sx.sample_weight([w.name for w in cands], top_sets, eps=EPS)
+    total_samples = sum(s.set_sample_size for s in top_sets) + EPS
+    return {w.name: (sum(s.set_sample_size for s in top_sets if w.name in s.items) / total_samples) for w in cands}
+
+def _conditional_choice(selected4: List[str], remain: List[WinningItem], sets_sub: List[BuiltSet] | sx.SetIndex) -> str:
     # 在已選4件條件下，計算每個候選的條件 pick 與條件 win
     # 取 rank 折衷最高者
+    if isinstance(sets_sub, sx.SetIndex):
+        stats = sx.conditional_stats(selected4, [w.name for w in remain], sets_sub, eps=EPS)
+        return _rank_conditional(stats, remain)
     stats = []
     cond_sets = [s for s in sets_sub if all(it in s.items for it in selected4)]
     if not cond_sets and sets_sub:
@@ -137,18 +160,33 @@ def _conditional_choice(selected4: List[str], remain: List[WinningItem], sets_su
         win_without = np.average([s.set_win_rate for s in without_w]) if without_w else 0.0
         lift = (win_with + EPS) / (win_without + EPS)
         stats.append((w.name, pick, win_with, lift))
+    return _rank_conditional(stats, remain)
+
+def _rank_conditional(stats: List[Tuple[str, float, float, float]], remain: List[WinningItem]) -> str:
     if not stats:
         return remain[0].name
     # 以 pick 與 win 排名反序名次求平均
-    df = pd.DataFrame(stats, columns=["name", "pick", "win", "lift"])
-    df["rpick"] = df["pick"].rank(ascending=False, method="average")
-    df["rwin"] = df["win"].rank(ascending=False, method="average")
-    df["score"] = 0.5 * (1.0 / df["rpick"]) + 0.5 * (1.0 / df["rwin"])
-    # 若接近，選 lift 較高者
-    df = df.sort_values(by=["score", "lift"], ascending=[False, False])
-    return str(df.iloc[0]["name"])
-
-def _order_by_position(final_items: List[str], sets_sub: List[BuiltSet]) -> List[str]:
+    pick = np.array([st[1] for st in stats], dtype=float)
+    win = np.array([st[2] for st in stats], dtype=float)
+    lift = np.array([st[3] for st in stats], dtype=float)
+    score = 0.5 / _rank_desc(pick) + 0.5 / _rank_desc(win)
+    # 若接近，選 lift 較高者（lexsort 穩定，全同分時取先出現者）
+    return str(stats[int(np.lexsort((-lift, -score))[0])][0])
+
+def _rank_desc(x: np.ndarray) -> np.ndarray:
+    """降冪名次（1 起算），同值取平均名次；等同 pandas rank(ascending=False, method="average")。"""
+    order = np.argsort(-x, kind="stable")
+    v = x[order]
+    # 每段同值的起訖位置，名次取 (start + end) / 2 + 1
+    starts = np.flatnonzero(np.r_[True, v[1:] != v[:-1]])
+    ends = np.r_[starts[1:], len(v)] - 1
+    ranks = np.empty(len(x), dtype=float)
+    ranks[order] = np.repeat((starts + ends) / 2.0 + 1.0, ends - starts + 1)
+    return ranks
+
+def _order_by_position(final_items: List[str], sets_sub: List[BuiltSet] | sx.SetIndex) -> List[str]:
+    if isinstance(sets_sub, sx.SetIndex):
+        return sx.order_by_position(final_items, sets_sub, eps=EPS)
     # 以包含全部 final_items 的套裝，計算每件在序列中的加權平均位次
     contain_all = [s for s in sets_sub if all(it in s.items for it in final_items)]
     if not contain_all:
@@ -166,16 +204,25 @@ def _order_by_position(final_items: List[str], sets_sub: List[BuiltSet]) -> List
 
 def pick_build(
     winning: List[WinningItem],
-    sets: List[BuiltSet],
+    sets: List[BuiltSet] | SetTable | SetStats,
     *,
     explain: bool = False,
     topk: int = 50,
-    cover: float = 0.80
+    cover: float = 0.80,
+    use_index: bool = True,
+    tracer: Tracer | None = None,
+    thresholds: Thresholds = DEFAULT_THRESHOLDS,
+    top_index: sx.SetIndex | None = None
 ) -> BuildResult:
+    """top_index：呼叫端已依同一組 topk/cover 建好的 top-K 索引（src.sweep 在多個門檻間共用），此時略過 top-K 與建索引。"""
     trace = {}
+    tr = tracer or NULL_TRACER
+    th = thresholds
 
     # 1) 動態候選池 + 回退
-    C0, meta = _dynamic_candidates(winning)
+    with tr.span("candidates", winning=len(winning)) as rec:
+        C0, meta = _dynamic_candidates(winning, th.pick_floor)
+        rec["candidates"] = len(C0)
     if explain:
         trace["winning_items"] = [
             {"name": w.name, "win": w.win_rate, "pick": w.pick_rate, "n": w.sample_size}
@@ -184,55 +231,71 @@ def pick_build(
         trace["C0"] = [w.name for w in C0]
         trace["thresholds"] = meta
 
-    # 2) 取實際套裝 top-K
-    top_sets = _topK_sets(sets, K=topk, cover=cover if sets else 0.10)
+    # 2) 取實際套裝 top-K（預先計算的統計已存好 top-K，不必掃描）
+    precomputed = isinstance(sets, SetStats) or top_index is not None
+    with tr.span("topk", sets_scanned=0 if precomputed else len(sets), precomputed=precomputed) as rec:
+        top_sets = top_index.sets if top_index is not None else _resolve_top_sets(sets, topk, cover)
+        rec["top_sets"] = len(top_sets)
     if explain:
         trace["top_sets_used"] = len(top_sets)
+    # use_index=False 保留逐列掃描路徑，供對照與 benchmark
+    with tr.span("index", sets=len(top_sets), use_index=use_index):
+        if top_index is not None:
+            store = top_index if use_index else list(top_sets)
+        else:
+            store = sx.SetIndex(top_sets) if use_index else list(top_sets)
 
     # 3) 共現一致性
-    freq = _cooccur_freq(C0, top_sets)
-    median_freq = float(np.median(list(freq.values()))) if freq else 0.0
-    Tau = max(median_freq, 0.5)
-    C1 = [w for w in C0 if freq.get(w.name, 0.0) >= Tau] or C0[:]
+    with tr.span("cooccur", candidates=len(C0), sets_scanned=len(C0) * len(top_sets)) as rec:
+        freq = _cooccur_freq(C0, store)
+        median_freq = float(np.median(list(freq.values()))) if freq else 0.0
+        Tau = max(median_freq, th.tau_floor)
+        C1 = [w for w in C0 if freq.get(w.name, 0.0) >= Tau] or C0[:]
+        rec["kept"] = len(C1)
     if explain:
         trace["cooccur_freq"] = freq
         trace["Tau"] = Tau
         trace["C1"] = [w.name for w in C1]
 
     # 4) 迭代擴充
-    selected, supports = [], []
-    total_samples = sum(s.set_sample_size for s in top_sets) + EPS
-    weight_by_item = {w.name: (sum(s.set_sample_size for s in top_sets if w.name in s.items) / total_samples) for w in C1}
-    C1_sorted = sorted(C1, key=lambda w: _score_item(w, weight_by_item.get(w.name, 1e-6)), reverse=True)
-
-    decisions = []
-    for w in C1_sorted:
-        trial = selected + [w.name]
-        sup, sub_sets = _support(trial, top_sets)
-        SupportCut = max(0.25, float(np.median(supports)) if supports else 1.0)
-        action = "accept"
-        if sup < SupportCut:
-            sup0, sub0 = _support(selected, top_sets)
-            win_with  = np.average([s.set_win_rate for s in sub_sets]) if sub_sets else 0.0
-            win_without = np.average([s.set_win_rate for s in sub0]) if sub0 else 0.0
-            lift = (win_with + EPS) / (win_without + EPS)
-            if _score_item(w, weight_by_item.get(w.name, 1e-6)) > 0 and lift > 1.02:
+    with tr.span("expansion", candidates=len(C1)) as rec:
+        selected, supports = [], []
+        weight_by_item = _weight_by_item(C1, store)
+        C1_sorted = sorted(C1, key=lambda w: _score_item(w, weight_by_item.get(w.name, 1e-6)), reverse=True)
+
+        decisions = []
+        for w in C1_sorted:
+            trial = selected + [w.name]
+            sup, sub_sets = _support(trial, store)
+            SupportCut = max(th.support_floor, float(np.median(supports)) if supports else 1.0)
+            action = "accept"
+            if sup < SupportCut:
+                sup0, sub0 = _support(selected, store)
+                win_with  = _mean_win(sub_sets, store)
+                win_without = _mean_win(sub0, store)
+                lift = (win_with + EPS) / (win_without + EPS)
+                if _score_item(w, weight_by_item.get(w.name, 1e-6)) > 0 and lift > th.lift_min:
+                    selected = trial
+                    supports.append(sup)
+                    action = "accept_by_lift"
+                else:
+                    action = "reject"
+            else:
                 selected = trial
                 supports.append(sup)
-                action = "accept_by_lift"
-            else:
-                action = "reject"
-        else:
-            selected = trial
-            supports.append(sup)
-        decisions.append({"item": w.name, "sup": sup, "cut": SupportCut, "action": action})
-        if len(selected) >= 4:
-            break
+            decisions.append({"item": w.name, "sup": sup, "cut": SupportCut, "action": action})
+            if len(selected) >= 4:
+                break
+        # 未達門檻者另算一次不含該件的支撐度
+        rec["support_calls"] = sum(1 if d["action"] == "accept" else 2 for d in decisions)
+        rec["sets_scanned"] = rec["support_calls"] * len(top_sets)
+        rec["selected"] = len(selected)
 
     # 5) 最後一件
     remain = [w for w in C1_sorted if w.name not in selected]
     if len(selected) < 5 and remain:
-        last = _conditional_choice(selected, remain, top_sets)
+        with tr.span("conditional", candidates=len(remain), sets_scanned=len(remain) * len(top_sets)):
+            last = _conditional_choice(selected, remain, store)
         if last not in selected:
             selected.append(last)
 
@@ -246,7 +309,8 @@ def pick_build(
                 break
 
     # 6) 位次決定
-    ordered = _order_by_position(selected[:5], top_sets)
+    with tr.span("ordering", sets_scanned=len(top_sets)):
+        ordered = _order_by_position(selected[:5], store)
 
     boots = "狂戰士護脛"
     rationale = {
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+離線回測：以較早的快照建出推薦組合，再用較晚快照的實際套裝成績評分。
+
+快照目錄：{root}/{日期}/ 下放與 data/raw 相同命名的 {hero}_{mode}_{tier}_{window}_sets.csv / _winning.csv，
+日期資料夾名為 YYYY-MM-DD（或 YYYYMMDD、ISO 時間）。同一英雄/模式/分段/視窗依日期排序，
+第 i 份快照與第 i+horizon 份配成一組。評分只看較晚快照的 sets：
+- exact：包含推薦 5 件的套裝，其場次（set_sample_size）與場次加權勝率（set_win_rate）；
+- near：至少含其中 4 件的套裝，同上；
+- base：全部套裝的場次加權勝率，exact_lift / near_lift 為與它的差；
+- top_jaccard：推薦與較晚快照最多場次套裝的 Jaccard。
+結果每組一列寫成精簡表（.csv 或 .parquet），以 label（預設為程式版本）區分，--append 可累積多個版本對照。
+
+用法：
+  python -m src.backtest --root data/snapshots --out outputs/_backtest.csv
+  python -m src.backtest --root data/snapshots --engine exact --append --label exact-v1
+"""
+from __future__ import annotations
+import argparse, datetime, os, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from .algo import load_sets, load_set_table, load_winning_items
+from .build_manifest import code_version
+from .columnar import require_arrow
+from .exact_search import DEF_POOL, DEF_TOP_N
+from .pipeline import ENGINES, _engine_kw, discover_jobs
+from .set_table import SetTable
+
+RUN_KEYS = ["label", "engine", "topk", "cover"]
+ROW_FIELDS = (["hero", "mode", "tier", "window", "train", "test"] + RUN_KEYS +
+              ["code", "status", "order", "exact_sets", "exact_games", "exact_win", "near_games", "near_win",
+               "base_win", "exact_lift", "near_lift", "top_jaccard", "ms", "error"])
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    stamp: str  # 日期資料夾名
+    hero: str
+    mode: str
+    tier: str
+    window: str
+    winning_csv: str
+    sets_csv: str
+
+    @property
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.hero, self.mode, self.tier, self.window)
+
+
+@dataclass(frozen=True)
+class BacktestPair:
+    train: Snapshot
+    test: Snapshot
+
+
+def parse_stamp(name: str) -> Optional[datetime.datetime]:
+    for parse in (datetime.datetime.fromisoformat, lambda s: datetime.datetime.strptime(s, "%Y%m%d")):
+        try:
+            return parse(name)
+        except ValueError:
+            pass
+    return None
+
+
+def discover_snapshots(root: str) -> List[Snapshot]:
+    """root 下每個日期資料夾內的 winning/sets 配對；依日期由舊到新。"""
+    dated = []
+    for d in os.listdir(root) if os.path.isdir(root) else []:
+        if not os.path.isdir(os.path.join(root, d)):
+            continue
+        when = parse_stamp(d)
+        if when is None:
+            print(f"[warn] skip (not a date): {os.path.join(root, d)}")
+            continue
+        dated.append((when, d))
+    snaps = []
+    for _, d in sorted(dated):
+        for j in discover_jobs(os.path.join(root, d, "*_sets.csv")):
+            snaps.append(Snapshot(d, j.hero, j.mode, j.tier, j.window, j.winning_csv, j.sets_csv))
+    return snaps
+
+
+def pair_snapshots(snaps: Sequence[Snapshot], horizon: int = 1) -> List[BacktestPair]:
+    by_key: Dict[Tuple[str, str, str, str], List[Snapshot]] = {}
+    for s in snaps:
+        by_key.setdefault(s.key, []).append(s)
+    return [BacktestPair(seq[i], seq[i + horizon]) for _, seq in sorted(by_key.items())
+            for i in range(len(seq) - horizon)]
+
+
+def _wmean(win: np.ndarray, games: np.ndarray) -> float:
+    return float(np.average(win, weights=games)) if games.sum() > 0 else float("nan")
+
+
+def score_build(order: Sequence[str], table: SetTable) -> Dict:
+    """以 table（較晚快照）的套裝成績評分推薦組合。"""
+    want = list(dict.fromkeys(order))
+    vocab = {n: i for i, n in enumerate(table.names)}
+    ids = [vocab[n] for n in want if n in vocab]
+    # 每套含推薦裝備的件數（較晚快照沒出現的裝備不會命中）
+    hits = np.isin(table.ids, ids).sum(axis=1) if ids else np.zeros(len(table), dtype=int)
+    games = table.samples.astype(float)
+    exact, near = hits >= len(want), hits >= len(want) - 1
+    base = _wmean(table.win, games)
+    exact_win, near_win = _wmean(table.win[exact], games[exact]), _wmean(table.win[near], games[near])
+    top = set(table.items_of(int(np.argmax(table.samples)))) if len(table) else set()
+    union = top | set(want)
+    return {
+        "exact_sets": int(exact.sum()), "exact_games": int(games[exact].sum()), "exact_win": exact_win,
+        "near_games": int(games[near].sum()), "near_win": near_win, "base_win": base,
+        "exact_lift": exact_win - base, "near_lift": near_win - base,
+        "top_jaccard": len(top & set(want)) / len(union) if union else float("nan"),
+    }
+
+
+def backtest_one(task: Tuple[BacktestPair, Dict]) -> Dict:
+    pair, params = task
+    tr, te = pair.train, pair.test
+    row = {"hero": tr.hero, "mode": tr.mode, "tier": tr.tier, "window": tr.window, "train": tr.stamp,
+           "test": te.stamp, **{k: params[k] for k in RUN_KEYS}, "code": params["code"]}
+    try:
+        winning, sets = load_winning_items(tr.winning_csv), load_sets(tr.sets_csv, params["topk"], params["cover"])
+        later = load_set_table(te.sets_csv)
+        if not winning or not len(sets) or not len(later):
+            return {**row, "status": "empty"}
+        t0 = time.perf_counter()
+        result = ENGINES[params["engine"]](winning, sets, topk=params["topk"], cover=params["cover"], **params["extra"])
+        ms = (time.perf_counter() - t0) * 1e3
+        return {**row, "status": "ok", "order": "|".join(map(str, result.order)),
+                **score_build(result.order, later), "ms": round(ms, 4)}
+    except Exception as e:
+        return {**row, "status": "error", "error": repr(e)}
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """每個 label/engine/topk/cover 一列：組數、exact 命中率、場次加權勝率與 lift、耗時。"""
+    ok = df[df["status"] == "ok"].copy()
+    if ok.empty:
+        return pd.DataFrame(columns=RUN_KEYS)
+    ok["exact_wx"] = ok["exact_win"].fillna(0) * ok["exact_games"]
+    ok["base_wx"] = ok["base_win"] * ok["exact_games"]
+    g = ok.groupby(RUN_KEYS, sort=False)
+    out = g.agg(pairs=("hero", "size"), exact_hit=("exact_games", lambda s: float((s > 0).mean())),
+                exact_games=("exact_games", "sum"), exact_wx=("exact_wx", "sum"), base_wx=("base_wx", "sum"),
+                near_lift=("near_lift", "mean"), top_jaccard=("top_jaccard", "mean"), ms=("ms", "mean"))
+    # 場次加權：推薦組合在下一期的勝率，對照同一批場次下整體的勝率
+    out["exact_win"] = out["exact_wx"] / out["exact_games"].where(out["exact_games"] > 0)
+    out["exact_lift"] = out["exact_win"] - out["base_wx"] / out["exact_games"].where(out["exact_games"] > 0)
+    return out.drop(columns=["exact_wx", "base_wx"]).reset_index().round(4)
+
+
+def _read_results(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.lower().endswith(".parquet") else pd.read_csv(path)
+
+
+def write_results(path: str, rows: List[Dict], append: bool = False) -> pd.DataFrame:
+    """append 時保留其他 label/engine/topk/cover 的列，同一組參數重跑則取代。"""
+    df = pd.DataFrame(rows, columns=ROW_FIELDS)
+    if append and os.path.exists(path):
+        old = _read_results(path)
+        runs = set(map(tuple, df[RUN_KEYS].astype(str).drop_duplicates().to_numpy()))
+        keep = ~old[RUN_KEYS].astype(str).apply(tuple, axis=1).isin(runs)
+        df = pd.concat([old[keep], df], ignore_index=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.lower().endswith(".parquet"):
+        require_arrow()
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False, encoding="utf-8")
+    return df
+
+
+def run_backtest(root: str, *, engine: str = "greedy", topk: int = 50, cover: float = 0.80, horizon: int = 1,
+                 top_n: int = DEF_TOP_N, pool: int = DEF_POOL, label: Optional[str] = None, workers: int = 0,
+                 out: Optional[str] = None, append: bool = False) -> Tuple[List[Dict], pd.DataFrame]:
+    """回傳 (本次各組結果, 結果表的彙總)；out 給定時寫入結果表（append 時彙總含先前的 label）。"""
+    code = code_version()[:12]
+    params = dict(engine=engine, topk=topk, cover=cover, label=label or code, code=code,
+                  extra=_engine_kw(engine, top_n, pool))
+    tasks = [(p, params) for p in pair_snapshots(discover_snapshots(root), horizon)]
+    workers = workers or (os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        rows = [backtest_one(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+            rows = list(ex.map(backtest_one, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    table = write_results(out, rows, append) if out else pd.DataFrame(rows, columns=ROW_FIELDS)
+    return rows, summarize(table)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="replay dated winning/sets snapshots through the build engine")
+    ap.add_argument("--root", default=os.getenv("LOL_SNAPSHOTS", "data/snapshots"), help="{root}/{YYYY-MM-DD}/*_sets.csv")
+    ap.add_argument("--out", default="outputs/_backtest.csv", help=".csv or .parquet results table")
+    ap.add_argument("--append", action="store_true", help="keep rows of other label/engine/topk/cover runs")
+    ap.add_argument("--label", default=None, help="run label (default: code version)")
+    ap.add_argument("--engine", choices=list(ENGINES), default=os.getenv("LOL_ENGINE", "greedy"))
+    ap.add_argument("--topk", type=int, default=50)
+    ap.add_argument("--cover", type=float, default=0.80)
+    ap.add_argument("--top-n", type=int, default=DEF_TOP_N)
+    ap.add_argument("--pool", type=int, default=DEF_POOL)
+    ap.add_argument("--horizon", type=int, default=1, help="score against the snapshot N steps later")
+    ap.add_argument("--workers", type=int, default=0, help="0 = os.cpu_count()")
+    args = ap.parse_args()
+
+    rows, summary = run_backtest(args.root, engine=args.engine, topk=args.topk, cover=args.cover,
+                                 horizon=args.horizon, top_n=args.top_n, pool=args.pool, label=args.label,
+                                 workers=args.workers, out=args.out, append=args.append)
+    if not rows:
+        raise SystemExit(f"[error] no snapshot pairs under {args.root}")
+    for r in rows:
+        if r["status"] != "ok":
+            print(f"[warn] {r['hero']} {r['train']}->{r['test']}: {r['status']} {r.get('error', '')}".rstrip())
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(summary.to_string(index=False))
+    n_ok = sum(r["status"] == "ok" for r in rows)
+    print(f"[ok] backtest: pairs={len(rows)} ok={n_ok} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+增量建置的輸入雜湊清單（outputs/_build_manifest.json）。
+
+每個產出檔（target）記錄一個 key = sha256(輸入檔內容雜湊 + 參數 + 程式版本)。
+下次執行時 key 相同且產出檔仍在，就略過重算；程式版本取自相關原始碼檔的雜湊，
+改了演算法或輸出格式會自動失效，不需手動清快取。
+"""
+from __future__ import annotations
+import datetime, hashlib, json, os
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    from .scrape_ledger import file_sha256
+except ImportError:  # 以 python src/render_build.py 直接執行
+    from scrape_ledger import file_sha256
+
+MANIFEST_NAME = "_build_manifest.json"
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# pick_build 結果所依賴的原始碼
+ALGO_SOURCES = ("algo.py", "set_index.py", "set_table.py", "set_stats.py", "columnar.py", "io_schema.py", "pipeline.py",
+                "exact_search.py")
+
+
+def code_version(files: Iterable[str] = ALGO_SOURCES) -> str:
+    h = hashlib.sha256()
+    for name in files:
+        h.update(name.encode("utf-8"))
+        h.update((file_sha256(os.path.join(SRC_DIR, name)) or "").encode("ascii"))
+    return h.hexdigest()[:16]
+
+
+def input_key(inputs: Dict[str, str], params: Dict[str, Any], code: str) -> str:
+    """inputs: {角色: 路徑}；缺檔的雜湊為 None（與任何既有記錄都不同）。"""
+    doc = {
+        "inputs": {k: file_sha256(p) for k, p in sorted(inputs.items())},
+        "params": params,
+        "code": code,
+    }
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def manifest_for(target: str) -> str:
+    """target 所在目錄的清單檔路徑。"""
+    return os.path.join(os.path.dirname(os.path.abspath(target)), MANIFEST_NAME)
+
+
+class BuildManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.entries = json.load(f).get("targets", {})
+            except (OSError, ValueError):
+                self.entries = {}  # 損毀就當作沒有，全部重算
+
+    def _name(self, target: str) -> str:
+        return os.path.basename(target)
+
+    def is_current(self, target: str, key: str) -> bool:
+        rec = self.entries.get(self._name(target))
+        return bool(rec) and rec.get("key") == key and os.path.exists(target)
+
+    def record(self, target: str, key: str, inputs: Optional[Dict[str, str]] = None) -> None:
+        self.entries[self._name(target)] = {
+            "key": key,
+            "inputs": inputs or {},
+            "built_at": datetime.datetime.now().astimezone().isoformat(),
+        }
+
+    def save(self) -> None:
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"targets": self.entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
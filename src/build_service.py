@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+本機建置查詢服務（HTTP/JSON，asyncio）。
+
+啟動時預先載入資料目錄下所有英雄的 winning / sets，查詢結果以
+(英雄, 模式, 分段, 版本視窗, topk, cover, explain) 為 key 放進 LRU；
+資料檔（含 .parquet 旁檔）有變動時自動重新載入該英雄並清掉相關快取。
+
+  GET /build?champion=varus&mode=aram[&tier=d2_plus&patch=7&topk=50&cover=0.8&explain=1]
+      → {"spec", "build": {"boots", "order"}, "rationale", "cached", "ms"}
+  GET /champions → 已載入的 [{champion, mode, tier, patch}]
+  GET /health    → 載入數、快取命中統計、最後重新載入時間
+
+檔名：{hero}_{mode}_{tier}_{N}d_sets.csv（抓取器輸出），或 {hero}_{mode}_sets.csv（分段/視窗取預設值）。
+
+用法：
+  python -m src.build_service --data-dir data/processed --listen 127.0.0.1:8770
+  python scripts/loadtest_build_service.py --url http://127.0.0.1:8770 --requests 2000 --concurrency 16
+"""
+from __future__ import annotations
+import argparse, asyncio, datetime, glob, json, os, re, time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .algo import load_winning_items, load_set_table, pick_build
+from .io_schema import WinningItem
+from .pipeline import SETS_RE, _payload
+from .set_table import SetTable
+
+DEF_DATA_DIR = "data/processed"
+DEF_LISTEN = "127.0.0.1:8770"
+DEF_CACHE_SIZE = 1024
+DEF_POLL_S = 2.0
+DEF_TIER = "d2_plus"
+DEF_PATCH = "7"
+DEF_TOPK = 50
+DEF_COVER = 0.80
+
+SHORT_RE = re.compile(r"^(?P<hero>[^_]+)_(?P<mode>[^_]+)_sets\.csv$", re.IGNORECASE)
+
+DataKey = Tuple[str, str, str, str]  # champion, mode, tier, patch
+
+
+def dataset_key(name: str) -> Optional[DataKey]:
+    m = SETS_RE.match(name)
+    if m:
+        d = m.groupdict()
+        return d["hero"].lower(), d["mode"].lower(), d["tier"].lower(), d["window"].lower().rstrip("d")
+    m = SHORT_RE.match(name)
+    if m:
+        return m["hero"].lower(), m["mode"].lower(), DEF_TIER, DEF_PATCH
+    return None
+
+
+def _sig(paths: List[str]) -> Tuple:
+    """檔案變動簽章：(路徑, mtime_ns, 大小)；含同名 .parquet 旁檔。"""
+    out = []
+    for p in paths:
+        for q in (p, os.path.splitext(p)[0] + ".parquet"):
+            if os.path.exists(q):
+                st = os.stat(q)
+                out.append((q, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+@dataclass
+class Dataset:
+    winning_csv: str
+    sets_csv: str
+    sig: Tuple
+    winning: List[WinningItem]
+    sets: SetTable
+
+
+class BuildService:
+    def __init__(self, data_dir: str = DEF_DATA_DIR, cache_size: int = DEF_CACHE_SIZE):
+        self.data_dir = data_dir
+        self.cache_size = max(1, int(cache_size))
+        self.data: Dict[DataKey, Dataset] = {}
+        self.cache: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.hits = self.misses = self.reloads = 0
+        self.reloaded_at: Optional[str] = None
+
+    # ---- 資料載入 ----
+
+    def _scan(self) -> Dict[DataKey, Tuple[str, str]]:
+        found = {}
+        for sets_csv in sorted(glob.glob(os.path.join(self.data_dir, "*_sets.csv"))):
+            key = dataset_key(os.path.basename(sets_csv))
+            winning_csv = sets_csv[: -len("_sets.csv")] + "_winning.csv"
+            if key and os.path.exists(winning_csv):
+                found[key] = (winning_csv, sets_csv)
+        return found
+
+    def _load_changed(self) -> Tuple[List[DataKey], Dict[DataKey, Dataset]]:
+        """掃描資料目錄，只讀簽章變動的英雄；回傳 (已移除, 新載入)，不動到 self 的狀態（可在執行緒中跑）。"""
+        found = self._scan()
+        removed = [k for k in self.data if k not in found]
+        loaded = {}
+        for key, (winning_csv, sets_csv) in found.items():
+            sig = _sig([winning_csv, sets_csv])
+            cur = self.data.get(key)
+            if cur and cur.sig == sig:
+                continue
+            try:
+                loaded[key] = Dataset(winning_csv, sets_csv, sig, load_winning_items(winning_csv), load_set_table(sets_csv))
+            except Exception as e:  # 寫到一半的檔案：保留舊資料，下次輪詢再試
+                print(f"[warn] reload {sets_csv}: {e!r}")
+        return removed, loaded
+
+    def _apply(self, removed: List[DataKey], loaded: Dict[DataKey, Dataset]) -> List[DataKey]:
+        changed = removed + list(loaded)
+        for k in removed:
+            del self.data[k]
+        self.data.update(loaded)
+        if changed:
+            for ck in [ck for ck in self.cache if ck[:4] in changed]:
+                del self.cache[ck]
+            self.reloads += 1
+            self.reloaded_at = datetime.datetime.now().astimezone().isoformat()
+        return changed
+
+    def reload(self) -> List[DataKey]:
+        """重新掃描並套用；回傳有變動（新增/更新/移除）的 key。"""
+        return self._apply(*self._load_changed())
+
+    async def watch(self, poll_s: float = DEF_POLL_S) -> None:
+        while True:
+            await asyncio.sleep(poll_s)
+            # 讀檔放到執行緒，套用（改 data / cache）留在事件迴圈上
+            changed = self._apply(*await asyncio.to_thread(self._load_changed))
+            if changed:
+                print(f"[info] reloaded {len(changed)} dataset(s): {', '.join('/'.join(k) for k in changed)}")
+
+    # ---- 查詢 ----
+
+    def _compute(self, key: DataKey, ds: Dataset, topk: int, cover: float, explain: bool) -> Dict[str, Any]:
+        result = pick_build(ds.winning, ds.sets, explain=explain, topk=topk, cover=cover)
+        spec = {"champion": key[0], "mode": key[1].upper(), "tier": key[2], "window": f"{key[3]}d",
+                "topk": topk, "cover": cover}
+        return _payload(result, spec)
+
+    async def build(self, key: DataKey, topk: int = DEF_TOPK, cover: float = DEF_COVER,
+                    explain: bool = False) -> Tuple[Dict[str, Any], bool]:
+        """回傳 (payload, 是否命中快取)；同一 key 的並發查詢只計算一次。"""
+        ck = key + (topk, cover, explain)
+        hit = self.cache.get(ck)
+        if hit is not None:
+            self.cache.move_to_end(ck)
+            self.hits += 1
+            return hit, True
+        ds = self.data.get(key)
+        if ds is None:
+            raise KeyError("/".join(key))
+        fut = self._inflight.get(ck)
+        if fut is None:
+            self.misses += 1
+            fut = asyncio.ensure_future(asyncio.to_thread(self._compute, key, ds, topk, cover, explain))
+            self._inflight[ck] = fut
+            fut.add_done_callback(lambda f: self._settle(ck, key, ds, f))
+            # 發起的請求被取消（如連線中斷）時計算照常完成，併入的請求與快取不受影響
+            return await asyncio.shield(fut), False
+        self.hits += 1  # 併入進行中的同一計算
+        return await asyncio.shield(fut), True
+
+    def _settle(self, ck: Tuple, key: DataKey, ds: Dataset, fut: asyncio.Future) -> None:
+        """計算結束（不論由誰等待）：移出進行中表，成功且資料未變才寫入快取。"""
+        self._inflight.pop(ck, None)
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        if self.data.get(key) is ds:  # 計算期間資料被更新或移除就不寫入快取
+            self.cache[ck] = fut.result()
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"datasets": len(self.data), "cache": len(self.cache), "cache_size": self.cache_size,
+                "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 4) if total else None,
+                "reloads": self.reloads, "reloaded_at": self.reloaded_at}
+
+    async def handle(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        if method != "GET":
+            return 405, {"error": "GET only"}
+        url = urlsplit(target)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return 200, self.stats()
+        if url.path == "/champions":
+            return 200, {"champions": [dict(zip(("champion", "mode", "tier", "patch"), k)) for k in sorted(self.data)]}
+        if url.path != "/build":
+            return 404, {"error": f"unknown path {url.path}"}
+        if not q.get("champion"):
+            return 400, {"error": "champion is required"}
+        key = (q["champion"].lower(), q.get("mode", "aram").lower(), q.get("tier", DEF_TIER).lower(),
+               q.get("patch", DEF_PATCH).lower().rstrip("d"))
+        try:
+            topk, cover = int(q.get("topk", DEF_TOPK)), float(q.get("cover", DEF_COVER))
+        except ValueError:
+            return 400, {"error": "topk must be int and cover float"}
+        explain = q.get("explain", "0").lower() in ("1", "true", "yes")
+        t0 = time.perf_counter()
+        try:
+            payload, cached = await self.build(key, topk, cover, explain)
+        except KeyError:
+            return 404, {"error": f"no data for {'/'.join(key)}"}
+        return 200, {**payload, "cached": cached, "ms": round((time.perf_counter() - t0) * 1e3, 3)}
+
+    # ---- HTTP ----
+
+    async def _on_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                if len(parts) != 3:
+                    status, body = 400, {"error": "bad request line"}
+                else:
+                    try:
+                        status, body = await self.handle(parts[0], parts[1])
+                    except Exception as e:
+                        status, body = 500, {"error": repr(e)}
+                keep = headers.get("connection", "").lower() != "close" and len(parts) == 3 and parts[2] == "HTTP/1.1"
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                              f"Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, poll_s: float = DEF_POLL_S) -> None:
+        server = await asyncio.start_server(self._on_conn, host, port)
+        watcher = asyncio.ensure_future(self.watch(poll_s)) if poll_s > 0 else None
+        print(f"[ok] build service on http://{host}:{port} datasets={len(self.data)}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher:
+                watcher.cancel()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="serve pick_build results over local HTTP/JSON")
+    ap.add_argument("--data-dir", default=os.getenv("LOL_DATA_DIR", DEF_DATA_DIR))
+    ap.add_argument("--listen", default=os.getenv("LOL_BUILD_SERVICE", DEF_LISTEN), help="HOST:PORT")
+    ap.add_argument("--cache-size", type=int, default=DEF_CACHE_SIZE, help="LRU 筆數上限")
+    ap.add_argument("--poll", type=float, default=DEF_POLL_S, help="檢查資料檔變動的秒數；0 = 不自動重新載入")
+    args = ap.parse_args()
+
+    svc = BuildService(args.data_dir, args.cache_size)
+    t0 = time.perf_counter()
+    svc.reload()
+    if not svc.data:
+        raise SystemExit(f"[error] no *_sets.csv / *_winning.csv pairs under {args.data_dir}")
+    print(f"[info] preloaded {len(svc.data)} dataset(s) in {time.perf_counter() - t0:.2f}s")
+    host, _, port = args.listen.rpartition(":")
+    try:
+        asyncio.run(svc.serve(host or "127.0.0.1", int(port), args.poll))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Parquet 欄式儲存（pyarrow 為選用相依；未安裝時一律沿用 CSV）。
+
+- 抓取輸出：CSV 旁寫同名 .parquet（檔名已含 hero/mode/tier/patch，即一個分區）；
+  sets 另拆成固定寬度欄位 item1..5（名稱）與 item_id1..5（int32，由圖片 URL 取得）。
+- 正規化輸出：以 hive 分區目錄 source_champion=/source_mode=/source_tier=/window= 寫成資料集。
+- 讀取：給 .parquet 直接讀；給 .csv 而旁邊有不舊於它的 .parquet 時改讀 parquet（memory map）。
+"""
+from __future__ import annotations
+import os, re
+from typing import List, Optional
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_ARROW = True
+except ImportError:
+    pa = pq = None
+    HAVE_ARROW = False
+
+FORMATS = ("csv", "parquet", "both")
+DEF_FORMAT = "csv"
+
+ITEM_NAME_COLS = [f"item{i}" for i in range(1, 6)]
+ITEM_ID_COLS = [f"item_id{i}" for i in range(1, 6)]
+IMG_ID_RE = re.compile(r"/(\d+)\.webp")
+SET_COLS = ["items", "items_img", "set_win_rate", "set_pick_rate", "set_sample_size"]
+DEF_CHUNK_ROWS = 500
+
+
+def require_arrow() -> None:
+    if not HAVE_ARROW:
+        raise RuntimeError("parquet 格式需要 pyarrow（pip install pyarrow）")
+
+
+def sidecar_path(csv_path: str) -> str:
+    root, ext = os.path.splitext(csv_path)
+    return root + ".parquet" if ext.lower() == ".csv" else csv_path + ".parquet"
+
+
+def parquet_for(path: str) -> Optional[str]:
+    """path 對應可讀的 parquet 檔；沒有（或比 CSV 舊、或未裝 pyarrow）回傳 None。"""
+    if not HAVE_ARROW:
+        return None
+    if path.lower().endswith(".parquet"):
+        return path if os.path.exists(path) else None
+    pq_path = sidecar_path(path)
+    if not os.path.exists(pq_path):
+        return None
+    if os.path.exists(path) and os.path.getmtime(pq_path) < os.path.getmtime(path):
+        return None  # CSV 較新（例如手動修改過），以 CSV 為準
+    return pq_path
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """讀表：有 parquet 就以 memory map 讀取，否則讀 CSV。"""
+    pq_path = parquet_for(path)
+    if pq_path is not None:
+        return pq.read_table(pq_path, memory_map=True).to_pandas()
+    return pd.read_csv(path)
+
+
+def _split5(s: pd.Series) -> pd.DataFrame:
+    parts = s.fillna("").astype(str).str.split("|", n=4, expand=True).reindex(columns=range(5))
+    return parts.apply(lambda c: c.str.strip())
+
+
+def sets_columnar(set_df: pd.DataFrame) -> pd.DataFrame:
+    """抓取的 sets 表 → 加上固定寬度欄位；保留原本的 items / items_img 以便匯回 CSV。"""
+    out = set_df.copy()
+    if out.empty:
+        for c in ITEM_NAME_COLS:
+            out[c] = pd.Series(dtype=object)
+        for c in ITEM_ID_COLS:
+            out[c] = pd.Series(dtype="Int32")
+        return out
+    names, imgs = _split5(out["items"]), _split5(out["items_img"])
+    for i in range(5):
+        out[ITEM_NAME_COLS[i]] = names[i].where(names[i].notna() & (names[i] != ""), None).astype(object)
+        ids = imgs[i].str.extract(IMG_ID_RE, expand=False)
+        out[ITEM_ID_COLS[i]] = pd.to_numeric(ids, errors="coerce").astype("Int32")
+    return out
+
+
+def items_of(df: pd.DataFrame) -> List[List[str]]:
+    """每列的裝備名稱 list：有 item1..5 欄直接取用，否則拆 items 的 | 字串。"""
+    if all(c in df.columns for c in ITEM_NAME_COLS):
+        rows = df[ITEM_NAME_COLS].to_numpy(dtype=object).tolist()
+        return [[str(x).strip() for x in r if isinstance(x, str) and x.strip()] for r in rows]
+    return [[s.strip() for s in str(x).split("|") if s.strip()] for x in df["items"].tolist()]
+
+
+def write_table(df: pd.DataFrame, csv_path: str, fmt: str = DEF_FORMAT, *, csv_df: Optional[pd.DataFrame] = None) -> List[str]:
+    """依 fmt 寫出 CSV 與／或旁檔 parquet；回傳寫出的路徑。csv_df 為 CSV 匯出用的欄位子集。"""
+    d = os.path.dirname(csv_path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    written = []
+    if fmt in ("parquet", "both"):
+        require_arrow()
+        p = sidecar_path(csv_path)
+        df.to_parquet(p, index=False, engine="pyarrow")
+        written.append(p)
+    if fmt in ("csv", "both"):
+        (df if csv_df is None else csv_df).to_csv(csv_path, index=False, encoding="utf-8")
+        written.append(csv_path)
+    return written
+
+
+def write_dataset(df: pd.DataFrame, root: str, partition_cols: List[str]) -> None:
+    """以 hive 分區（col=value/）寫 parquet 資料集；重寫時覆蓋同一分區。item_id* 存成 int32。"""
+    require_arrow()
+    if df.empty:
+        return
+    parts = df.copy()
+    for c in partition_cols:
+        parts[c] = parts[c].astype(str).where(parts[c].notna(), "__null__")
+    for c in parts.columns:
+        if c.startswith("item_id"):
+            parts[c] = pd.to_numeric(parts[c], errors="coerce").astype("Int32")
+    table = pa.Table.from_pandas(parts, preserve_index=False)
+    pq.write_to_dataset(table, root, partition_cols=partition_cols,
+                        existing_data_behavior="delete_matching")
+
+
+def read_dataset(root: str, filters=None) -> pd.DataFrame:
+    require_arrow()
+    return pq.read_table(root, filters=filters, memory_map=True).to_pandas()
+
+
+
+def _sets_schema():
+    return pa.schema(
+        [("items", pa.string()), ("items_img", pa.string()), ("set_win_rate", pa.float64()),
+         ("set_pick_rate", pa.float64()), ("set_sample_size", pa.int64())]
+        + [f for n, i in zip(ITEM_NAME_COLS, ITEM_ID_COLS) for f in ((n, pa.string()), (i, pa.int32()))]
+    )
+
+
+class SetsChunkWriter:
+    """邊抓邊寫的 sets 輸出：每 chunk_rows 列寫一次（CSV 追加、parquet 一個 row group），記憶體只留一個 chunk。"""
+
+    def __init__(self, csv_path: str, fmt: str = DEF_FORMAT, chunk_rows: int = DEF_CHUNK_ROWS):
+        self.csv_path = csv_path
+        self.fmt = fmt
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.rows = 0
+        self._buf: List[dict] = []
+        self._csv_started = False
+        self._pq_writer = None
+        if fmt in ("parquet", "both"):
+            require_arrow()
+        d = os.path.dirname(csv_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def append(self, row: dict) -> None:
+        self._buf.append(row)
+        self.rows += 1
+        if len(self._buf) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buf and (self._csv_started or self.fmt not in ("csv", "both")):
+            return
+        df = pd.DataFrame(self._buf, columns=SET_COLS)
+        self._buf = []
+        if self.fmt in ("csv", "both"):
+            df.to_csv(self.csv_path, mode="a" if self._csv_started else "w", header=not self._csv_started,
+                      index=False, encoding="utf-8")
+            self._csv_started = True
+        if self.fmt in ("parquet", "both") and len(df):
+            self._write_parquet(df)
+
+    def _write_parquet(self, df: pd.DataFrame) -> None:
+        # 固定 schema（含 pandas metadata，讀回時 item_id* 仍為 Int32），各 chunk 型別一致
+        table = pa.Table.from_pandas(sets_columnar(df), schema=_sets_schema(), preserve_index=False)
+        if self._pq_writer is None:
+            self._pq_writer = pq.ParquetWriter(sidecar_path(self.csv_path), table.schema)
+        self._pq_writer.write_table(table)
+
+    def close(self) -> int:
+        self.flush()
+        if self.fmt in ("parquet", "both"):
+            if self._pq_writer is None:  # 沒有任何列仍寫出空表
+                self._write_parquet(pd.DataFrame(columns=SET_COLS))
+            self._pq_writer.close()
+            self._pq_writer = None
+        return self.rows
+
+    def __enter__(self) -> "SetsChunkWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+精確搜尋引擎：對候選池中所有 5 件組合評分，以上界剪枝取前 N 名（branch-and-bound）。
+
+組合分數沿用 pick_build 的訊號，拆成可加總的三項：
+- 單件：Σ _score_item（勝率 logit、pick、在 top-K 套裝中的樣本權重）；
+- 兩兩：¼ · Σ [log(共同支撐度 + ½/K) + log(共同出現時的平均勝率 / 全體平均勝率)]，每件參與 4 對，¼ 讓尺度與單件相當；
+- 整組：log((同時含 5 件的套裝數 + ½) / ½)，即完整組合的支撐度加分。
+部分組合的上界 = 目前分數 + 剩餘名額可拿到的最大單件/對既選件增益 + 未選件之間的最大兩兩分數
++ 以目前 mask 計的整組加分（套裝數只會隨選件變少），所以剪掉的分支不可能進入前 N。
+"""
+from __future__ import annotations
+import heapq, itertools
+from math import comb
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from . import set_index as sx
+from .algo import (BuildResult, EPS, _dynamic_candidates, _resolve_top_sets, _score_item, _weight_by_item)
+from .io_schema import WinningItem, BuiltSet
+from .set_stats import SetStats
+from .set_table import SetTable
+from .spans import Tracer, NULL_TRACER
+
+BUILD_SIZE = 5
+DEF_TOP_N = 5
+DEF_POOL = 16  # 候選池：C0 之外以 win×pick 補到此數量
+PAIR_W = 1.0 / (BUILD_SIZE - 1)
+
+
+@dataclass
+class ScoredBuild:
+    items: List[str]  # 依位次排序
+    score: float
+    support: float
+    detail: Dict[str, float] = field(default_factory=dict)
+
+
+class ComboScorer:
+    """候選池 × top-K 套裝的評分表：單件分數 u、兩兩分數 P 與每件的 set mask。"""
+
+    def __init__(self, pool: List[WinningItem], index: sx.SetIndex):
+        self.names = [w.name for w in pool]
+        self.index = index
+        K = max(len(index), 1)
+        weight = _weight_by_item(pool, index)
+        self.u = np.array([_score_item(w, weight.get(w.name, 1e-6)) for w in pool], dtype=float)
+        self.masks = np.array([index.row(n) for n in self.names], dtype=bool).reshape(len(pool), len(index))
+        m = self.masks.astype(np.int64)
+        co = m @ m.T
+        win_co = (m * index.win) @ m.T
+        mean_all = float(np.average(index.win)) if len(index) else 0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_co = np.where(co > 0, win_co / np.maximum(co, 1), mean_all)
+        lift = (mean_co + EPS) / (mean_all + EPS)
+        self.P = PAIR_W * (np.log(co / K + 0.5 / K) + np.log(lift))
+        np.fill_diagonal(self.P, 0.0)
+        n = len(pool)
+        self.pmax = float(self.P[np.triu_indices(n, 1)].max()) if n > 1 else 0.0
+
+    @staticmethod
+    def _bonus(count: int) -> float:
+        return float(np.log((count + 0.5) / 0.5))
+
+    def score(self, ids: Sequence[int]) -> Tuple[float, Dict[str, float]]:
+        ids = list(ids)
+        unary = float(self.u[ids].sum())
+        pair = float(sum(self.P[a, b] for a, b in itertools.combinations(ids, 2)))
+        cnt = int(np.logical_and.reduce(self.masks[ids]).sum()) if len(self.index) else 0
+        bonus = self._bonus(cnt)
+        return unary + pair + bonus, {"unary": unary, "pair": pair, "bonus": bonus, "sets": cnt}
+
+    def search(self, n: int = DEF_TOP_N, size: int = BUILD_SIZE) -> Tuple[List[Tuple[float, Tuple[int, ...]]], Dict[str, int]]:
+        """回傳分數由高到低的 [(score, ids)]，以及 {evaluated, pruned} 計數。"""
+        m = len(self.names)
+        size = min(size, m)
+        # 單件分數高者先展開，較早填滿前 N 讓剪枝門檻變高
+        order = np.argsort(-self.u, kind="stable")
+        u, P, masks = self.u[order], self.P[np.ix_(order, order)], self.masks[order]
+        heap: List[Tuple[float, Tuple[int, ...]]] = []
+        stats = {"evaluated": 0, "pruned": 0}
+
+        def visit(start: int, chosen: List[int], base: float, mask: np.ndarray) -> None:
+            r = size - len(chosen)
+            cnt = int(mask.sum())
+            if r == 0:
+                stats["evaluated"] += 1
+                item = (base + self._bonus(cnt), tuple(sorted(int(order[c]) for c in chosen)))
+                if len(heap) < n:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+                return
+            gains = u[start:] + (P[chosen, start:].sum(axis=0) if chosen else 0.0)
+            if len(gains) < r:
+                return
+            best_r = float(np.sort(gains)[-r:].sum())
+            bound = base + best_r + (r * (r - 1) / 2) * self.pmax + self._bonus(cnt)
+            if len(heap) >= n and bound < heap[0][0] - 1e-9:  # 容許浮點誤差，同分者不剪
+                stats["pruned"] += 1
+                return
+            for k in range(len(gains) - r + 1):
+                j = start + k
+                visit(j + 1, chosen + [j], base + float(gains[k]), mask & masks[j])
+
+        visit(0, [], 0.0, np.ones(len(self.index), dtype=bool))
+        return sorted(heap, reverse=True), stats
+
+
+def _pool(winning: List[WinningItem], C0: List[WinningItem], size: int) -> List[WinningItem]:
+    """C0 全部保留；不足 size 時依 win×pick 由 winning 其餘裝備補足。"""
+    pool = list(C0)
+    seen = {w.name for w in pool}
+    for w in sorted(winning, key=lambda w: w.win_rate * w.pick_rate, reverse=True):
+        if len(pool) >= max(size, BUILD_SIZE):
+            break
+        if w.name not in seen:
+            pool.append(w)
+            seen.add(w.name)
+    return pool
+
+
+def top_builds(winning: List[WinningItem], sets: List[BuiltSet] | SetTable | SetStats, *,
+               topk: int = 50, cover: float = 0.80, top_n: int = DEF_TOP_N, pool: int = DEF_POOL,
+               tracer: Optional[Tracer] = None) -> Tuple[List[ScoredBuild], Dict]:
+    tr = tracer or NULL_TRACER
+    with tr.span("candidates", winning=len(winning)) as rec:
+        C0, meta = _dynamic_candidates(winning)
+        cands = _pool(winning, C0, pool)
+        rec["candidates"] = len(C0)
+        rec["pool"] = len(cands)
+    with tr.span("topk", sets_scanned=0 if isinstance(sets, SetStats) else len(sets),
+                 precomputed=isinstance(sets, SetStats)) as rec:
+        top_sets = _resolve_top_sets(sets, topk, cover)
+        rec["top_sets"] = len(top_sets)
+    with tr.span("index", sets=len(top_sets), use_index=True):
+        index = sx.SetIndex(top_sets)
+    with tr.span("pairs", pool=len(cands)):
+        scorer = ComboScorer(cands, index)
+    with tr.span("search", pool=len(cands), top_n=top_n) as rec:
+        found, stats = scorer.search(top_n)
+        combos = comb(len(cands), min(BUILD_SIZE, len(cands)))
+        rec.update(stats, combinations=combos)
+    builds = []
+    with tr.span("ordering", sets_scanned=len(top_sets) * len(found)):
+        for score, ids in found:
+            names = [scorer.names[i] for i in ids]
+            _, detail = scorer.score(ids)
+            builds.append(ScoredBuild(sx.order_by_position(names, index, eps=EPS), score,
+                                      detail["sets"] / max(len(index), 1), detail))
+    info = {"thresholds": meta, "C0": [w.name for w in C0], "pool": scorer.names,
+            "top_sets_used": len(top_sets), **stats,
+            "combinations": combos}
+    return builds, info
+
+
+def pick_build_exact(winning: List[WinningItem], sets: List[BuiltSet] | SetTable | SetStats, *,
+                     explain: bool = False, topk: int = 50, cover: float = 0.80, top_n: int = DEF_TOP_N,
+                     pool: int = DEF_POOL, tracer: Optional[Tracer] = None) -> BuildResult:
+    """與 pick_build 相同的輸入/輸出；order 為最高分組合，rationale["alternatives"] 列出前 N 名與分數。"""
+    builds, info = top_builds(winning, sets, topk=topk, cover=cover, top_n=top_n, pool=pool, tracer=tracer)
+    meta = info["thresholds"]
+    best = builds[0].items if builds else []
+    rationale = {
+        "engine": "exact",
+        "dynamic_thresholds": {
+            "P50": meta.get("P50"), "P75": meta.get("P75"),
+            "W50": meta.get("W50"), "W75": meta.get("W75"),
+            "GlobalAvgWin": meta.get("GlobalAvgWin"),
+            "PickCut": meta.get("PickCut"), "WinCut": meta.get("WinCut"),
+        },
+        "top_sets_used": info["top_sets_used"],
+        "search": {"pool": len(info["pool"]), "combinations": info["combinations"],
+                   "evaluated": info["evaluated"], "pruned": info["pruned"]},
+        "alternatives": [{"order": b.items, "score": round(b.score, 6), "support": b.support} for b in builds],
+    }
+    if explain:
+        rationale["explain"] = {
+            "C0": info["C0"],
+            "pool": info["pool"],
+            "score_terms": [{k: (round(v, 6) if isinstance(v, float) else v) for k, v in b.detail.items()} for b in builds],
+        }
+    return BuildResult(boots="狂戰士護脛", order=best, rationale=rationale)
@@ -1,16 +1,21 @@
 # src/fix_boots.py
 from __future__ import annotations
-import argparse, json
+import argparse, json, os
 from pathlib import Path
 import pandas as pd
 
+try:
+    from .item_index import DEF_ALIASES, DEF_ITEMS_MAP, ItemIndex, load_item_index
+except ImportError:  # 以 python src/fix_boots.py 直接執行
+    from item_index import DEF_ALIASES, DEF_ITEMS_MAP, ItemIndex, load_item_index
+
 BOOT_HINT = "靴|鞋|護脛|Greaves|Treads|Tabi|Boots"
 
 def _to_unit(s):
     v = pd.to_numeric(s, errors="coerce").fillna(0.0).astype(float)
     return v.where(v <= 1.0, v / 100.0)
 
-def pick_boot_from_winning(winning_csv: Path) -> str | None:
+def pick_boot_from_winning(winning_csv: Path, idx: ItemIndex | None = None) -> str | None:
     if not winning_csv.exists():
         print(f"[warn] winning.csv not found: {winning_csv}")
         return None
@@ -29,9 +34,12 @@ def pick_boot_from_winning(winning_csv: Path) -> str | None:
         print("[warn] winning.csv missing pick_rate/win_rate")
         return None
 
-    # 僅保留疑似靴子，排除「鞋子」
+    # 僅保留疑似靴子，排除「鞋子」；給 idx 時查得到的裝備改依 items_map 的 Boots 標籤，查不到的退回名稱比對
     name = df["name"].astype(str)
     mask = name.str.contains(BOOT_HINT, regex=True, na=False) & (name != "鞋子")
+    if idx is not None:
+        by_tag = name.map(idx.is_boots)
+        mask = by_tag.where(by_tag.notna(), mask).astype(bool)
     cand = df.loc[mask, ["name", "pick_rate", "win_rate"]].copy()
     if cand.empty:
         return None
@@ -51,10 +59,16 @@ def main():
     ap.add_argument("--json", required=True, help="path to build json (will be updated in-place)")
     ap.add_argument("--winning_csv", required=True)
     ap.add_argument("--sets_csv", required=False)  # 兼容 batch 參數，實際不使用
+    ap.add_argument("--items-map", default=DEF_ITEMS_MAP)
+    ap.add_argument("--item-aliases", default=DEF_ALIASES)
+    ap.add_argument("--boots-by-tag", action="store_true",
+                    help="依 items_map 的 Boots 標籤判定靴子（可認出名稱規則漏掉的，如鬼蟹）；預設只用名稱規則")
     args = ap.parse_args()
 
     json_path = Path(args.json)
-    boots = pick_boot_from_winning(Path(args.winning_csv))
+    use_tags = args.boots_by_tag and os.path.exists(args.items_map)
+    idx = load_item_index(args.items_map, args.item_aliases) if use_tags else None
+    boots = pick_boot_from_winning(Path(args.winning_csv), idx)
 
     # 載入/更新 JSON
     cfg = json.loads(json_path.read_text(encoding="utf-8"))
@@ -1,14 +1,15 @@
 from dataclasses import dataclass
 from typing import List
 
-@dataclass
+# slots=True：每筆不帶 __dict__，大量載入時較省記憶體
+@dataclass(slots=True)
 class WinningItem:
     name: str
     win_rate: float   # 0~1
     pick_rate: float  # 0~1
     sample_size: int
 
-@dataclass
+@dataclass(slots=True)
 class BuiltSet:
     items: List[str]          # 中文裝備名 list
     set_win_rate: float       # 0~1
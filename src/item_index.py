@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+裝備名稱/ID 解析器（items_map + item_aliases）與預先編譯的快照。
+
+快照 data/ref/items_index_{ddragon_version}.pkl 存的是已建好的查詢表（純 dict，不含類別），
+記錄來源檔的內容雜湊；來源改了或版本不同就重新編譯。同一行程內再次載入直接取記憶體中的實例。
+正規化腳本、fix_boots 與 render_build 都透過 load_item_index() 共用同一個解析器。
+
+用法：
+  python -m src.item_index --items-map data/ref/items_map.csv --aliases data/ref/item_aliases.csv
+"""
+from __future__ import annotations
+import argparse, bisect, csv, glob, hashlib, json, os, pickle, re
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+
+ItemT = Tuple[int, str, Optional[str]]
+
+DEF_ITEMS_MAP = "data/ref/items_map.csv"
+DEF_ALIASES = "data/ref/item_aliases.csv"
+SNAPSHOT_FMT = 2
+BASIC_BOOTS_ID = 1001  # 「鞋子」：未升級的基本鞋不算成品靴子
+
+_TABLES = ("by_id", "tags", "key_en", "first_en", "key_zh", "norm_en", "norm_zh", "alias")
+_LOADED: Dict[Tuple, "ItemIndex"] = {}
+
+
+def norm_key(s: str) -> str:
+    return re.sub(r"[^a-z0-9\u4e00-\u9fff]+", "", s.lower())
+
+
+def _norm_str(s):
+    return None if pd.isna(s) else str(s).strip()
+
+
+class ItemIndex:
+    """O(1) 查詢：數字 ID → 別名 → 英文/中文（小寫）→ 英文/中文（去符號）。"""
+
+    def __init__(self, items: Iterable[Tuple[int, Optional[str], Optional[str], str]] = (),
+                 aliases: Iterable[Dict[str, str]] = (), version: str = ""):
+        self.version = version
+        self.by_id: Dict[int, ItemT] = {}
+        self.tags: Dict[int, Tuple[str, ...]] = {}
+        self.key_en: Dict[str, ItemT] = {}
+        self.first_en: Dict[str, ItemT] = {}  # 同名取 items_map 中第一筆（find_en 用）
+        self.key_zh: Dict[str, ItemT] = {}
+        self.norm_en: Dict[str, ItemT] = {}
+        self.norm_zh: Dict[str, ItemT] = {}
+        for iid, en, zh, tags in items:
+            tup: ItemT = (iid, en, zh)
+            self.by_id[iid] = tup
+            self.tags[iid] = tuple(t for t in (tags or "").split(",") if t)
+            if en:
+                k = en.lower(); self.key_en[k] = tup; self.norm_en[norm_key(k)] = tup
+                self.first_en.setdefault(k, tup)
+            if zh:
+                z = zh.lower(); self.key_zh[z] = tup; self.norm_zh[norm_key(z)] = tup
+        self.alias: Dict[str, Optional[ItemT]] = {}
+        for row in aliases:
+            zh = (row.get("alias_zh") or "").strip(); en = (row.get("alias_en") or "").strip().lower()
+            iid = (row.get("item_id") or "").strip()
+            tgt: Optional[ItemT] = self.by_id.get(int(iid)) if iid.isdigit() else None
+            if tgt is None and en:
+                tgt = self.key_en.get(en) or self.norm_en.get(norm_key(en))
+            if zh:
+                self.alias[norm_key(zh)] = tgt
+
+    @classmethod
+    def from_files(cls, items_map: str = DEF_ITEMS_MAP, aliases: Optional[str] = DEF_ALIASES) -> "ItemIndex":
+        with open(items_map, newline="", encoding="utf-8") as f:
+            items = [(int(r["item_id"]), r.get("en_name") or None, r.get("zh_tw_name") or None, r.get("tags") or "")
+                     for r in csv.DictReader(f)]
+        alias_rows = []
+        if aliases and os.path.exists(aliases):
+            with open(aliases, newline="", encoding="utf-8") as f:
+                alias_rows = list(csv.DictReader(f))
+        return cls(items, alias_rows, read_items_map_version(items_map))
+
+    def find(self, token) -> Optional[ItemT]:
+        s = _norm_str(token)
+        if s is None:
+            return None
+        if s.isdigit():
+            return self.by_id.get(int(s))
+        norm = norm_key(s); low = s.lower()
+        return (self.alias.get(norm) or self.key_en.get(low) or self.key_zh.get(low)
+                or self.norm_en.get(norm) or self.norm_zh.get(norm))
+
+    def find_en(self, token) -> Optional[ItemT]:
+        """只認數字 ID 與英文名（不分大小寫，同名取第一筆）；與舊版 normalize_outputs 的逐列比對結果相同。"""
+        s = _norm_str(token)
+        if s is None:
+            return None
+        return self.by_id.get(int(s)) if s.isdigit() else self.first_en.get(s.lower())
+
+    def is_boots(self, token) -> Optional[bool]:
+        hit = self.find(token)
+        if hit is None:
+            return None
+        return hit[0] != BASIC_BOOTS_ID and "Boots" in self.tags.get(hit[0], ())
+
+    # ---- 快照 ----
+
+    def _state(self) -> Dict:
+        return {"version": self.version, **{t: getattr(self, t) for t in _TABLES}}
+
+    @classmethod
+    def _from_state(cls, state: Dict) -> "ItemIndex":
+        idx = cls(version=state["version"])
+        for t in _TABLES:
+            setattr(idx, t, state[t])
+        return idx
+
+
+def read_items_map_version(items_map_path: str) -> str:
+    meta_path = os.path.join(os.path.dirname(os.path.abspath(items_map_path)), "items_map_meta.json")
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("ddragon_version") or ""
+        except Exception:
+            pass
+    m = re.search(r"items_map_([0-9.]+)\.csv$", items_map_path)
+    return m.group(1) if m else ""
+
+
+def snapshot_path(items_map: str, version: Optional[str] = None) -> str:
+    """data/ref/items_map.csv → data/ref/items_index_{ver}.pkl"""
+    ver = read_items_map_version(items_map) if version is None else version
+    return os.path.join(os.path.dirname(os.path.abspath(items_map)), f"items_index_{ver or 'unversioned'}.pkl")
+
+
+def _digest(path: Optional[str]) -> Optional[str]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def _sources(items_map: str, aliases: Optional[str]) -> Dict[str, Optional[str]]:
+    return {"items_map": _digest(items_map), "aliases": _digest(aliases)}
+
+
+def compile_snapshot(items_map: str = DEF_ITEMS_MAP, aliases: Optional[str] = DEF_ALIASES,
+                     out: Optional[str] = None) -> Tuple[str, ItemIndex]:
+    idx = ItemIndex.from_files(items_map, aliases)
+    out = out or snapshot_path(items_map, idx.version)
+    doc = {"format": SNAPSHOT_FMT, "sources": _sources(items_map, aliases), **idx._state()}
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    tmp = out + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(doc, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+    return out, idx
+
+
+def load_item_index(items_map: str = DEF_ITEMS_MAP, aliases: Optional[str] = DEF_ALIASES,
+                    snapshot: Optional[str] = None) -> ItemIndex:
+    """讀快照；不存在、版本或來源雜湊不符時重新編譯並寫回（寫不進去就只用記憶體中的結果）。"""
+    ver = read_items_map_version(items_map)
+    path = snapshot or snapshot_path(items_map, ver)
+    src = _sources(items_map, aliases)
+    memo = (os.path.abspath(path), tuple(sorted(src.items())))
+    if memo in _LOADED:
+        return _LOADED[memo]
+    idx = None
+    try:
+        with open(path, "rb") as f:
+            doc = pickle.load(f)
+        if doc.get("format") == SNAPSHOT_FMT and doc.get("version") == ver and doc.get("sources") == src:
+            idx = ItemIndex._from_state(doc)
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, TypeError):
+        idx = None
+    if idx is None:
+        try:
+            _, idx = compile_snapshot(items_map, aliases, path)
+        except OSError as e:
+            print(f"[warn] item index snapshot not written: {e!r}")
+            idx = ItemIndex.from_files(items_map, aliases)
+    _LOADED[memo] = idx
+    return idx
+
+
+# ---- 多版本（依 patch / 抓取日期解析） ----
+
+VERSIONED_RE = re.compile(r"^items_map_(?P<ver>\d+(?:\.\d+)*)\.csv$")
+VERSIONS_REGISTRY = "items_versions.json"  # {ver: {"first_seen": ISO 時間}}，由 build_items_map 維護
+HISTORY_SNAPSHOT = "items_history.pkl"
+
+ItemRec = Tuple[Optional[str], Optional[str], str]  # en, zh, tags
+Segment = Tuple[int, int, ItemRec]                  # 版本序 [起, 迄]（含）內容相同
+
+
+def version_key(ver: str) -> Tuple[int, ...]:
+    return tuple(int(x) for x in re.findall(r"\d+", str(ver)))
+
+
+def versioned_maps(ref_dir: str) -> Dict[str, str]:
+    """{ver: items_map_{ver}.csv}，依版本由舊到新。"""
+    found = {}
+    for p in glob.glob(os.path.join(ref_dir, "items_map_*.csv")):
+        m = VERSIONED_RE.match(os.path.basename(p))
+        if m:
+            found[m["ver"]] = p
+    return dict(sorted(found.items(), key=lambda kv: version_key(kv[0])))
+
+
+def read_versions_registry(ref_dir: str) -> Dict[str, Dict]:
+    path = os.path.join(ref_dir, VERSIONS_REGISTRY)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_aliases(aliases: Optional[str]) -> List[Dict[str, str]]:
+    if not aliases or not os.path.exists(aliases):
+        return []
+    with open(aliases, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+class ItemHistory:
+    """全部版本的 items_map 合成一份區間索引：item_id → [(起版本序, 迄版本序, 名稱/標籤)]。
+
+    相鄰版本內容相同就併成一段，查某版本某件為對該件的區間二分搜尋；
+    at(ver) 依該版本內容組出 ItemIndex（每版本只組一次）。
+    """
+
+    def __init__(self, versions: List[str], intervals: Dict[int, List[Segment]],
+                 first_seen: Dict[str, str], aliases: List[Dict[str, str]]):
+        self.versions = versions
+        self.intervals = intervals
+        self.first_seen = first_seen
+        self.aliases = aliases
+        self._pos = {v: k for k, v in enumerate(versions)}
+        self._views: Dict[str, ItemIndex] = {}
+
+    @classmethod
+    def from_dir(cls, ref_dir: str, aliases: Optional[str] = DEF_ALIASES) -> "ItemHistory":
+        maps = versioned_maps(ref_dir)
+        intervals: Dict[int, List[list]] = {}
+        for k, path in enumerate(maps.values()):
+            with open(path, newline="", encoding="utf-8") as f:
+                for r in csv.DictReader(f):
+                    rec = (r.get("en_name") or None, r.get("zh_tw_name") or None, r.get("tags") or "")
+                    segs = intervals.setdefault(int(r["item_id"]), [])
+                    if segs and segs[-1][1] == k - 1 and segs[-1][2] == rec:
+                        segs[-1][1] = k
+                    else:
+                        segs.append([k, k, rec])
+        registry = read_versions_registry(ref_dir)
+        first_seen = {v: registry[v]["first_seen"] for v in maps if registry.get(v, {}).get("first_seen")}
+        return cls(list(maps), {iid: [tuple(s) for s in segs] for iid, segs in sorted(intervals.items())},
+                   first_seen, _read_aliases(aliases))
+
+    def version_for(self, patch: Optional[str] = None, date: Optional[str] = None) -> str:
+        """patch（如 15.19 / 15.19.1）取該 patch 的最新小版本，沒有就取不晚於它的最新版本；
+        date（ISO 日期或時間）取 first_seen 不晚於該日的最新版本（早於全部記錄時取最舊的）；都沒給就是最新版本。"""
+        if not self.versions:
+            raise ValueError("no items_map_{ver}.csv found")
+        if patch:
+            want = version_key(patch)
+            same = [v for v in self.versions if version_key(v)[:len(want)] == want]
+            older = [v for v in self.versions if version_key(v) <= want]
+            if same or older:
+                return (same or older)[-1]
+            return self.versions[0]
+        if date and self.first_seen:  # 沒有任何 first_seen 記錄時無從比對，用最新版本
+            day = str(date)[:10]
+            known = [v for v in self.versions if v in self.first_seen]
+            seen = [v for v in known if self.first_seen[v][:10] <= day]
+            return seen[-1] if seen else known[0]
+        return self.versions[-1]
+
+    def item(self, item_id: int, version: str) -> Optional[ItemRec]:
+        k = self._pos[version]
+        segs = self.intervals.get(int(item_id), ())
+        i = bisect.bisect_right([s[0] for s in segs], k) - 1
+        return segs[i][2] if i >= 0 and segs[i][1] >= k else None
+
+    def at(self, version: str) -> ItemIndex:
+        idx = self._views.get(version)
+        if idx is None:
+            k = self._pos[version]
+            items = []
+            for iid, segs in self.intervals.items():
+                i = bisect.bisect_right([s[0] for s in segs], k) - 1
+                if i >= 0 and segs[i][1] >= k:
+                    items.append((iid, *segs[i][2]))
+            idx = self._views[version] = ItemIndex(items, self.aliases, version)
+        return idx
+
+
+def load_item_history(ref_dir: str = "data/ref", aliases: Optional[str] = DEF_ALIASES) -> ItemHistory:
+    """讀 {ref_dir}/items_history.pkl；任一版本檔、版本登記或別名檔內容變動時重新編譯。"""
+    maps = versioned_maps(ref_dir)
+    src = {**{os.path.basename(p): _digest(p) for p in maps.values()},
+           VERSIONS_REGISTRY: _digest(os.path.join(ref_dir, VERSIONS_REGISTRY)), "aliases": _digest(aliases)}
+    path = os.path.join(ref_dir, HISTORY_SNAPSHOT)
+    memo = (os.path.abspath(path), tuple(sorted(src.items())))
+    if memo in _LOADED:
+        return _LOADED[memo]
+    hist = None
+    try:
+        with open(path, "rb") as f:
+            doc = pickle.load(f)
+        if doc.get("format") == SNAPSHOT_FMT and doc.get("sources") == src:
+            hist = ItemHistory(doc["versions"], doc["intervals"], doc["first_seen"], doc["aliases"])
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, TypeError):
+        hist = None
+    if hist is None:
+        hist = ItemHistory.from_dir(ref_dir, aliases)
+        doc = {"format": SNAPSHOT_FMT, "sources": src, "versions": hist.versions, "intervals": hist.intervals,
+               "first_seen": hist.first_seen, "aliases": hist.aliases}
+        try:
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(doc, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[warn] item history snapshot not written: {e!r}")
+    _LOADED[memo] = hist
+    return hist
+
+
+def main():
+    ap = argparse.ArgumentParser(description="compile items_map + item_aliases into a versioned lookup snapshot")
+    ap.add_argument("--items-map", default=DEF_ITEMS_MAP)
+    ap.add_argument("--aliases", default=DEF_ALIASES)
+    ap.add_argument("--out", default=None, help="預設 {items-map 目錄}/items_index_{ddragon_version}.pkl")
+    ap.add_argument("--history", action="store_true", help="另編譯同目錄全部 items_map_{ver}.csv 的多版本索引")
+    args = ap.parse_args()
+    out, idx = compile_snapshot(args.items_map, args.aliases, args.out)
+    print(f"[ok] {out}: version={idx.version or '-'} items={len(idx.by_id)} aliases={len(idx.alias)}")
+    if args.history:
+        ref_dir = os.path.dirname(os.path.abspath(args.items_map))
+        hist = load_item_history(ref_dir, args.aliases)
+        segs = sum(len(v) for v in hist.intervals.values())
+        print(f"[ok] {os.path.join(ref_dir, HISTORY_SNAPSHOT)}: versions={len(hist.versions)} items={len(hist.intervals)} segments={segs}")
+
+
+if __name__ == "__main__":
+    main()
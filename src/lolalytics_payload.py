@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+LoLalytics 資料回應（XHR/fetch JSON、qwik/json 內嵌狀態）→ winning / sets 表格。
+
+站方 payload 沒有公開格式，這裡以結構辨識而非固定路徑：
+- Winning Items：長度 ≥ 5 的 list，元素為含「裝備 id + 勝率 + 選用率」的 dict；
+- 5 件套裝：元素含 5 個裝備 id（list 或以 _ / - 串接的字串鍵）以及 勝率/選用率/場次。
+數值一律視為網站顯示的百分比（與 DOM 路徑相同）：winning 轉成 0~1，sets 保留原值。
+辨識不到就回傳空表，由呼叫端退回 DOM 捲動。
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+
+WIN_COLS = ["img","name","win_rate","pick_rate","sample_size"]
+SET_COLS = ["items","items_img","set_win_rate","set_pick_rate","set_sample_size"]
+
+IMG_URL = "https://cdn5.lolalytics.com/item64/{id}.webp"
+POTION_IDS = {2003, 2031}  # 起手藥水，與 DOM 路徑一樣排除
+DEF_MIN_GAMES = 2  # 出現場次低於此值的套裝後就停止（DOM 路徑以批為單位）
+
+ID_KEYS   = ("id", "item", "itemid", "item_id")
+WIN_KEYS  = ("wr", "win", "winrate", "win_rate")
+PICK_KEYS = ("pr", "pick", "pickrate", "pick_rate")
+GAME_KEYS = ("n", "games", "gp", "count", "sample", "sample_size")
+SET_KEYS  = ("items", "set", "ids", "build")
+
+SET_KEY_RE = re.compile(r"^\d{4,6}(?:[_\-]\d{4,6}){4}$")
+
+
+def _num(v) -> Optional[float]:
+    try:
+        return float(str(v).strip().replace("%", "").replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _item_id(v) -> Optional[int]:
+    n = _num(v)
+    return int(n) if n is not None and n.is_integer() and 1000 <= n < 1000000 else None
+
+
+def _get(d: Dict, keys: Sequence[str]):
+    low = {str(k).lower(): v for k, v in d.items()}
+    for k in keys:
+        if k in low:
+            return low[k]
+    return None
+
+
+def _walk(obj: Any) -> Iterator[Any]:
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        yield cur
+        if isinstance(cur, dict):
+            stack.extend(cur.values())
+        elif isinstance(cur, list):
+            stack.extend(cur)
+
+
+def _stats(v) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """(win, pick, games)：dict 以鍵名、list 以位置 [win, pick, games]。"""
+    if isinstance(v, dict):
+        return _num(_get(v, WIN_KEYS)), _num(_get(v, PICK_KEYS)), _num(_get(v, GAME_KEYS))
+    if isinstance(v, (list, tuple)) and len(v) >= 3:
+        return _num(v[0]), _num(v[1]), _num(v[2])
+    return None, None, None
+
+
+def _winning_records(lst: List) -> List[Tuple[int, float, float, float]]:
+    out = []
+    for r in lst:
+        if not isinstance(r, dict):
+            return []
+        iid = _item_id(_get(r, ID_KEYS))
+        win, pick, games = _stats(r)
+        if iid is None or win is None or pick is None:
+            return []
+        out.append((iid, win, pick, games or 0.0))
+    return out
+
+
+def _set_records(obj: Any) -> List[Tuple[List[int], float, float, float]]:
+    out = []
+    if isinstance(obj, dict) and obj and all(SET_KEY_RE.match(str(k)) for k in obj):
+        for k, v in obj.items():
+            ids = [int(x) for x in re.split(r"[_\-]", str(k))]
+            win, pick, games = _stats(v)
+            if win is None or pick is None or games is None:
+                return []
+            out.append((ids, win, pick, games))
+        return out
+    if not isinstance(obj, list) or len(obj) < 3:
+        return []
+    for r in obj:
+        if isinstance(r, dict):
+            ids, stats = _get(r, SET_KEYS), r
+        elif isinstance(r, list) and len(r) >= 4 and isinstance(r[0], list):
+            ids, stats = r[0], r[1:]
+        else:
+            return []
+        if isinstance(ids, str):
+            ids = re.split(r"[_\-|,]", ids)
+        if not isinstance(ids, list) or len(ids) != 5:
+            return []
+        ids = [_item_id(x) for x in ids]
+        win, pick, games = _stats(stats)
+        if any(i is None for i in ids) or win is None or pick is None or games is None:
+            return []
+        out.append((ids, win, pick, games))
+    return out
+
+
+def _pct(v: float) -> float:
+    v = min(max(v, 0.0), 100.0)
+    return round(v / 100.0, 6)
+
+
+def parse_winning(payloads: List[Any], names: Dict[int, str]) -> pd.DataFrame:
+    best: List[Tuple[int, float, float, float]] = []
+    for p in payloads:
+        for node in _walk(p):
+            if isinstance(node, list) and len(node) >= 5 and len(node) > len(best):
+                recs = _winning_records(node)
+                if recs:
+                    best = recs
+    rows = [{"img": IMG_URL.format(id=iid), "name": names.get(iid, str(iid)),
+             "win_rate": _pct(win), "pick_rate": _pct(pick), "sample_size": int(games)}
+            for iid, win, pick, games in best if win or pick]
+    return pd.DataFrame(rows, columns=WIN_COLS)
+
+
+def parse_sets_5(payloads: List[Any], names: Dict[int, str], *, min_games: int = DEF_MIN_GAMES, top_n: int = 0) -> pd.DataFrame:
+    """依場次由多到少輸出 a_5 套裝；截斷條件同 DOM 路徑（_iter_sets_5）：
+    出現 set_sample_size < min_games 的列後停止（該列照樣輸出），或已輸出 top_n 列（0 = 不限）。"""
+    best: List[Tuple[List[int], float, float, float]] = []
+    for p in payloads:
+        for node in _walk(p):
+            if isinstance(node, (list, dict)) and len(node) > len(best):
+                recs = _set_records(node)
+                if recs:
+                    best = recs
+    best = sorted(best, key=lambda r: r[3], reverse=True)
+    rows, seen = [], set()
+    for ids, win, pick, games in best:
+        if POTION_IDS.intersection(ids):
+            continue
+        key = "|".join(names.get(i, str(i)) for i in ids)
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append({"items": key, "items_img": "|".join(IMG_URL.format(id=i) for i in ids),
+                     "set_win_rate": win, "set_pick_rate": pick, "set_sample_size": int(games)})
+        if (top_n and len(rows) >= top_n) or games < min_games:
+            break
+    return pd.DataFrame(rows, columns=SET_COLS)
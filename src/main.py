@@ -1,5 +1,6 @@
-import argparse
-from .pipeline import run
+import argparse, os
+from .pipeline import ENGINES, run
+from .exact_search import DEF_POOL, DEF_TOP_N
 
 def parse_args():
     p = argparse.ArgumentParser()
@@ -9,8 +10,15 @@ def parse_args():
     p.add_argument("--explain", action="store_true")
     p.add_argument("--topk", type=int, default=50)
     p.add_argument("--cover", type=float, default=0.80)
+    p.add_argument("--trace", default=os.getenv("LOL_TRACE"), help="append per-stage spans as JSON lines")
+    p.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
+    p.add_argument("--engine", choices=list(ENGINES), default=os.getenv("LOL_ENGINE", "greedy"),
+                   help="greedy = staged pick_build; exact = branch-and-bound top-N over item combinations")
+    p.add_argument("--top-n", type=int, default=DEF_TOP_N, help="exact: number of ranked alternatives to keep")
+    p.add_argument("--pool", type=int, default=DEF_POOL, help="exact: candidate pool size (C0 padded by win*pick)")
     return p.parse_args()
 
 if __name__ == "__main__":
     args = parse_args()
-    run(args.winning, args.sets, args.out, explain=args.explain, topk=args.topk, cover=args.cover)
+    run(args.winning, args.sets, args.out, explain=args.explain, topk=args.topk, cover=args.cover, trace=args.trace, force=args.force,
+        engine=args.engine, top_n=args.top_n, pool=args.pool)
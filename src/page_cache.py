@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+抓取結果的磁碟快取（以建置頁 URL 為 key）。
+
+每筆為 gzip JSON：{url, fetched_at, payloads, winning, sets}
+- payloads：network 擷取模式下記錄到的站方資料回應（dom 模式為空）；
+- winning / sets：當次實際輸出的表格列；
+- cutoff：當次 sets 的截斷條件 {min_games, top_n}。只有至少與要求一樣完整的快取才算命中（covers），
+  重建時再套用這次要求的截斷。未記錄 cutoff 的舊快取一律視為未命中。
+TTL 內的命中直接回傳，不啟動 Chromium；offline 模式不看 TTL，只讀快取。
+容量超過 max_bytes 時依最後存取時間（檔案 mtime，命中時更新）做 LRU 淘汰。
+"""
+from __future__ import annotations
+import datetime, gzip, hashlib, json, os, time
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+
+try:
+    from .lolalytics_payload import DEF_MIN_GAMES, parse_winning, parse_sets_5
+except ImportError:  # 以 python src/scrape_lolalytics.py 直接執行
+    from lolalytics_payload import DEF_MIN_GAMES, parse_winning, parse_sets_5
+
+CACHE_DIR = "data/cache/pages"
+DEF_TTL_S = 0.0          # 0 = 不使用快取
+DEF_MAX_MB = 200.0
+
+WIN_COLS = ["img","name","win_rate","pick_rate","sample_size"]
+SET_COLS = ["items","items_img","set_win_rate","set_pick_rate","set_sample_size"]
+
+
+class PageCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, ttl_s: float = DEF_TTL_S, max_mb: float = DEF_MAX_MB):
+        self.cache_dir = cache_dir
+        self.ttl_s = float(ttl_s)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json.gz")
+
+    def get(self, url: str, *, any_age: bool = False) -> Optional[Dict[str, Any]]:
+        p = self._path(url)
+        if not os.path.exists(p):
+            return None
+        try:
+            with gzip.open(p, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            fetched = datetime.datetime.fromisoformat(entry["fetched_at"]).timestamp()
+        except (OSError, ValueError, KeyError):
+            return None
+        if entry.get("url") != url:
+            return None
+        if not any_age and time.time() - fetched > self.ttl_s:
+            return None
+        os.utime(p)  # LRU：以 mtime 記錄最後存取
+        return entry
+
+    def put(self, url: str, win_df: pd.DataFrame, sets_df: pd.DataFrame, payloads: Optional[List[Any]] = None, *,
+            min_games: int = DEF_MIN_GAMES, top_n: int = 0) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "url": url,
+            "fetched_at": datetime.datetime.now().astimezone().isoformat(),
+            "cutoff": {"min_games": int(min_games), "top_n": int(top_n)},
+            "payloads": payloads or [],
+            "winning": win_df.to_dict(orient="records"),
+            "sets": sets_df.to_dict(orient="records"),
+        }
+        p = self._path(url)
+        tmp = p + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, p)
+        self.evict()
+
+    def evict(self) -> int:
+        """超過容量上限時，從最久未存取的開始刪除；回傳刪除筆數。"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json.gz"):
+                p = os.path.join(self.cache_dir, name)
+                st = os.stat(p)
+                files.append((st.st_mtime, st.st_size, p))
+        total = sum(sz for _, sz, _ in files)
+        removed = 0
+        for _, sz, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+            total -= sz
+            removed += 1
+        return removed
+
+
+def covers(entry: Dict[str, Any], min_games: int = DEF_MIN_GAMES, top_n: int = 0) -> bool:
+    """快取的 sets 是否至少與要求一樣完整：截斷場次不高於要求，且沒有被比要求更小的 top_n 截掉。"""
+    cut = entry.get("cutoff")
+    if not cut:
+        return False
+    if cut["min_games"] > min_games:
+        return False
+    n = cut["top_n"]
+    truncated = n and len(entry.get("sets") or []) >= n
+    return not truncated or bool(top_n and top_n <= n)
+
+
+def cut_sets(sets_df: pd.DataFrame, min_games: int = DEF_MIN_GAMES, top_n: int = 0) -> pd.DataFrame:
+    """依列套用截斷：保留到第一個場次 < min_games 的列（含），最多 top_n 列（0 = 不限）。"""
+    small = (pd.to_numeric(sets_df["set_sample_size"], errors="coerce") < min_games).to_numpy().nonzero()[0]
+    end = int(small[0]) + 1 if len(small) else len(sets_df)
+    if top_n:
+        end = min(end, top_n)
+    return sets_df.iloc[:end].reset_index(drop=True)
+
+
+def tables_from_entry(entry: Dict[str, Any], names: Optional[Dict[int, str]] = None, *,
+                      min_games: Optional[int] = None, top_n: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """由快取重建 (winning, sets)：有 payload 時優先以這次的截斷條件重新解析，否則用當次輸出的表格；
+    條件與快取當次不同時再依列截斷（min_games / top_n 為 None 時沿用快取當次的條件）。"""
+    cut = entry.get("cutoff") or {"min_games": DEF_MIN_GAMES, "top_n": 0}
+    min_games = cut["min_games"] if min_games is None else min_games
+    top_n = cut["top_n"] if top_n is None else top_n
+    win_df = sets_df = None
+    if entry.get("payloads") and names is not None:
+        win_df = parse_winning(entry["payloads"], names)
+        sets_df = parse_sets_5(entry["payloads"], names, min_games=min_games, top_n=top_n)
+    if win_df is None or win_df.empty:
+        win_df = pd.DataFrame(entry.get("winning") or [], columns=WIN_COLS)
+    if sets_df is None or sets_df.empty:
+        sets_df = pd.DataFrame(entry.get("sets") or [], columns=SET_COLS)
+        if (min_games, top_n) != (cut["min_games"], cut["top_n"]):
+            sets_df = cut_sets(sets_df, min_games, top_n)
+    return win_df, sets_df
@@ -1,16 +1,256 @@
-import json
-from .algo import load_winning_items, load_built_sets, pick_build
+from __future__ import annotations
+import argparse, csv, glob, json, os, re, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+from .algo import load_winning_items, load_set_table, pick_build, BuildResult
+from .io_schema import WinningItem, BuiltSet
+from .spans import Tracer, write_jsonl
+from .columnar import parquet_for
+from .build_manifest import BuildManifest, code_version, input_key, manifest_for
+from .set_stats import SetStats, stats_for, stats_path
+from .exact_search import DEF_POOL, DEF_TOP_N, pick_build_exact
 
-def run(winning_csv: str, sets_csv: str, out_json: str, *, explain: bool, topk: int, cover: float) -> None:
-    winning = load_winning_items(winning_csv)
-    sets = load_built_sets(sets_csv)
-    if not winning or not sets:
-        raise SystemExit(f"[error] empty input: winning={len(winning)} sets={len(sets)}. Please re-run scraper.")
-    result = pick_build(winning, sets, explain=explain, topk=topk, cover=cover)
-    payload = {
-        "spec": {"mode": "ARAM", "tier": "d2_plus", "window": "7d"},
+# --engine：greedy 為原本的分段貪婪挑選，exact 為 branch-and-bound 的前 N 名精確搜尋
+ENGINES = {"greedy": pick_build, "exact": pick_build_exact}
+
+# data/raw/{hero}_{mode}_{tier}_{window}_sets.csv（與 scrape_lolalytics_batch 的輸出命名一致）
+SETS_RE = re.compile(r"^(?P<hero>[^_]+)_(?P<mode>[^_]+)_(?P<tier>.+)_(?P<window>\d+d)_sets\.csv$", re.IGNORECASE)
+
+def _payload(result: BuildResult, spec: Dict) -> Dict:
+    return {
+        "spec": spec,
         "build": {"boots": result.boots, "order": result.order},
         "rationale": result.rationale,
     }
-    with open(out_json, "w", encoding="utf-8") as f:
+
+def _write_json(path: str, payload: Dict) -> None:
+    d = os.path.dirname(os.path.abspath(path))
+    if d:
+        os.makedirs(d, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
+
+def _inputs(winning_csv: str, sets_csv: str, stats: Optional[SetStats] = None) -> Dict[str, str]:
+    # 以載入器實際讀取的檔案計算雜湊（有較新的 .parquet 旁檔時是它；有相符的 .stats.npz 時只讀它）
+    sets = stats_path(sets_csv) if stats is not None else parquet_for(sets_csv) or sets_csv
+    return {"winning": parquet_for(winning_csv) or winning_csv, "sets": sets}
+
+def _engine_kw(engine: str, top_n: int, pool: int) -> Dict:
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine: {engine} (choose from {', '.join(ENGINES)})")
+    return dict(top_n=top_n, pool=pool) if engine == "exact" else {}
+
+def build_params(*, explain: bool, topk: int, cover: float, engine: str = "greedy",
+                 top_n: int = DEF_TOP_N, pool: int = DEF_POOL) -> Dict:
+    """manifest key 與批次摘要的參數；run 與 run_batch 共用，同一產出檔的 key 才會一致。"""
+    return dict(explain=explain, topk=topk, cover=cover, engine=engine, **_engine_kw(engine, top_n, pool))
+
+def run(winning_csv: str, sets_csv: str, out_json: str, *, explain: bool, topk: int, cover: float,
+        trace: Optional[str] = None, force: bool = False, engine: str = "greedy",
+        top_n: int = DEF_TOP_N, pool: int = DEF_POOL) -> bool:
+    """回傳是否重新建置；輸入、參數與程式版本都未變且產出檔仍在時略過。"""
+    extra = _engine_kw(engine, top_n, pool)
+    stats = stats_for(sets_csv, topk, cover)
+    inputs = _inputs(winning_csv, sets_csv, stats)
+    key = input_key(inputs, build_params(explain=explain, topk=topk, cover=cover, engine=engine, top_n=top_n, pool=pool),
+                    code_version())
+    manifest = BuildManifest(manifest_for(out_json))
+    if not force and manifest.is_current(out_json, key):
+        print(f"[skip] inputs unchanged -> {out_json}")
+        return False
+    tracer = Tracer(trace, sets_csv=sets_csv) if trace else None
+    winning = load_winning_items(winning_csv)
+    sets = stats or load_set_table(sets_csv)
+    if not winning or not sets:
+        raise SystemExit(f"[error] empty input: winning={len(winning)} sets={len(sets)}. Please re-run scraper.")
+    result = ENGINES[engine](winning, sets, explain=explain, topk=topk, cover=cover, tracer=tracer, **extra)
+    _write_json(out_json, _payload(result, {"mode": "ARAM", "tier": "d2_plus", "window": "7d"}))
+    manifest.record(out_json, key, inputs)
+    manifest.save()
+    return True
+
+# ---------- batch ----------
+
+@dataclass
+class BatchJob:
+    hero: str
+    mode: str
+    tier: str
+    window: str
+    winning_csv: str
+    sets_csv: str
+    out_json: str
+
+    @property
+    def spec(self) -> Dict:
+        return {"mode": self.mode.upper(), "tier": self.tier, "window": self.window}
+
+def discover_jobs(sets_glob: str, out_dir: str = "outputs") -> List[BatchJob]:
+    """由 *_sets.csv 檔名推得英雄/模式/分段/視窗，並配對同名的 *_winning.csv。"""
+    jobs = []
+    for sets_csv in sorted(glob.glob(sets_glob)):
+        m = SETS_RE.match(os.path.basename(sets_csv))
+        if not m:
+            print(f"[warn] skip (unrecognized name): {sets_csv}")
+            continue
+        d = m.groupdict()
+        winning_csv = sets_csv[: -len("_sets.csv")] + "_winning.csv"
+        if not os.path.exists(winning_csv):
+            print(f"[warn] skip (winning.csv not found): {winning_csv}")
+            continue
+        out_json = os.path.join(out_dir, f"{d['hero']}_{d['mode']}_{d['window']}.json")
+        jobs.append(BatchJob(d["hero"], d["mode"], d["tier"], d["window"], winning_csv, sets_csv, out_json))
+    return jobs
+
+def read_manifest(path: str, out_dir: str = "outputs") -> List[BatchJob]:
+    """manifest CSV 欄位：hero,winning,sets[,mode,tier,window,out]。"""
+    jobs = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            hero = (row.get("hero") or "").strip()
+            if not hero:
+                continue
+            mode = (row.get("mode") or "aram").strip()
+            tier = (row.get("tier") or "d2_plus").strip()
+            window = (row.get("window") or "7d").strip()
+            out_json = (row.get("out") or "").strip() or os.path.join(out_dir, f"{hero}_{mode}_{window}.json")
+            jobs.append(BatchJob(hero, mode, tier, window, row["winning"].strip(), row["sets"].strip(), out_json))
+    return jobs
+
+def check_unique_outputs(jobs: List[BatchJob]) -> None:
+    """預設產出檔名不含 tier（{hero}_{mode}_{window}.json），同英雄多個 tier 會寫到同一檔；建置前就拒絕。"""
+    seen: Dict[str, BatchJob] = {}
+    dups = []
+    for job in jobs:
+        path = os.path.normcase(os.path.abspath(job.out_json))
+        if path in seen:
+            a = seen[path]
+            dups.append(f"{a.hero}/{a.mode}/{a.tier}/{a.window} and {job.hero}/{job.mode}/{job.tier}/{job.window} -> {job.out_json}")
+        else:
+            seen[path] = job
+    if dups:
+        raise ValueError("duplicate output paths (set the manifest 'out' column per tier): " + "; ".join(dups))
+
+def _build_one(task: Tuple[BatchJob, List[WinningItem], List[BuiltSet], Dict]) -> Dict:
+    job, winning, sets, kw = task
+    t0 = time.perf_counter()
+    tracer = Tracer(hero=job.hero)
+    if not winning or not sets:
+        return {"hero": job.hero, "status": "empty", "winning": len(winning), "sets": len(sets), "out": job.out_json}
+    try:
+        result = pick_build(winning, sets, tracer=tracer, **kw)
+        _write_json(job.out_json, _payload(result, job.spec))
+    except Exception as e:
+        return {"hero": job.hero, "status": "error", "error": repr(e), "out": job.out_json}
+    return {"hero": job.hero, "status": "ok", "order": result.order, "out": job.out_json,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 3), "stages_ms": tracer.totals(),
+            "spans": tracer.spans}
+
+def run_batch(jobs: List[BatchJob], *, explain: bool, topk: int, cover: float,
+              workers: int = 0, summary_json: Optional[str] = None, trace: Optional[str] = None,
+              force: bool = False) -> Dict:
+    """一次載入全部 CSV，再以 process pool 跑 pick_build；workers<=1 時於本行程內執行。
+
+    trace：各英雄的 load 與 pick_build 各階段 span 以 JSON lines 附加寫入此檔。
+    輸入未變的英雄（見 build_manifest）不載入也不重算，狀態記為 skipped；force 則全部重算。
+    兩個 job 的產出路徑相同時（例如同英雄的不同 tier）直接 ValueError，不會互相覆寫。
+    """
+    check_unique_outputs(jobs)
+    t0 = time.perf_counter()
+    kw = dict(explain=explain, topk=topk, cover=cover)
+    params = build_params(**kw)  # 批次只跑 greedy
+    code = code_version()
+    manifests: Dict[str, BuildManifest] = {}
+    keys: Dict[str, Tuple[str, Dict[str, str]]] = {}
+    skipped = []
+    loader = Tracer()
+    tasks = []
+    for job in jobs:
+        stats = stats_for(job.sets_csv, topk, cover)
+        inputs = _inputs(job.winning_csv, job.sets_csv, stats)
+        key = input_key(inputs, params, code)
+        mpath = manifest_for(job.out_json)
+        manifest = manifests.setdefault(mpath, BuildManifest(mpath))
+        keys[job.out_json] = (key, inputs)
+        if not force and manifest.is_current(job.out_json, key):
+            skipped.append({"hero": job.hero, "status": "skipped", "out": job.out_json})
+            continue
+        with loader.child(hero=job.hero).span("load") as rec:
+            winning, sets = load_winning_items(job.winning_csv), stats or load_set_table(job.sets_csv)
+            rec.update(winning=len(winning), sets=len(sets), precomputed=stats is not None)
+        tasks.append((job, winning, sets, kw))
+    t_load = time.perf_counter() - t0
+
+    workers = workers or (os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        results = [_build_one(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+            results = list(ex.map(_build_one, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    for r in results:
+        if r["status"] == "ok":
+            key, inputs = keys[r["out"]]
+            manifests[manifest_for(r["out"])].record(r["out"], key, inputs)
+    for manifest in manifests.values():
+        manifest.save()
+    done = {r["out"]: r for r in skipped + results}
+    results = [done[j.out_json] for j in jobs]  # 維持 jobs 順序
+
+    spans = loader.spans + [sp for r in results for sp in r.pop("spans", [])]
+    if trace:
+        write_jsonl(trace, spans)
+    stages: Dict[str, float] = {}
+    for sp in spans:
+        stages[sp["span"]] = round(stages.get(sp["span"], 0.0) + sp["ms"], 3)
+
+    summary = {
+        "params": params,
+        "jobs": [asdict(j) for j in jobs],
+        "results": results,
+        "counts": {s: sum(1 for r in results if r["status"] == s) for s in ("ok", "skipped", "empty", "error")},
+        "stages_ms": stages,
+        "load_s": round(t_load, 4),
+        "total_s": round(time.perf_counter() - t0, 4),
+    }
+    if summary_json:
+        _write_json(summary_json, summary)
+    return summary
+
+def main():
+    ap = argparse.ArgumentParser(description="batch pick_build over many winning/sets CSV pairs")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--glob", dest="sets_glob", help='e.g. "data/raw/*_sets.csv"')
+    src.add_argument("--manifest", help="CSV with columns hero,winning,sets[,mode,tier,window,out]")
+    ap.add_argument("--out-dir", default="outputs")
+    ap.add_argument("--summary", default=None, help="default: <out-dir>/_batch_summary.json")
+    ap.add_argument("--workers", type=int, default=0, help="0 = os.cpu_count()")
+    ap.add_argument("--explain", action="store_true")
+    ap.add_argument("--topk", type=int, default=50)
+    ap.add_argument("--cover", type=float, default=0.80)
+    ap.add_argument("--trace", default=os.getenv("LOL_TRACE"), help="append per-stage spans as JSON lines")
+    ap.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
+    args = ap.parse_args()
+
+    jobs = read_manifest(args.manifest, args.out_dir) if args.manifest else discover_jobs(args.sets_glob, args.out_dir)
+    if not jobs:
+        raise SystemExit("[error] no winning/sets pairs found")
+    try:
+        check_unique_outputs(jobs)
+    except ValueError as e:
+        raise SystemExit(f"[error] {e}")
+    summary_json = args.summary or os.path.join(args.out_dir, "_batch_summary.json")
+    summary = run_batch(jobs, explain=args.explain, topk=args.topk, cover=args.cover,
+                        workers=args.workers, summary_json=summary_json, trace=args.trace, force=args.force)
+    for r in summary["results"]:
+        if r["status"] not in ("ok", "skipped"):
+            print(f"[warn] {r['hero']}: {r['status']} {r.get('error', '')}".rstrip())
+    c = summary["counts"]
+    print(f"[ok] batch: ok={c['ok']} skipped={c['skipped']} empty={c['empty']} error={c['error']} "
+          f"load={summary['load_s']}s total={summary['total_s']}s -> {summary_json}")
+    if c["ok"] + c["skipped"] == 0:
+        raise SystemExit(2)
+
+if __name__ == "__main__":
+    main()
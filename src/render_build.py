@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 import argparse, os, pandas as pd
 
+try:
+    from .build_manifest import BuildManifest, code_version, input_key, manifest_for
+    from .item_index import DEF_ALIASES, DEF_ITEMS_MAP, load_item_index
+except ImportError:  # 以 python src/render_build.py 直接執行
+    from build_manifest import BuildManifest, code_version, input_key, manifest_for
+    from item_index import DEF_ALIASES, DEF_ITEMS_MAP, load_item_index
+
 STYLE_IMG = 'width="32" height="32" style="margin-right:4px;border:1px solid #666;border-radius:4px;"'
 
 def _mkdir_for(path: str) -> None:
@@ -8,7 +15,7 @@ def _mkdir_for(path: str) -> None:
     if d and not os.path.exists(d):
         os.makedirs(d, exist_ok=True)
 
-def _img_row(items_img: str, items_names: str) -> str:
+def _img_row(items_img: str, items_names: str, idx=None) -> str:
     # items_img: pipe 分隔的圖片 URL；items_names: pipe 分隔名稱 (備用 alt)
     urls  = [s for s in (items_img or "").split("|") if s]
     names = (items_names or "").split("|")
@@ -16,6 +23,9 @@ def _img_row(items_img: str, items_names: str) -> str:
         tags = []
         for i,u in enumerate(urls):
             alt = names[i] if i < len(names) and names[i] else os.path.basename(u).split(".")[0]
+            if alt.isdigit() and idx is not None:  # 沒有名稱時以圖檔中的裝備 id 查中文名
+                hit = idx.find(alt)
+                alt = (hit[2] or hit[1]) if hit else alt
             tags.append(f'<img src="{u}" alt="{alt}" {STYLE_IMG} />')
         return "".join(tags)
     # 沒有圖片就顯示名稱
@@ -26,8 +36,23 @@ def main():
     ap.add_argument("--sets_csv", required=True)
     ap.add_argument("--out_md", required=True)
     ap.add_argument("--topk", type=int, default=8)
+    ap.add_argument("--items-map", default=DEF_ITEMS_MAP, help="--alt-from-items 查裝備名用（缺檔就用 id）")
+    ap.add_argument("--item-aliases", default=DEF_ALIASES)
+    ap.add_argument("--alt-from-items", action="store_true",
+                    help="沒有名稱的圖片以圖檔中的裝備 id 查中文名當 alt（預設用 id）")
+    ap.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
     args = ap.parse_args()
 
+    use_items = args.alt_from_items and os.path.exists(args.items_map)
+    idx = load_item_index(args.items_map, args.item_aliases) if use_items else None
+    params = {"topk": args.topk, **({"items": idx.version} if idx else {})}
+    key = input_key({"sets": args.sets_csv}, params,
+                    code_version(("render_build.py", "item_index.py") if idx else ("render_build.py",)))
+    manifest = BuildManifest(manifest_for(args.out_md))
+    if not args.force and manifest.is_current(args.out_md, key):
+        print(f"[skip] inputs unchanged -> {args.out_md}")
+        return
+
     df = pd.read_csv(args.sets_csv)
     # 只保留有 5 件的列（保險）
     df = df[(df["items"].str.count(r"\|")==4) | (df["items"].str.count(r"\|")==4)]
@@ -44,7 +69,7 @@ def main():
     lines.append("| Set | Win | Pick | Games |")
     lines.append("|---|---:|---:|---:|")
     for _,row in df.iterrows():
-        imgs  = _img_row(row.get("items_img",""), row.get("items",""))
+        imgs  = _img_row(row.get("items_img",""), row.get("items",""), idx)
         win   = f"{float(row['set_win_rate']):.2f}%"
         pick  = f"{float(row['set_pick_rate']):.2f}%"
         games = int(row.get("set_sample_size", 0))
@@ -53,6 +78,8 @@ def main():
     _mkdir_for(args.out_md)
     with open(args.out_md, "w", encoding="utf-8") as f:
         f.write("\n".join(lines))
+    manifest.record(args.out_md, key, {"sets": args.sets_csv})
+    manifest.save()
     print(f"[ok] wrote -> {args.out_md}")
 
 if __name__ == "__main__":
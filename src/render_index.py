@@ -1,16 +1,42 @@
 from pathlib import Path
-import json, glob
+import argparse, json, glob
 
-OUT = Path("outputs/index.md")
-rows = []
-for fp in sorted(glob.glob("outputs/*_aram_7d.json")):
-    data = json.loads(Path(fp).read_text(encoding="utf-8"))
-    hero = Path(fp).name.split("_")[0]
-    boots = data["build"]["boots"]
-    order_list = [str(x) for x in data.get("build", {}).get("order", []) if x is not None and str(x) != "nan"]
-    order = " → ".join(order_list)
-    mdfile = Path(fp).with_suffix(".md").name
-    rows.append(f"- **{hero}**｜鞋：{boots}｜順序：`{order}` ｜ [卡片]({mdfile})")
+try:
+    from .build_manifest import BuildManifest, code_version, input_key, manifest_for
+except ImportError:  # 以 python src/render_index.py 直接執行
+    from build_manifest import BuildManifest, code_version, input_key, manifest_for
 
-OUT.write_text("# ARAM 7d Build 索引\n\n" + "\n".join(rows) + "\n", encoding="utf-8")
-print(f"[ok] wrote -> {OUT}")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--glob", default="outputs/*_aram_7d.json")
+    ap.add_argument("--out", default="outputs/index.md")
+    ap.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
+    args = ap.parse_args()
+
+    OUT = Path(args.out)
+    files = sorted(glob.glob(args.glob))
+    # 任一英雄 JSON 變動（或增減）才重寫索引
+    key = input_key({Path(fp).name: fp for fp in files}, {}, code_version(("render_index.py",)))
+    manifest = BuildManifest(manifest_for(str(OUT)))
+    if not args.force and manifest.is_current(str(OUT), key):
+        print(f"[skip] inputs unchanged -> {OUT}")
+        return
+
+    rows = []
+    for fp in files:
+        data = json.loads(Path(fp).read_text(encoding="utf-8"))
+        hero = Path(fp).name.split("_")[0]
+        boots = data["build"]["boots"]
+        order_list = [str(x) for x in data.get("build", {}).get("order", []) if x is not None and str(x) != "nan"]
+        order = " → ".join(order_list)
+        mdfile = Path(fp).with_suffix(".md").name
+        rows.append(f"- **{hero}**｜鞋：{boots}｜順序：`{order}` ｜ [卡片]({mdfile})")
+
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+    OUT.write_text("# ARAM 7d Build 索引\n\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    manifest.record(str(OUT), key, {Path(fp).name: fp for fp in files})
+    manifest.save()
+    print(f"[ok] wrote -> {OUT}")
+
+if __name__ == "__main__":
+    main()
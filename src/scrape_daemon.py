@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+常駐抓取服務：保持一個已啟動的 Chromium 與數個載入 Cloudflare storage state 的 context，
+經由本機 TCP 接受抓取工作；重複抓取不必再付冷啟動、建立 context 與驗證頁的成本。
+
+協定：每個連線送一行 JSON、回一行 JSON。
+  {"cmd": "scrape", "hero": "varus", "mode": "aram", "tier": "d2_plus", "patch": "7", "lang": "zh_tw",
+   "winning_out": "...csv", "sets_out": "...csv"[, "format", "stream_sets", "min_games", "top_n"]}
+    → {"ok": true, "url", "winning": 列數, "sets": 列數, "files": [...], "ms"}
+  {"cmd": "ping"}     → {"ok": true, "jobs", "contexts": {lang: 數量}}
+  {"cmd": "shutdown"} → 把 context 的 cookie 存回 --state 後結束
+
+用法：
+  python cf_shield_fix.py bootstrap --hero lux --state data/cf_state.json   # 先取得 storage state
+  python src/scrape_daemon.py --listen 127.0.0.1:8765 --contexts 2
+  python src/scrape_lolalytics.py --hero varus --winning_out ... --sets_out ... --daemon 127.0.0.1:8765
+"""
+from __future__ import annotations
+import argparse, asyncio, dataclasses, json, os, socket, time
+from typing import Any, Dict, List, Optional, Tuple
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+try:
+    from .scrape_lolalytics import (ScrapeOptions, DomainRateLimiter, DEF_MIN_INTERVAL, DEF_MODE, DEF_TIER,
+                                    DEF_PATCH, LANG, HAVE_ARROW, _build_url, _from_cache, _new_context,
+                                    _scrape_page, add_scrape_args, options_from_args, write_outputs)
+except ImportError:  # 以 python src/scrape_daemon.py 直接執行
+    from scrape_lolalytics import (ScrapeOptions, DomainRateLimiter, DEF_MIN_INTERVAL, DEF_MODE, DEF_TIER,
+                                   DEF_PATCH, LANG, HAVE_ARROW, _build_url, _from_cache, _new_context,
+                                   _scrape_page, add_scrape_args, options_from_args, write_outputs)
+
+DEF_LISTEN = "127.0.0.1:8765"
+DEF_CONTEXTS = 2
+DEF_TIMEOUT_S = 600.0  # 用戶端等待單一工作的上限
+
+
+def parse_addr(addr: str) -> Tuple[str, int]:
+    host, _, port = addr.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def daemon_request(addr: str, payload: Dict[str, Any], timeout: float = DEF_TIMEOUT_S) -> Dict[str, Any]:
+    """送出一個工作並等待回應；服務未啟動時丟 ConnectionRefusedError（呼叫端可退回本機抓取），逾時丟 socket.timeout。"""
+    with socket.create_connection(parse_addr(addr), timeout=timeout) as sock:
+        sock.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    return json.loads(buf.decode("utf-8"))
+
+
+class WarmBrowser:
+    """單一 Chromium；每種語系一個 context 佇列（首次使用時建立），用完放回以保留 cookie。"""
+
+    def __init__(self, opts: ScrapeOptions, contexts: int = DEF_CONTEXTS, min_interval: float = DEF_MIN_INTERVAL):
+        self.opts = opts
+        self.size = max(1, int(contexts))
+        self.limiter = DomainRateLimiter(min_interval)
+        self._pw = None
+        self._browser: Optional[Browser] = None
+        self._pools: Dict[str, asyncio.Queue] = {}
+        self._contexts: List[BrowserContext] = []
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._pw = await async_playwright().start()
+        await self._launch()
+
+    async def _launch(self) -> None:
+        self._browser = await self._pw.chromium.launch(headless=not self.opts.no_headless)
+        self._pools, self._contexts = {}, []
+
+    async def _pool(self, lang: str) -> asyncio.Queue:
+        async with self._lock:
+            if not self._browser.is_connected():
+                print("[warn] browser disconnected; relaunching")
+                await self._launch()
+            if lang not in self._pools:
+                q: asyncio.Queue = asyncio.Queue()
+                for _ in range(self.size):
+                    ctx = await _new_context(self._browser, lang, self.opts.storage_state)
+                    self._contexts.append(ctx)
+                    q.put_nowait(ctx)
+                self._pools[lang] = q
+            return self._pools[lang]
+
+    async def scrape(self, hero: str, mode: str, tier: str, patch: str, lang: str,
+                     opts: Optional[ScrapeOptions] = None):
+        opts = opts or self.opts
+        hit = _from_cache(_build_url(hero, mode, tier, patch, lang), lang, opts)
+        if hit:
+            return hit
+        pool = await self._pool(lang)
+        ctx = await pool.get()
+        try:
+            return await _scrape_page(ctx, hero, mode, tier, patch, lang, self.limiter, opts)
+        finally:
+            pool.put_nowait(ctx)
+
+    def stats(self) -> Dict[str, int]:
+        return {lang: self.size for lang in self._pools}
+
+    async def save_state(self) -> None:
+        """把最新 cookie（含續期的 cf_clearance）寫回 storage state，下次啟動沿用。"""
+        path = self.opts.storage_state
+        if not path or not self._contexts:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        await self._contexts[0].storage_state(path=tmp)
+        os.replace(tmp, path)
+
+    async def close(self) -> None:
+        try:
+            await self.save_state()
+        except Exception as e:
+            print(f"[warn] storage state not saved: {e!r}")
+        for ctx in self._contexts:
+            await ctx.close()
+        if self._browser:
+            await self._browser.close()
+        if self._pw:
+            await self._pw.stop()
+
+
+class ScrapeDaemon:
+    """把 JSON 工作轉給 WarmBrowser，寫出輸出檔後回報列數。"""
+
+    def __init__(self, warm: WarmBrowser):
+        self.warm = warm
+        self.jobs = 0
+        self._stop = asyncio.Event()
+
+    def _job_opts(self, req: Dict[str, Any]) -> ScrapeOptions:
+        base = self.warm.opts
+        return dataclasses.replace(
+            base,
+            format=req.get("format", base.format),
+            stream_sets=req["sets_out"] if req.get("stream_sets") else None,
+            min_games=int(req.get("min_games", base.min_games)),
+            top_n=int(req.get("top_n", base.top_n)),
+        )
+
+    async def handle(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = req.get("cmd", "scrape")
+        if cmd == "ping":
+            return {"ok": True, "jobs": self.jobs, "contexts": self.warm.stats()}
+        if cmd == "shutdown":
+            self._stop.set()
+            return {"ok": True, "jobs": self.jobs}
+        if cmd != "scrape":
+            return {"ok": False, "error": f"unknown cmd {cmd!r}"}
+        missing = [k for k in ("hero", "winning_out", "sets_out") if not req.get(k)]
+        if missing:
+            return {"ok": False, "error": f"missing {', '.join(missing)}"}
+        opts = self._job_opts(req)
+        if opts.format != "csv" and not HAVE_ARROW:
+            return {"ok": False, "error": "format parquet/both requires pyarrow"}
+        t0 = time.perf_counter()
+        try:
+            win_df, set_df, url = await self.warm.scrape(
+                req["hero"], req.get("mode", DEF_MODE), req.get("tier", DEF_TIER),
+                str(req.get("patch", DEF_PATCH)), req.get("lang", LANG), opts)
+            files = write_outputs(win_df, set_df, req["winning_out"], req["sets_out"], opts.format)
+        except Exception as e:
+            print(f"[warn] {req['hero']}: {e!r}")
+            return {"ok": False, "error": repr(e)}
+        self.jobs += 1
+        ms = round((time.perf_counter() - t0) * 1e3, 1)
+        print(f"[ok] {req['hero']}: winning={len(win_df)} sets={len(set_df)} {ms:.0f}ms")
+        return {"ok": True, "url": url, "winning": len(win_df), "sets": len(set_df), "files": files, "ms": ms}
+
+    async def _on_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            try:
+                req = json.loads(line.decode("utf-8"))
+            except ValueError:
+                resp = {"ok": False, "error": "bad request (expect one JSON line)"}
+            else:
+                resp = await self.handle(req)
+            writer.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._on_conn, host, port)
+        print(f"[ok] scrape daemon listening on {host}:{port}")
+        async with server:
+            await self._stop.wait()
+
+
+async def _run(args) -> None:
+    warm = WarmBrowser(options_from_args(args), args.contexts, args.min_interval)
+    await warm.start()
+    try:
+        await ScrapeDaemon(warm).serve(*parse_addr(args.listen))
+    finally:
+        await warm.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--listen", default=os.getenv("LOL_DAEMON", DEF_LISTEN), help="HOST:PORT（只建議綁本機）")
+    ap.add_argument("--contexts", type=int, default=DEF_CONTEXTS, help="每種語系保持幾個 context（同時處理的工作數）")
+    ap.add_argument("--min-interval", type=float, default=float(os.getenv("LOL_MIN_INTERVAL", DEF_MIN_INTERVAL)),
+                    help="同網域兩次導覽的最小間隔秒數")
+    add_scrape_args(ap)
+    args = ap.parse_args()
+    if args.offline:
+        ap.error("--offline does not need a daemon")
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+批次抓取的工作帳本（JSONL，append-only；同一 key 以最後一筆為準）。
+
+key = hero|mode|tier|patch|lang，每筆記錄狀態、時間、列數、輸出檔 sha256 與嘗試次數。
+重跑時：新鮮的成功結果直接略過；失敗者依指數退避決定何時可重試。
+"""
+from __future__ import annotations
+import datetime, hashlib, json, os
+from typing import Dict, List, Optional
+
+LEDGER_PATH = "data/raw/_scrape_ledger.jsonl"
+
+DEF_FRESH_HOURS = 24.0
+DEF_BACKOFF_S = 30.0
+MAX_BACKOFF_S = 3600.0
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now().astimezone()
+
+
+def job_key(hero: str, mode: str, tier: str, patch: str, lang: str) -> str:
+    return "|".join(str(x).lower() for x in (hero, mode, tier, patch, lang))
+
+
+def file_sha256(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def csv_rows(path: str) -> int:
+    """資料列數（不含表頭）；檔案不存在回傳 0。.parquet 讀 footer 的 num_rows。"""
+    if not os.path.exists(path):
+        return 0
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path, "rb") as f:
+        n = sum(1 for line in f if line.strip())
+    return max(n - 1, 0)
+
+
+def backoff_seconds(attempts: int, base: float = DEF_BACKOFF_S) -> float:
+    return min(base * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_S)
+
+
+class JobLedger:
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = path
+        self.latest: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # 中途崩潰可能留下半行
+                    self.latest[rec["key"]] = rec
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.latest.get(key)
+
+    def attempts(self, key: str) -> int:
+        rec = self.get(key)
+        return int(rec.get("attempts", 0)) if rec and rec.get("status") != "ok" else 0
+
+    def record(self, key: str, status: str, *, started_at: str, outputs: Dict[str, str],
+               error: Optional[str] = None) -> Dict:
+        """outputs: {"winning": path, "sets": path}；列數與雜湊由檔案現況計算。"""
+        attempts = 0 if status == "ok" else self.attempts(key) + 1
+        rec = {
+            "key": key, "status": status,
+            "started_at": started_at, "finished_at": _now().isoformat(),
+            "attempts": attempts,
+            "rows": {k: csv_rows(p) for k, p in outputs.items()},
+            "sha256": {k: file_sha256(p) for k, p in outputs.items()},
+            "outputs": outputs,
+        }
+        if error:
+            rec["error"] = error
+        d = os.path.dirname(os.path.abspath(self.path))
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.latest[key] = rec
+        return rec
+
+    def is_fresh(self, key: str, max_age_hours: float = DEF_FRESH_HOURS) -> bool:
+        """上次成功、未過期，且輸出檔仍與當時雜湊相同。"""
+        rec = self.get(key)
+        if not rec or rec.get("status") != "ok":
+            return False
+        age = (_now() - datetime.datetime.fromisoformat(rec["finished_at"])).total_seconds()
+        if age > max_age_hours * 3600:
+            return False
+        return all(file_sha256(p) == rec.get("sha256", {}).get(k) for k, p in rec.get("outputs", {}).items())
+
+    def retry_at(self, key: str, base: float = DEF_BACKOFF_S) -> Optional[datetime.datetime]:
+        """失敗記錄的下次可重試時間；非失敗狀態回傳 None。"""
+        rec = self.get(key)
+        if not rec or rec.get("status") == "ok":
+            return None
+        return datetime.datetime.fromisoformat(rec["finished_at"]) + datetime.timedelta(seconds=backoff_seconds(int(rec.get("attempts", 1)), base))
+
+    def pending(self, keys: List[str], *, max_age_hours: float = DEF_FRESH_HOURS, base: float = DEF_BACKOFF_S) -> Dict[str, str]:
+        """回傳 {key: reason}：reason 為 'fresh' / 'backoff' 者略過，'todo' 者需執行。"""
+        out = {}
+        now = _now()
+        for k in keys:
+            if self.is_fresh(k, max_age_hours):
+                out[k] = "fresh"
+            elif (t := self.retry_at(k, base)) is not None and t > now:
+                out[k] = "backoff"
+            else:
+                out[k] = "todo"
+        return out
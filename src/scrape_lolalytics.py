@@ -5,16 +5,33 @@
 - 以固定步長 378px 右移（等同使用者拖動），每步抽取可見列，直到：
   1) 無法再右移，或
   2) 沒有新資料連續數次，或
-  3) 新抓到的 set_sample_size < 2。
+  3) 新抓到的 set_sample_size < --min-games（預設 2），或
+  4) 已取得 --top-n 列。
+--stream-sets 時逐列以 chunk 寫入輸出檔，不在記憶體累積整張表；去重只存 64-bit 摘要。
 
 說明：Lolalytics 的 Qwik 前端會在 scroller 的 on:scroll 事件裡改 inner list 的 padding-left，
 這裡採用修改 scroller.scrollLeft 來觸發重繪，比直接改 padding-left 更穩定。
 """
 
-import argparse, os, time
-from typing import Tuple, List, Dict, Any
+import argparse, asyncio, csv, hashlib, json, os, time
+from dataclasses import dataclass
+from typing import AsyncIterator, Tuple, List, Dict, Any, Optional
+from urllib.parse import urlparse
 import pandas as pd
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout, Page
+from playwright.async_api import async_playwright, TimeoutError as PWTimeout, Page, Browser, BrowserContext
+
+try:
+    from .lolalytics_payload import DEF_MIN_GAMES, parse_winning as _payload_winning, parse_sets_5 as _payload_sets_5
+    from .page_cache import PageCache, covers, tables_from_entry, CACHE_DIR, DEF_TTL_S, DEF_MAX_MB
+    from .columnar import (FORMATS, DEF_FORMAT, HAVE_ARROW, IMG_ID_RE, SET_COLS, SetsChunkWriter,
+                          sets_columnar, write_table)
+    from .spans import Tracer, NULL_TRACER
+except ImportError:  # 以 python src/scrape_lolalytics.py 直接執行
+    from lolalytics_payload import DEF_MIN_GAMES, parse_winning as _payload_winning, parse_sets_5 as _payload_sets_5
+    from page_cache import PageCache, covers, tables_from_entry, CACHE_DIR, DEF_TTL_S, DEF_MAX_MB
+    from columnar import (FORMATS, DEF_FORMAT, HAVE_ARROW, IMG_ID_RE, SET_COLS, SetsChunkWriter,
+                         sets_columnar, write_table)
+    from spans import Tracer, NULL_TRACER
 
 LANG = "zh_tw"
 DEF_MODE = "aram"
@@ -26,6 +43,39 @@ SCROLL_PAUSE_MS = 160
 MAX_SCROLL_STEPS = 800
 MAX_STALL = 6
 
+# 等待策略：adaptive = 以 MutationObserver 等 DOM 靜止、上限依實測重繪時間調整；fixed = 舊版固定睡眠（對照用）
+WAIT_MODES = ("adaptive", "fixed")
+DEF_WAIT = "adaptive"
+READY_SELECTOR = "img[src*='/item64/']"  # 出現裝備圖即代表建置頁資料已渲染
+READY_TIMEOUT_MS = 45000
+QUIET_MS = 40          # 連續這麼久沒有 DOM 變動就視為重繪完成
+MIN_WAIT_MS = 80       # 自適應等待上限的範圍
+MAX_WAIT_MS = 1500
+
+# 併發模式：同一瀏覽器下同時開幾個 context，以及同網域兩次導覽的最小間隔（秒）
+DEF_CONCURRENCY = 4
+DEF_MIN_INTERVAL = 2.0
+
+# 擷取模式：dom = 捲動虛擬列表；network = 先解析站方資料回應，辨識不到才退回 DOM
+CAPTURE_MODES = ("dom", "network")
+DEF_CAPTURE = "dom"
+ITEMS_MAP = "data/ref/items_map.csv"
+CF_STATE = "data/cf_state.json"  # cf_shield_fix.py 預設輸出
+
+# 資源阻擋：只讀 img.src / 文字，圖片、字型、影音與追蹤腳本一律 abort（DOM 屬性不受影響）
+BLOCK_RESOURCE_TYPES = {"image", "media", "font"}
+ASSET_SIZES = "asset_sizes.json"  # 放在 --cache-dir 下
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "adservice.google.com", "amazon-adsystem.com", "facebook.net", "scorecardresearch.com",
+    "quantserve.com", "hotjar.com", "adnxs.com", "criteo.com", "pubmatic.com", "rubiconproject.com",
+    "taboola.com", "outbrain.com", "nitropay.com", "cloudflareinsights.com",
+)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/121.0.0.0 Safari/537.36")
+
 # ---------- utils ----------
 
 def _mkdir_for(path: str) -> None:
@@ -43,55 +93,371 @@ def _to_pct(s: str) -> float:
     except:
         return 0.0
 
-def _text_of(el) -> str:
+async def _text_of(el) -> str:
     try:
-        return el.inner_text().strip()
+        return (await el.inner_text()).strip()
     except:
         return ""
 
-def _attr(el, name: str) -> str:
+async def _attr(el, name: str) -> str:
     try:
-        v = el.get_attribute(name)
+        v = await el.get_attribute(name)
         return v or ""
     except:
         return ""
 
-def _name_from_img(img) -> Tuple[str, str]:
-    src = _attr(img, "src")
-    alt = _attr(img, "alt")
+async def _name_from_img(img) -> Tuple[str, str]:
+    src = await _attr(img, "src")
+    alt = await _attr(img, "alt")
     if alt:
         return alt, src
     base = os.path.basename(src).split(".")[0]
     return base, src
 
+_ITEM_NAMES: Dict[str, Dict[int, str]] = {}
+
+def _item_names(lang: str) -> Dict[int, str]:
+    """item_id → 顯示名稱（zh_tw 用 zh_tw_name，其餘用 en_name），供 payload 路徑補回 alt 名稱。"""
+    if lang not in _ITEM_NAMES:
+        col = "zh_tw_name" if lang.lower().startswith("zh") else "en_name"
+        names: Dict[int, str] = {}
+        try:
+            with open(ITEMS_MAP, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row.get("item_id", "").isdigit() and row.get(col):
+                        names[int(row["item_id"])] = row[col]
+        except OSError:
+            pass
+        _ITEM_NAMES[lang] = names
+    return _ITEM_NAMES[lang]
+
+def env_flag(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    return default if v is None else v.strip().lower() not in ("0", "false", "no", "off", "")
+
+# ---------- request routing ----------
+
+def _asset_kind(req) -> Optional[str]:
+    """會被阻擋的請求類型：image / media / font / tracker；其他回傳 None。"""
+    if req.resource_type in BLOCK_RESOURCE_TYPES:
+        return req.resource_type
+    return "tracker" if _is_tracker(req.url) else None
+
+
+class AssetSizeBook:
+    """被阻擋資源的大小紀錄，用來估算阻擋省下的流量與時間。
+
+    不阻擋（--no-block-assets）的抓取會記下每個圖片/字型/影音/追蹤請求的實際大小（依 URL 與類型平均）
+    與頁面載入耗時；阻擋時依 URL（沒見過則用同類型平均）加總被 abort 請求的估計大小，
+    並以不阻擋時的平均載入耗時減去本次耗時估算省下的時間。檔案為 JSON，合併寫入（多個行程共用）。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = self._read()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        for k in ("urls", "types", "load_s"):
+            data.setdefault(k, {})
+        return data
+
+    def estimate(self, kind: str, url: str) -> Optional[int]:
+        if url in self.data["urls"]:
+            return int(self.data["urls"][url])
+        total, n = self.data["types"].get(kind, (0, 0))
+        return int(total / n) if n else None
+
+    def load_s(self, blocked: bool) -> Optional[float]:
+        total, n = self.data["load_s"].get("blocked" if blocked else "unblocked", (0.0, 0))
+        return total / n if n else None
+
+    def record(self, assets: Dict[str, Tuple[str, int]], load_s: float, blocked: bool) -> None:
+        """合併目前檔案內容後寫回（tmp + replace）。"""
+        data = self._read()
+        for url, (kind, size) in assets.items():
+            data["urls"][url] = size
+            total, n = data["types"].get(kind, (0, 0))
+            data["types"][kind] = [total + size, n + 1]
+        key = "blocked" if blocked else "unblocked"
+        total, n = data["load_s"].get(key, (0.0, 0))
+        data["load_s"][key] = [total + load_s, n + 1]
+        _mkdir_for(self.path)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.data = data
+
+
+class TrafficStats:
+    """單一 page 的流量統計：被阻擋的請求數（依類型）、實際下載位元組、載入耗時與估計節省量。"""
+
+    def __init__(self, book: Optional[AssetSizeBook] = None, blocking: bool = True):
+        self.blocked: Dict[str, int] = {}
+        self.blocked_urls: List[Tuple[str, str]] = []
+        self.assets: Dict[str, Tuple[str, int]] = {}  # 未阻擋時實際下載的資源：url -> (類型, 位元組)
+        self.requests = 0
+        self.bytes_in = 0
+        self.load_s = 0.0
+        self.book = book
+        self.blocking = blocking
+        self._tasks: List[asyncio.Future] = []
+
+    def attach(self, page: Page) -> None:
+        page.on("requestfinished", lambda req: self._tasks.append(asyncio.ensure_future(self._sizes(req))))
+
+    def block(self, kind: str, url: str) -> None:
+        self.blocked[kind] = self.blocked.get(kind, 0) + 1
+        self.blocked_urls.append((kind, url))
+
+    async def _sizes(self, req) -> None:
+        try:
+            sz = await req.sizes()
+            size = int(sz.get("responseBodySize", 0)) + int(sz.get("responseHeadersSize", 0))
+            self.requests += 1
+            self.bytes_in += size
+            kind = _asset_kind(req)
+            if kind:
+                self.assets[req.url] = (kind, size)
+        except Exception:
+            pass
+
+    async def settle(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def savings(self) -> Optional[Dict[str, Any]]:
+        """阻擋時依 AssetSizeBook 估算省下的位元組與秒數；沒有不阻擋的紀錄時對應欄位為 None。"""
+        if self.book is None or not self.blocking:
+            return None
+        est = [self.book.estimate(kind, url) for kind, url in self.blocked_urls]
+        known = [e for e in est if e is not None]
+        base = self.book.load_s(blocked=False)
+        return {"bytes": sum(known) if known else None, "known": len(known), "blocked": len(est),
+                "seconds": (base - self.load_s) if base is not None else None}
+
+    def learn(self) -> None:
+        """把本次的資源大小與載入耗時併入 AssetSizeBook（阻擋時只記耗時）。"""
+        if self.book is None:
+            return
+        try:
+            self.book.record({} if self.blocking else self.assets, self.load_s, self.blocking)
+        except OSError as e:  # 統計寫不進去不影響抓取結果
+            print(f"[warn] asset size book not updated: {e!r}")
+
+    def summary(self) -> str:
+        blocked = sum(self.blocked.values())
+        kinds = ", ".join(f"{k}={v}" for k, v in sorted(self.blocked.items()))
+        out = (f"blocked={blocked}" + (f" ({kinds})" if kinds else "")
+               + f" requests={self.requests} transferred={self.bytes_in / 1024:.1f}KB load={self.load_s:.2f}s")
+        sv = self.savings()
+        if sv is not None:
+            kb = f"~{sv['bytes'] / 1024:.1f}KB" if sv["bytes"] is not None else "n/a"
+            sec = f"~{sv['seconds']:.2f}s" if sv["seconds"] is not None else "n/a"
+            out += f" saved={kb} ({sv['known']}/{sv['blocked']} sized) time_saved={sec}"
+        return out
+
+
+def _is_tracker(url: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    return any(host == h or host.endswith("." + h) for h in TRACKER_HOSTS)
+
+
+async def _install_blocking(page: Page, stats: TrafficStats) -> None:
+    async def _route(route):
+        req = route.request
+        kind = _asset_kind(req)
+        if kind:
+            stats.block(kind, req.url)
+            await route.abort()
+        else:
+            await route.continue_()
+    await page.route("**/*", _route)
+
+# ---------- network capture ----------
+
+class PayloadRecorder:
+    """以 page.on("response") 記錄 lolalytics 網域的 XHR/fetch JSON 回應。"""
+
+    def __init__(self):
+        self.payloads: List[Any] = []
+        self.urls: List[str] = []
+        self._tasks: List[asyncio.Future] = []
+
+    def attach(self, page: Page) -> None:
+        page.on("response", self._on_response)
+
+    def _on_response(self, resp) -> None:
+        try:
+            if resp.request.resource_type not in ("xhr", "fetch"):
+                return
+            if not urlparse(resp.url).netloc.endswith("lolalytics.com"):
+                return
+        except Exception:
+            return
+        self._tasks.append(asyncio.ensure_future(self._read(resp)))
+
+    async def _read(self, resp) -> None:
+        try:
+            self.payloads.append(await resp.json())
+            self.urls.append(resp.url)
+        except Exception:
+            pass
+
+    async def drain(self, page: Page) -> List[Any]:
+        """等待已觸發的回應讀完，並併入頁面內嵌的 qwik/json 狀態。"""
+        tasks, self._tasks = self._tasks, []
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            texts = await page.eval_on_selector_all("script[type='qwik/json']", "els => els.map(e => e.textContent || '')")
+        except Exception:
+            texts = []
+        inline = []
+        for t in texts:
+            try:
+                inline.append(json.loads(t))
+            except ValueError:
+                pass
+        return self.payloads + inline
+
+# ---------- adaptive waits ----------
+
+# 執行一個動作並等 el 子樹的 DOM 變動停止 quiet 毫秒（或到 timeout）。
+# 動作沒有造成位移時不必等重繪，只等 quiet；回傳 [before, after, scrollWidth, 耗時 ms, 是否有變動]。
+_SETTLE_JS = """
+(el, [action, dx, timeout, quiet]) => new Promise(resolve => {
+  const t0 = performance.now();
+  const win = action === 'page_bottom' || action === 'page_top';
+  const pos = () => win ? window.scrollY : el.scrollLeft;
+  const before = pos();
+  let mutated = false, qt = null, hard = null;
+  const obs = new MutationObserver(() => { mutated = true; clearTimeout(qt); qt = setTimeout(finish, quiet); });
+  function finish() {
+    obs.disconnect(); clearTimeout(hard); clearTimeout(qt);
+    resolve([before, pos(), el.scrollWidth, performance.now() - t0, mutated]);
+  }
+  obs.observe(el, {subtree: true, childList: true, attributes: true, characterData: true});
+  hard = setTimeout(finish, timeout);
+  if (action === 'scroll') {
+    el.scrollLeft = Math.min(before + (dx > 0 ? dx : el.clientWidth), el.scrollWidth - el.clientWidth);
+  } else if (action === 'nudge') {
+    el.scrollLeft = Math.max(el.scrollLeft, 1);
+  } else if (action === 'page_bottom') {
+    window.scrollTo(0, document.body.scrollHeight);
+  } else if (action === 'page_top') {
+    window.scrollTo(0, 0);
+  }
+  if (!win && action !== 'quiet') el.dispatchEvent(new Event('scroll', {bubbles: true}));
+  if (pos() === before) qt = setTimeout(finish, quiet);
+})
+"""
+
+
+class RenderWaiter:
+    """捲動 / 點擊後的等待：adaptive 模式在 DOM 靜止 QUIET_MS 時立即返回，
+    捲動的等待上限取實測重繪時間 EWMA 的 3 倍（介於 MIN/MAX_WAIT_MS），其他動作不超過舊版固定秒數。
+    每次等待累計實際耗時與舊版固定睡眠，saved_ms = 兩者差。虛擬列表各自一個（重繪速度不同）。
+    """
+
+    def __init__(self, mode: str = DEF_WAIT):
+        self.mode = mode
+        self.render_ms: Optional[float] = None
+        self.waits = 0
+        self.waited_ms = 0.0
+        self.fixed_ms = 0.0
+
+    def timeout_ms(self) -> float:
+        if self.render_ms is None:
+            return MAX_WAIT_MS  # 第一次（可能要先載入 Qwik handler）給足時間
+        return min(MAX_WAIT_MS, max(MIN_WAIT_MS, 3 * self.render_ms + QUIET_MS))
+
+    async def _act(self, page: Page, el, action: str, fixed_ms: float, dx: int = 0):
+        t0 = time.perf_counter()
+        if self.mode == "fixed":
+            res = await el.evaluate(_SETTLE_JS, [action, dx, 0, 0])
+            await page.wait_for_timeout(fixed_ms)
+        else:
+            cap = self.timeout_ms() if action == "scroll" else min(fixed_ms, self.timeout_ms())
+            res = await el.evaluate(_SETTLE_JS, [action, dx, cap, QUIET_MS])
+            if action == "scroll" and res[4]:
+                ms = max(res[3] - QUIET_MS, 0.0)
+                self.render_ms = ms if self.render_ms is None else 0.7 * self.render_ms + 0.3 * ms
+        self.waits += 1
+        self.waited_ms += (time.perf_counter() - t0) * 1e3
+        self.fixed_ms += fixed_ms
+        return res[0], res[1], res[2]
+
+    async def scroll(self, page: Page, el, fixed_ms: float, dx: int = 0):
+        """右移 dx（0 = 一個可視寬度）並等重繪；回傳 (before, after, scrollWidth)。"""
+        return await self._act(page, el, "scroll", fixed_ms, dx)
+
+    async def nudge(self, page: Page, el, fixed_ms: float) -> None:
+        await self._act(page, el, "nudge", fixed_ms)
+
+    async def page_scroll(self, page: Page, where: str, fixed_ms: float) -> None:
+        await self._act(page, page.locator("body"), f"page_{where}", fixed_ms)
+
+    async def quiet(self, page: Page, fixed_ms: float) -> None:
+        await self._act(page, page.locator("body"), "quiet", fixed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"waits": self.waits, "waited_ms": round(self.waited_ms, 1),
+                "saved_ms": round(self.fixed_ms - self.waited_ms, 1)}
+
+    def add(self, other: "RenderWaiter") -> None:
+        self.waits += other.waits
+        self.waited_ms += other.waited_ms
+        self.fixed_ms += other.fixed_ms
+
 # ---------- navigation / page-ready ----------
 
-def _goto_build_page(page: Page, hero: str, mode: str, tier: str, patch: str, lang: str) -> str:
-    url = f"https://lolalytics.com/{lang}/lol/{hero}/{mode}/build/?tier={tier}&patch={patch}"
-    page.goto(url, wait_until="domcontentloaded")
-    try:
-        page.wait_for_load_state("networkidle", timeout=45000)
-    except Exception:
-        pass
-    try:
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        page.wait_for_timeout(600)
-        page.evaluate("window.scrollTo(0, 0)")
-        page.wait_for_timeout(200)
-    except Exception:
-        pass
-    try:
-        os.makedirs("data/raw", exist_ok=True)
-        page.screenshot(path="data/raw/snap_last.png", full_page=True)
-        with open("data/raw/page_last.html", "w", encoding="utf-8") as f:
-            f.write(page.content())
-    except Exception:
-        pass
+def _build_url(hero: str, mode: str, tier: str, patch: str, lang: str) -> str:
+    return f"https://lolalytics.com/{lang}/lol/{hero}/{mode}/build/?tier={tier}&patch={patch}"
+
+async def _goto_build_page(page: Page, hero: str, mode: str, tier: str, patch: str, lang: str,
+                           limiter: Optional["DomainRateLimiter"] = None, tracer: Tracer = NULL_TRACER,
+                           waiter: Optional[RenderWaiter] = None) -> str:
+    waiter = waiter or RenderWaiter()
+    url = _build_url(hero, mode, tier, patch, lang)
+    if limiter:
+        with tracer.span("rate_limit"):
+            await limiter.wait(url)
+    with tracer.span("goto"):
+        await page.goto(url, wait_until="domcontentloaded")
+    if waiter.mode == "fixed":
+        with tracer.span("networkidle") as rec:
+            try:
+                await page.wait_for_load_state("networkidle", timeout=READY_TIMEOUT_MS)
+            except Exception:
+                rec["timeout"] = True
+    else:
+        # 只等需要的內容出現，不等廣告 / 追蹤請求讓網路閒置
+        with tracer.span("ready") as rec:
+            try:
+                await page.wait_for_selector(READY_SELECTOR, timeout=READY_TIMEOUT_MS)
+            except Exception:
+                rec["timeout"] = True
+    with tracer.span("lazy_scroll") as rec:
+        # 捲到底再回頂，觸發延遲載入的區塊
+        try:
+            await waiter.page_scroll(page, "bottom", 600)
+            await waiter.page_scroll(page, "top", 200)
+        except Exception:
+            pass
+        rec.update(waiter.stats())
     return url
 
 # ---------- parsers ----------
 
-def _parse_winning_items(page: Page) -> pd.DataFrame:
+async def _parse_winning_items(page: Page, waiter: Optional[RenderWaiter] = None) -> pd.DataFrame:
+    waiter = waiter or RenderWaiter()
     block = page.locator(
         "xpath=//div[contains(@class,'flex') and contains(@class,'h-[128px]') and contains(@class,'mb-2') and contains(@class,'border')"
         " and .//div[@class='my-1' and normalize-space()='Winning']"
@@ -99,30 +465,30 @@ def _parse_winning_items(page: Page) -> pd.DataFrame:
     ).first
 
     try:
-        block.wait_for(state="visible", timeout=10000)
+        await block.wait_for(state="visible", timeout=10000)
     except Exception:
         try:
             with open("data/raw/winning_block_dump.pre.html","w",encoding="utf-8") as f:
-                f.write(page.content())
+                f.write(await page.content())
         except Exception:
             pass
         return pd.DataFrame(columns=["img","name","win_rate","pick_rate","sample_size"])
 
-    block.scroll_into_view_if_needed()
+    await block.scroll_into_view_if_needed()
 
     scroller = block.locator("xpath=.//div[contains(@class,'overflow-x-scroll')]").first
     try:
-        scroller.wait_for(state="visible", timeout=10000)
+        await scroller.wait_for(state="visible", timeout=10000)
     except Exception:
         try:
             with open("data/raw/winning_block_dump.norows.html","w",encoding="utf-8") as f:
-                f.write(block.inner_html())
+                f.write(await block.inner_html())
         except Exception:
             pass
         return pd.DataFrame(columns=["img","name","win_rate","pick_rate","sample_size"])
 
-    def _extract_rows():
-        return scroller.evaluate(
+    async def _extract_rows():
+        return await scroller.evaluate(
             """
             (el) => {
               const out = [];
@@ -153,13 +519,12 @@ def _parse_winning_items(page: Page) -> pd.DataFrame:
     data = []
 
     try:
-        scroller.evaluate("(el) => { el.scrollLeft = 1; el.dispatchEvent(new Event('scroll', {bubbles:true})); }")
+        await waiter.nudge(page, scroller, 200)
     except Exception:
         pass
-    page.wait_for_timeout(200)
 
     for _ in range(60):
-        rows = _extract_rows()
+        rows = await _extract_rows()
         new_added = 0
         for r in rows:
             key = r.get("src","")
@@ -179,27 +544,15 @@ def _parse_winning_items(page: Page) -> pd.DataFrame:
             })
             new_added += 1
 
-        moved = scroller.evaluate(
-            """
-            (el) => {
-              const before = el.scrollLeft;
-              const next = Math.min(el.scrollLeft + el.clientWidth, el.scrollWidth);
-              el.scrollLeft = next;
-              el.dispatchEvent(new Event('scroll', {bubbles:true}));
-              return [before, el.scrollLeft, el.scrollWidth];
-            }
-            """
-        )
-        page.wait_for_timeout(160)
-
-        before, after, _total = moved
+        # 右移一個可視寬度並等重繪
+        before, after, _total = await waiter.scroll(page, scroller, 160)
         if after == before and new_added == 0:
             break
 
     if not data:
         try:
             with open("data/raw/winning_block_dump.fail.html","w",encoding="utf-8") as f:
-                f.write(block.inner_html())
+                f.write(await block.inner_html())
         except Exception:
             pass
 
@@ -207,29 +560,30 @@ def _parse_winning_items(page: Page) -> pd.DataFrame:
 
 # ---------- Actually Built Sets: scrolling 5-piece rows ----------
 
-def _click_sets_five(page: Page) -> None:
+async def _click_sets_five(page: Page, waiter: Optional[RenderWaiter] = None) -> None:
     """Actually Built Sets：只切到 a_5（不含靴的 5 件）。"""
+    waiter = waiter or RenderWaiter()
     try:
         a5 = page.locator("[data-type='a_5']").first
-        if a5 and a5.count() > 0:
-            a5.click()
-            page.wait_for_selector("img[data-id^='4_']", timeout=5000)
-            time.sleep(0.15)
+        if a5 and await a5.count() > 0:
+            await a5.click()
+            await page.wait_for_selector("img[data-id^='4_']", timeout=5000)
+            await waiter.quiet(page, 150)
     except Exception:
         pass
 
-def _find_sets_scroller(page: Page):
+async def _find_sets_scroller(page: Page):
     """返回 (scroller, inner_list)；皆為 Locator。找不到則 (None, None)。"""
     # 候選：具有 overflow-x-scroll，且其下存在一個有 padding-left 風格的 list 容器
     scrollers = page.locator(
         "xpath=//div[contains(@class,'overflow-x-scroll') and .//div[contains(@class,'gap-[6px]') and contains(@class,'text-center') and contains(@style,'padding-left')]]"
     )
-    count = scrollers.count() if scrollers else 0
+    count = await scrollers.count() if scrollers else 0
     for i in range(count):
         sc = scrollers.nth(i)
         try:
             # 確認此 scroller 裡可見 5 件列（各有 data-id^='0_'..'4_'）
-            ok = sc.evaluate(
+            ok = await sc.evaluate(
                 """
                 (el) => {
                   const hasRow = Array.from(el.querySelectorAll('div')).some(row =>
@@ -247,9 +601,9 @@ def _find_sets_scroller(page: Page):
     return None, None
 
 
-def _extract_visible_sets(scroller) -> List[Dict[str, Any]]:
+async def _extract_visible_sets(scroller) -> List[Dict[str, Any]]:
     """在給定 scroller 目前畫面中抽取 5 件列。回傳 list(dict)。"""
-    rows = scroller.evaluate(
+    rows = await scroller.evaluate(
         """
         (el) => {
           const out = [];
@@ -288,44 +642,53 @@ def _extract_visible_sets(scroller) -> List[Dict[str, Any]]:
     return rows or []
 
 
-def _parse_sets_5(page: Page) -> pd.DataFrame:
-    _click_sets_five(page)
+def _set_digest(names: List[str], images: List[str]) -> int:
+    """套裝的 64-bit 去重鍵：優先用圖檔 URL 中的裝備 id，取不到才用名稱。"""
+    ids = [m.group(1) for m in (IMG_ID_RE.search(src or "") for src in images) if m]
+    key = ",".join(ids) if len(ids) == len(images) else "|".join(names)
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
 
-    # 永遠保留一份完整 DOM 方便除錯
-    try:
-        _mkdir_for("data/raw/page_last.html")
-        with open("data/raw/page_last.html","w",encoding="utf-8") as f:
-            f.write(page.content())
-    except Exception:
-        pass
 
-    scroller, inner = _find_sets_scroller(page)
+async def _iter_sets_5(page: Page, *, min_games: int = DEF_MIN_GAMES, top_n: int = 0,
+                       waiter: Optional[RenderWaiter] = None) -> AsyncIterator[Dict[str, Any]]:
+    """逐列產生 a_5 套裝（dict，欄位同 sets CSV），不在記憶體中累積整張表。
+
+    停止條件：無法再右移 / 連續無新資料 / 某批出現 set_sample_size < min_games（該批照樣輸出），
+    或已產生 top_n 列（top_n=0 不限）。去重只保留 64-bit 摘要。
+    """
+    waiter = waiter or RenderWaiter()
+    await _click_sets_five(page, waiter)
+
+    produced = 0
+    scroller, inner = await _find_sets_scroller(page)
     if not scroller:
         # 退而求其次，沿用舊法從全頁抓可見列
         imgs0 = page.locator("css=img[data-id^='0_']")
         try:
-            total = imgs0.count()
+            total = await imgs0.count()
         except Exception:
             total = 0
-        if total == 0:
-            return pd.DataFrame(columns=["items","items_img","set_win_rate","set_pick_rate","set_sample_size"])
-        # 沒有捲動器就只收一次可見區
-        return _collect_sets_from_scoped(imgs0)
+        if total:
+            # 沒有捲動器就只收一次可見區
+            for row in (await _collect_sets_from_scoped(imgs0)).to_dict("records"):
+                yield row
+                produced += 1
+                if top_n and produced >= top_n:
+                    return
+        return
 
-    seen_key = set()
-    out: List[Dict[str, Any]] = []
+    seen: set = set()
     stall = 0
     last_left = -1
 
     # 先觸發一次 scroll 以保險
     try:
-        scroller.evaluate("(el)=>{ el.scrollLeft = Math.max(el.scrollLeft, 1); el.dispatchEvent(new Event('scroll', {bubbles:true})); }")
-        page.wait_for_timeout(120)
+        await waiter.nudge(page, scroller, 120)
     except Exception:
         pass
 
     for step in range(MAX_SCROLL_STEPS):
-        rows = _extract_visible_sets(scroller)
+        rows = await _extract_visible_sets(scroller)
         new_added = 0
         stop_due_to_small_sample = False
         for r in rows:
@@ -336,37 +699,29 @@ def _parse_sets_5(page: Page) -> pd.DataFrame:
             # 排除起手裝的假陽性（藥水）
             if any(src.endswith("/2003.webp") or src.endswith("/2031.webp") for src in images):
                 continue
-            key = "|".join(names)
-            if key in seen_key:
+            digest = _set_digest(names, images)
+            if digest in seen:
                 continue
-            seen_key.add(key)
+            seen.add(digest)
             win, pick, games = float(r.get("win",0)), float(r.get("pick",0)), int(r.get("sample",0))
-            out.append({
-                "items": key,
+            yield {
+                "items": "|".join(names),
                 "items_img": "|".join(images),
                 "set_win_rate": win,
                 "set_pick_rate": pick,
                 "set_sample_size": games,
-            })
+            }
+            produced += 1
             new_added += 1
-            if games < 2:
+            if top_n and produced >= top_n:
+                return
+            if games < min_games:
                 stop_due_to_small_sample = True
         if stop_due_to_small_sample:
             break
 
-        # 嘗試右移一個固定步距
-        before, after, sw = scroller.evaluate(
-            f"""
-            (el) => {{
-              const before = el.scrollLeft;
-              const next = Math.min(before + {SCROLL_STEP}, el.scrollWidth - el.clientWidth);
-              el.scrollLeft = next;
-              el.dispatchEvent(new Event('scroll', {{bubbles:true}}));
-              return [before, el.scrollLeft, el.scrollWidth];
-            }}
-            """
-        )
-        page.wait_for_timeout(SCROLL_PAUSE_MS)
+        # 嘗試右移一個固定步距並等重繪
+        before, after, sw = await waiter.scroll(page, scroller, SCROLL_PAUSE_MS, SCROLL_STEP)
 
         if after == before:
             stall += 1
@@ -379,40 +734,64 @@ def _parse_sets_5(page: Page) -> pd.DataFrame:
             break
         last_left = after
 
-    cols = ["items","items_img","set_win_rate","set_pick_rate","set_sample_size"]
-    df = pd.DataFrame(out, columns=cols) if out else pd.DataFrame(columns=cols)
-
-    if df.empty:
+    if not produced:
         try:
             block = page.locator("xpath=//div[.//div[@data-type='a_5']]").first
             _mkdir_for("data/raw/sets_block_dump.fail.html")
             with open("data/raw/sets_block_dump.fail.html","w",encoding="utf-8") as f:
-                f.write(block.inner_html())
+                f.write(await block.inner_html())
         except Exception:
             pass
 
-    return df
 
+async def _parse_sets_5(page: Page, *, min_games: int = DEF_MIN_GAMES, top_n: int = 0,
+                        waiter: Optional[RenderWaiter] = None) -> pd.DataFrame:
+    out = [row async for row in _iter_sets_5(page, min_games=min_games, top_n=top_n, waiter=waiter)]
+    return pd.DataFrame(out, columns=SET_COLS)
+
+
+class StreamedSets:
+    """串流模式下 sets 已直接寫入檔案；只帶路徑與列數（提供 empty / len 供呼叫端沿用 DataFrame 的判斷）。"""
+
+    def __init__(self, path: str, rows: int):
+        self.path = path
+        self.rows = rows
+
+    @property
+    def empty(self) -> bool:
+        return self.rows == 0
+
+    def __len__(self) -> int:
+        return self.rows
+
+
+async def _stream_sets_5(page: Page, path: str, fmt: str, *, min_games: int = DEF_MIN_GAMES,
+                         top_n: int = 0, waiter: Optional[RenderWaiter] = None) -> StreamedSets:
+    with SetsChunkWriter(path, fmt) as w:
+        async for row in _iter_sets_5(page, min_games=min_games, top_n=top_n, waiter=waiter):
+            w.append(row)
+    return StreamedSets(path, w.rows)
 
-def _collect_sets_from_scoped(imgs0_locator) -> pd.DataFrame:
+
+async def _collect_sets_from_scoped(imgs0_locator) -> pd.DataFrame:
     out, seen = [], set()
     try:
-        total = imgs0_locator.count()
+        total = await imgs0_locator.count()
     except Exception:
         total = 0
     for i in range(total):
         img0 = imgs0_locator.nth(i)
         row = img0.locator("xpath=ancestor::div[1]")
         for _ in range(6):
-            if all(row.locator(f"css=img[data-id^='{k}_']").count() > 0 for k in range(5)):
+            if all([await row.locator(f"css=img[data-id^='{k}_']").count() > 0 for k in range(5)]):
                 break
             row = row.locator("xpath=ancestor::div[1]")
-        if any(row.locator(f"css=img[data-id^='{k}_']").count() == 0 for k in range(5)):
+        if any([await row.locator(f"css=img[data-id^='{k}_']").count() == 0 for k in range(5)]):
             continue
         names, imgs, skip = [], [], False
         for k in range(5):
             q = row.locator(f"css=img[data-id^='{k}_']").first
-            n, src = _name_from_img(q)
+            n, src = await _name_from_img(q)
             names.append(n)
             imgs.append(src)
             if src.endswith("/2003.webp") or src.endswith("/2031.webp"):
@@ -423,7 +802,7 @@ def _collect_sets_from_scoped(imgs0_locator) -> pd.DataFrame:
         if key in seen:
             continue
         seen.add(key)
-        texts = [t.strip() for t in row.locator("xpath=.//div[contains(@class,'my-1')]").all_inner_texts() if t.strip()]
+        texts = [t.strip() for t in await row.locator("xpath=.//div[contains(@class,'my-1')]").all_inner_texts() if t.strip()]
         nums = []
         for t in texts:
             try:
@@ -440,30 +819,346 @@ def _collect_sets_from_scoped(imgs0_locator) -> pd.DataFrame:
             "set_pick_rate": pick,
             "set_sample_size": sample,
         })
-    cols = ["items","items_img","set_win_rate","set_pick_rate","set_sample_size"]
-    return pd.DataFrame(out, columns=cols) if out else pd.DataFrame(columns=cols)
+    return pd.DataFrame(out, columns=SET_COLS)
 
 # ---------- runner ----------
 
-def scrape(hero: str, mode: str, tier: str, patch: str, lang: str, no_headless: bool=False):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not no_headless)
-        ctx = browser.new_context(
-            locale=lang.replace("_","-"),
-            user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/121.0.0.0 Safari/537.36"),
-            viewport={"width": 1440, "height": 2200},
-            ignore_https_errors=True,
-        )
-        page = ctx.new_page()
-        url = _goto_build_page(page, hero, mode, tier, patch, lang)
+class DomainRateLimiter:
+    """同網域的導覽請求至少間隔 min_interval 秒（多個 page 共用，避免觸發 Cloudflare 門檻）。"""
+
+    def __init__(self, min_interval: float = DEF_MIN_INTERVAL):
+        self.min_interval = max(0.0, float(min_interval))
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last: Dict[str, float] = {}
+
+    async def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self._last.get(host, 0.0) + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last[host] = time.monotonic()
+
+
+async def _new_context(browser: Browser, lang: str, storage_state: Optional[str] = None) -> BrowserContext:
+    """storage_state：cf_shield_fix.py bootstrap 存下的 cookie（存在才載入），帶著通過 Cloudflare 的狀態開頁。"""
+    return await browser.new_context(
+        locale=lang.replace("_","-"),
+        user_agent=USER_AGENT,
+        viewport={"width": 1440, "height": 2200},
+        ignore_https_errors=True,
+        storage_state=storage_state if storage_state and os.path.exists(storage_state) else None,
+    )
+
+
+@dataclass
+class ScrapeOptions:
+    no_headless: bool = False
+    capture: str = DEF_CAPTURE
+    block_assets: bool = True
+    cache: Optional[PageCache] = None
+    offline: bool = False      # 只從 cache 重建，不啟動 Chromium
+    tracer: Optional[Tracer] = None  # 各階段 span（goto / ready / winning / sets …）
+    format: str = DEF_FORMAT
+    stream_sets: Optional[str] = None  # DOM 捲動的 sets 直接分批寫入此路徑（可含 {hero}）
+    min_games: int = DEF_MIN_GAMES
+    top_n: int = 0
+    storage_state: Optional[str] = None  # cf_shield_fix.py 的 storage state JSON
+    wait: str = DEF_WAIT
+    asset_sizes: Optional[AssetSizeBook] = None  # 估算阻擋省下的流量/時間（見 AssetSizeBook）
+    debug_dir: Optional[str] = None  # 設定時每名英雄另存 {hero}_page.html / _snap.png / _payload.json
+
 
-        win_df = _parse_winning_items(page)
-        sets_df = _parse_sets_5(page)
+def _from_cache(url: str, lang: str, opts: ScrapeOptions):
+    if not opts.cache:
+        return None
+    entry = opts.cache.get(url, any_age=opts.offline)
+    if entry is None:
+        return None
+    if not covers(entry, opts.min_games, opts.top_n):
+        # 快取的 sets 被較嚴的 --min-games / --top-n 截短過，不能當成這次要求的完整結果
+        print(f"[cache] skip {url}: cached sets cut at {entry.get('cutoff')}, need min_games={opts.min_games} top_n={opts.top_n}")
+        return None
+    win_df, sets_df = tables_from_entry(entry, _item_names(lang), min_games=opts.min_games, top_n=opts.top_n)
+    print(f"[cache] hit {url} (fetched_at={entry.get('fetched_at')})")
+    return win_df, sets_df, url
 
-        ctx.close(); browser.close()
+
+async def _dump_debug(page: Page, hero: str, debug_dir: str, recorder: Optional["PayloadRecorder"]) -> None:
+    """除錯用：頁面關閉前的 DOM、整頁截圖與收到的 payload，依英雄命名（併發時不互相覆寫）。"""
+    base = os.path.join(debug_dir, hero)
+    try:
+        _mkdir_for(base + "_page.html")
+        with open(base + "_page.html", "w", encoding="utf-8") as f:
+            f.write(await page.content())
+        await page.screenshot(path=base + "_snap.png", full_page=True)
+        if recorder:
+            with open(base + "_payload.json", "w", encoding="utf-8") as f:
+                json.dump({"urls": recorder.urls, "payloads": recorder.payloads}, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"[warn] {hero}: debug dump failed: {e!r}")
+
+
+async def _scrape_page(ctx: BrowserContext, hero: str, mode: str, tier: str, patch: str, lang: str,
+                       limiter: Optional[DomainRateLimiter] = None, opts: Optional[ScrapeOptions] = None):
+    opts = opts or ScrapeOptions()
+    tr = (opts.tracer or NULL_TRACER).child(hero=hero)
+    page = await ctx.new_page()
+    stats = TrafficStats(opts.asset_sizes, opts.block_assets)
+    stats.attach(page)
+    if opts.block_assets:
+        await _install_blocking(page, stats)
+    recorder = PayloadRecorder() if opts.capture == "network" else None
+    if recorder:
+        recorder.attach(page)
+    try:
+        t0 = time.perf_counter()
+        page_wait, win_wait, sets_wait = (RenderWaiter(opts.wait) for _ in range(3))
+        url = await _goto_build_page(page, hero, mode, tier, patch, lang, limiter, tr, page_wait)
+        stats.load_s = time.perf_counter() - t0
+        win_df = sets_df = None
+        if recorder:
+            with tr.span("payload") as rec:
+                names = _item_names(lang)
+                payloads = await recorder.drain(page)
+                win_df = _payload_winning(payloads, names)
+                cut = dict(min_games=opts.min_games, top_n=opts.top_n)
+                sets_df = _payload_sets_5(payloads, names, **cut)
+                if sets_df.empty:
+                    # a_5 分頁的資料可能要切換後才載入
+                    await _click_sets_five(page, page_wait)
+                    sets_df = _payload_sets_5(await recorder.drain(page), names, **cut)
+                rec.update(winning=len(win_df), sets=len(sets_df), responses=len(recorder.urls))
+            print(f"[info] {hero}: payload winning={len(win_df)} sets={len(sets_df)} (responses={len(recorder.urls)})")
+        if win_df is None or win_df.empty:
+            with tr.span("winning_scroll") as rec:
+                win_df = await _parse_winning_items(page, win_wait)
+                rec.update(rows=len(win_df), **win_wait.stats())
+        if sets_df is None or sets_df.empty:
+            with tr.span("sets_scroll", streamed=bool(opts.stream_sets)) as rec:
+                if opts.stream_sets:
+                    sets_df = await _stream_sets_5(page, opts.stream_sets.format(hero=hero), opts.format,
+                                                   min_games=opts.min_games, top_n=opts.top_n, waiter=sets_wait)
+                else:
+                    sets_df = await _parse_sets_5(page, min_games=opts.min_games, top_n=opts.top_n, waiter=sets_wait)
+                rec.update(rows=len(sets_df), **sets_wait.stats())
+        await stats.settle()
+        stats.learn()
+        for w in (win_wait, sets_wait):
+            page_wait.add(w)
+        waits = page_wait.stats()
+        print(f"[info] {hero}: {stats.summary()} waits={waits['waits']} "
+              f"waited={waits['waited_ms'] / 1e3:.1f}s saved={waits['saved_ms'] / 1e3:.1f}s ({opts.wait})")
+        # 串流結果不在記憶體中，不寫入頁面快取
+        if opts.cache and not win_df.empty and isinstance(sets_df, pd.DataFrame) and not sets_df.empty:
+            opts.cache.put(url, win_df, sets_df, recorder.payloads if recorder else None,
+                           min_games=opts.min_games, top_n=opts.top_n)
         return win_df, sets_df, url
+    finally:
+        if opts.debug_dir:
+            await _dump_debug(page, hero, opts.debug_dir, recorder)
+        await page.close()
+
+
+async def _scrape_async(hero: str, mode: str, tier: str, patch: str, lang: str, opts: ScrapeOptions):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not opts.no_headless)
+        ctx = await _new_context(browser, lang, opts.storage_state)
+        try:
+            return await _scrape_page(ctx, hero, mode, tier, patch, lang, opts=opts)
+        finally:
+            await ctx.close(); await browser.close()
+
+
+def scrape(hero: str, mode: str, tier: str, patch: str, lang: str, no_headless: bool=False,
+           opts: Optional[ScrapeOptions] = None):
+    opts = opts or ScrapeOptions(no_headless=no_headless)
+    url = _build_url(hero, mode, tier, patch, lang)
+    hit = _from_cache(url, lang, opts)
+    if hit:
+        return hit
+    if opts.offline:
+        raise RuntimeError(f"offline: no cached payload for {url}")
+    return asyncio.run(_scrape_async(hero, mode, tier, patch, lang, opts))
+
+
+def _deliver(hero: str, res: Any, results: Dict[str, Any], on_result) -> None:
+    """呼叫 on_result；寫檔或 ledger 失敗只記為該英雄的結果（例外），不中斷其他英雄。"""
+    if on_result and not isinstance(res, Exception):
+        try:
+            on_result(hero, *res)
+        except Exception as e:
+            res = e
+    results[hero] = res
+
+
+async def scrape_many(heroes: List[str], mode: str, tier: str, patch: str, lang: str, *,
+                      concurrency: int = DEF_CONCURRENCY, min_interval: float = DEF_MIN_INTERVAL,
+                      opts: Optional[ScrapeOptions] = None, on_result=None) -> Dict[str, Any]:
+    """單一 Chromium、最多 concurrency 個 context 同時抓取多名英雄。
+
+    context 放在 queue 裡重複使用（保留 cookie），每名英雄只開/關一個 page。
+    on_result(hero, win_df, sets_df, url) 在每名英雄完成時呼叫；抓取或 on_result 失敗時結果為該例外。
+    cache 命中者不開 page；全部命中（或 offline）時不啟動瀏覽器。
+    """
+    opts = opts or ScrapeOptions()
+    limiter = DomainRateLimiter(min_interval)
+    results: Dict[str, Any] = {}
+    remaining = []
+    for hero in heroes:
+        url = _build_url(hero, mode, tier, patch, lang)
+        hit = _from_cache(url, lang, opts)
+        if hit:
+            _deliver(hero, hit, results, on_result)
+        elif opts.offline:
+            results[hero] = RuntimeError(f"offline: no cached payload for {url}")
+        else:
+            remaining.append(hero)
+    if not remaining:
+        return results
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not opts.no_headless)
+        pool: asyncio.Queue = asyncio.Queue()
+        n = max(1, min(int(concurrency), len(remaining)))
+        for _ in range(n):
+            pool.put_nowait(await _new_context(browser, lang, opts.storage_state))
+
+        async def _one(hero: str):
+            ctx = await pool.get()
+            try:
+                res = await _scrape_page(ctx, hero, mode, tier, patch, lang, limiter, opts)
+            except Exception as e:
+                res = e
+            finally:
+                pool.put_nowait(ctx)
+            _deliver(hero, res, results, on_result)
+
+        try:
+            await asyncio.gather(*(_one(h) for h in remaining))
+        finally:
+            while not pool.empty():
+                await pool.get_nowait().close()
+            await browser.close()
+    return results
+
+
+def add_scrape_args(ap: argparse.ArgumentParser) -> None:
+    """單一英雄與批次 CLI 共用的抓取選項。"""
+    ap.add_argument("--no-headless", action="store_true", help="run with browser window")
+    ap.add_argument("--capture", choices=CAPTURE_MODES, default=os.getenv("LOL_CAPTURE", DEF_CAPTURE),
+                    help="network = 先解析站方 XHR/fetch 資料，辨識不到才捲動 DOM")
+    ap.add_argument("--block-assets", action=argparse.BooleanOptionalAction, default=env_flag("LOL_BLOCK_ASSETS", True),
+                    help="abort 圖片/字型/影音/追蹤請求（預設開啟；--no-block-assets 關閉）")
+    ap.add_argument("--cache-ttl", type=float, default=float(os.getenv("LOL_CACHE_TTL", DEF_TTL_S)),
+                    help="頁面快取有效秒數；0 = 不使用快取")
+    ap.add_argument("--cache-dir", default=os.getenv("LOL_CACHE_DIR", CACHE_DIR))
+    ap.add_argument("--cache-max-mb", type=float, default=float(os.getenv("LOL_CACHE_MAX_MB", DEF_MAX_MB)),
+                    help="快取容量上限（LRU 淘汰）")
+    ap.add_argument("--offline", action="store_true", default=env_flag("LOL_OFFLINE", False),
+                    help="只從快取重建 CSV，不啟動 Chromium（忽略 TTL）")
+    ap.add_argument("--trace", default=os.getenv("LOL_TRACE"),
+                    help="各階段耗時（goto/ready/winning/sets 捲動，含等待節省的 saved_ms）以 JSON lines 附加寫入此檔")
+    ap.add_argument("--format", choices=FORMATS, default=os.getenv("LOL_FORMAT", DEF_FORMAT),
+                    help="輸出格式：parquet 另寫同名 .parquet（裝備拆成 item1..5 / item_id1..5 欄，需 pyarrow）")
+    ap.add_argument("--stream-sets", action="store_true", default=env_flag("LOL_STREAM_SETS", False),
+                    help="DOM 捲動抓到的 sets 逐批寫入輸出檔（記憶體只留一個 chunk；不寫入頁面快取）")
+    ap.add_argument("--min-games", type=int, default=int(os.getenv("LOL_MIN_GAMES", DEF_MIN_GAMES)),
+                    help="某批出現場次低於此值就停止捲動")
+    ap.add_argument("--top-n", type=int, default=int(os.getenv("LOL_TOP_N", "0")),
+                    help="sets 取滿 N 列即停止捲動；0 = 不限")
+    ap.add_argument("--state", default=os.getenv("LOL_CF_STATE", CF_STATE),
+                    help="cf_shield_fix.py bootstrap 存下的 storage state（檔案存在才載入）")
+    ap.add_argument("--wait", choices=WAIT_MODES, default=os.getenv("LOL_WAIT", DEF_WAIT),
+                    help="adaptive = 等 DOM 靜止即繼續（上限依實測重繪時間調整）；fixed = 舊版固定睡眠，供對照")
+    ap.add_argument("--daemon", default=os.getenv("LOL_DAEMON"),
+                    help="HOST:PORT，交給常駐的 scrape_daemon.py（已暖機的瀏覽器）；連不上時改在本機抓取")
+    ap.add_argument("--debug-dir", default=os.getenv("LOL_DEBUG_DIR") or None,
+                    help="每名英雄另存 DOM / 整頁截圖 / payload 到此目錄（{hero}_page.html 等）；預設不存")
+
+
+def options_from_args(args) -> ScrapeOptions:
+    use_cache = args.cache_ttl > 0 or args.offline
+    return ScrapeOptions(
+        no_headless=args.no_headless,
+        capture=args.capture,
+        block_assets=args.block_assets,
+        cache=PageCache(args.cache_dir, args.cache_ttl, args.cache_max_mb) if use_cache else None,
+        offline=args.offline,
+        tracer=Tracer(args.trace) if args.trace else None,
+        format=args.format,
+        min_games=args.min_games,
+        top_n=args.top_n,
+        storage_state=args.state,
+        wait=args.wait,
+        debug_dir=args.debug_dir,
+        asset_sizes=AssetSizeBook(os.path.join(args.cache_dir, ASSET_SIZES)),
+    )
+
+
+def scrape_argv(args) -> List[str]:
+    """把 add_scrape_args 的選項轉回命令列（供批次以子行程呼叫）。"""
+    argv = ["--capture", args.capture, "--block-assets" if args.block_assets else "--no-block-assets",
+            "--cache-ttl", str(args.cache_ttl), "--cache-dir", args.cache_dir, "--cache-max-mb", str(args.cache_max_mb),
+            "--format", args.format, "--min-games", str(args.min_games), "--top-n", str(args.top_n),
+            "--state", args.state, "--wait", args.wait]
+    if args.no_headless:
+        argv.append("--no-headless")
+    if args.offline:
+        argv.append("--offline")
+    if args.trace:
+        argv += ["--trace", args.trace]
+    if args.stream_sets:
+        argv.append("--stream-sets")
+    if args.daemon:
+        argv += ["--daemon", args.daemon]
+    if args.debug_dir:
+        argv += ["--debug-dir", args.debug_dir]
+    return argv
+
+
+def write_outputs(win_df: pd.DataFrame, set_df, winning_out: str, sets_out: str,
+                  fmt: str = DEF_FORMAT) -> List[str]:
+    """寫出 winning / sets；fmt 含 parquet 時在 CSV 路徑旁寫同名 .parquet。回傳寫出的檔案。
+
+    set_df 為 StreamedSets 時 sets 已在抓取時寫好，這裡只寫 winning。
+    """
+    written = write_table(win_df, winning_out, fmt)
+    if isinstance(set_df, StreamedSets):
+        return written
+    written += write_table(sets_columnar(set_df), sets_out, fmt, csv_df=set_df)
+    return written
+
+
+def _main_via_daemon(args) -> None:
+    """交給常駐服務抓取並寫檔，結束碼同本機模式；服務拒絕連線（未啟動）時直接返回改由本機抓取。"""
+    import sys
+    try:
+        from .scrape_daemon import daemon_request
+    except ImportError:
+        from scrape_daemon import daemon_request
+    # 服務的工作目錄可能不同，輸出路徑一律以呼叫端為準轉成絕對路徑
+    job = {"cmd": "scrape", "hero": args.hero, "mode": args.mode, "tier": args.tier, "patch": args.patch,
+           "lang": args.lang, "winning_out": os.path.abspath(args.winning_out),
+           "sets_out": os.path.abspath(args.sets_out), "format": args.format,
+           "stream_sets": args.stream_sets, "min_games": args.min_games, "top_n": args.top_n}
+    try:
+        resp = daemon_request(args.daemon, job)
+    except ConnectionRefusedError as e:
+        print(f"[warn] daemon {args.daemon} unavailable ({e}); scraping locally")
+        return
+    except (OSError, ValueError) as e:
+        # 逾時或中途斷線：服務可能仍在抓取並寫入同一批檔案，不在本機重抓
+        print(f"[error] daemon {args.daemon}: {e!r}"); sys.exit(1)
+    if not resp.get("ok"):
+        print(f"[error] daemon: {resp.get('error')}"); sys.exit(1)
+    print(f"[ok] scraped via daemon: {resp['url']} winning={resp['winning']} sets={resp['sets']} ({resp['ms']:.0f}ms)")
+    if not resp["winning"]:
+        print("[error] winning items empty"); sys.exit(2)
+    if not resp["sets"]:
+        print("[error] actually built sets empty"); sys.exit(3)
+    sys.exit(0)
 
 
 def main():
@@ -475,7 +1170,7 @@ def main():
     ap.add_argument("--lang", default=os.getenv("LOL_LANG", LANG))
     ap.add_argument("--winning_out", default=os.getenv("LOL_WINNING_OUT"))
     ap.add_argument("--sets_out", default=os.getenv("LOL_SETS_OUT"))
-    ap.add_argument("--no-headless", action="store_true", help="run with browser window")
+    add_scrape_args(ap)
     args = ap.parse_args()
 
     if not args.hero:
@@ -484,17 +1179,26 @@ def main():
         ap.error("winning output path is required (--winning_out or LOL_WINNING_OUT)")
     if not args.sets_out:
         ap.error("sets output path is required (--sets_out or LOL_SETS_OUT)")
+    if args.format != "csv" and not HAVE_ARROW:
+        ap.error("--format parquet/both requires pyarrow (pip install pyarrow)")
 
-    win_df, set_df, url = scrape(args.hero, args.mode, args.tier, args.patch, args.lang, no_headless=args.no_headless)
+    if args.daemon and not args.offline:
+        _main_via_daemon(args)
+
+    opts = options_from_args(args)
+    if args.stream_sets:
+        opts.stream_sets = args.sets_out
+    try:
+        win_df, set_df, url = scrape(args.hero, args.mode, args.tier, args.patch, args.lang, opts=opts)
+    except RuntimeError as e:
+        print(f"[error] {e}"); import sys; sys.exit(4)
 
     if win_df.empty:
         print("[warn] winning items empty")
     if set_df.empty:
         print("[warn] actually-built sets(5) empty")
 
-    _mkdir_for(args.winning_out); _mkdir_for(args.sets_out)
-    win_df.to_csv(args.winning_out, index=False, encoding="utf-8")
-    set_df.to_csv(args.sets_out, index=False, encoding="utf-8")
+    write_outputs(win_df, set_df, args.winning_out, args.sets_out, args.format)
     print(f"[ok] scraped: {url}")
 
     if win_df.empty:
@@ -1,5 +1,100 @@
 from __future__ import annotations
-import argparse, subprocess, sys, pathlib
+import argparse, asyncio, datetime, os, subprocess, sys, time, pathlib
+
+try:
+    from .scrape_lolalytics import scrape_many, write_outputs, DEF_MIN_INTERVAL, add_scrape_args, options_from_args, scrape_argv
+    from .columnar import HAVE_ARROW, sidecar_path
+    from .scrape_ledger import JobLedger, job_key, backoff_seconds, LEDGER_PATH, DEF_FRESH_HOURS, DEF_BACKOFF_S
+except ImportError:  # 以 python src/scrape_lolalytics_batch.py 直接執行
+    from scrape_lolalytics import scrape_many, write_outputs, DEF_MIN_INTERVAL, add_scrape_args, options_from_args, scrape_argv
+    from columnar import HAVE_ARROW, sidecar_path
+    from scrape_ledger import JobLedger, job_key, backoff_seconds, LEDGER_PATH, DEF_FRESH_HOURS, DEF_BACKOFF_S
+
+def _out_paths(h: str, args) -> tuple[str, str]:
+    return (f"data/raw/{h}_{args.mode}_{args.tier}_{args.patch}d_winning.csv",
+            f"data/raw/{h}_{args.mode}_{args.tier}_{args.patch}d_sets.csv")
+
+def _key(h: str, args) -> str:
+    return job_key(h, args.mode, args.tier, args.patch, args.lang)
+
+def _outputs(h: str, args) -> dict:
+    winning_out, sets_out = _out_paths(h, args)
+    out = {}
+    if args.format in ("csv", "both"):
+        out.update(winning=winning_out, sets=sets_out)
+    if args.format in ("parquet", "both"):
+        out.update(winning_parquet=sidecar_path(winning_out), sets_parquet=sidecar_path(sets_out))
+    return out
+
+def _now_iso() -> str:
+    return datetime.datetime.now().astimezone().isoformat()
+
+def _sleep_backoff(ledger: JobLedger, keys: list[str], args) -> None:
+    delay = max(backoff_seconds(max(ledger.attempts(k), 1), args.backoff) for k in keys)
+    print(f"[retry] {len(keys)} job(s) in {delay:.0f}s")
+    time.sleep(delay)
+
+def run_serial(args, heroes: list[str], ledger: JobLedger) -> list[str]:
+    failed = []
+    for h in heroes:
+        print(f"==> {h}")
+        winning_out, sets_out = _out_paths(h, args)
+        cmd = [
+            sys.executable, "src/scrape_lolalytics.py",
+            "--hero", h,
+            "--mode", args.mode,
+            "--tier", args.tier,
+            "--patch", args.patch,
+            "--lang", args.lang,
+            "--winning_out", winning_out,
+            "--sets_out",    sets_out,
+        ] + scrape_argv(args)
+        for attempt in range(args.retries + 1):
+            started = _now_iso()
+            rc = subprocess.run(cmd, check=False).returncode
+            # scrape_lolalytics：2 = winning 空、3 = sets 空
+            status = "ok" if rc == 0 else ("empty" if rc in (2, 3) else "failed")
+            ledger.record(_key(h, args), status, started_at=started, outputs=_outputs(h, args),
+                          error=None if rc == 0 else f"exit={rc}")
+            if status == "ok":
+                break
+            if attempt < args.retries:
+                _sleep_backoff(ledger, [_key(h, args)], args)
+        else:
+            failed.append(h)
+    return failed
+
+def run_concurrent(args, heroes: list[str], ledger: JobLedger) -> list[str]:
+    opts = options_from_args(args)
+    if args.stream_sets:
+        opts.stream_sets = _out_paths("{hero}", args)[1]
+    todo = list(heroes)
+    for attempt in range(args.retries + 1):
+        started = _now_iso()
+
+        def _on_result(h, win_df, set_df, url):
+            winning_out, sets_out = _out_paths(h, args)
+            write_outputs(win_df, set_df, winning_out, sets_out, args.format)
+            status = "empty" if win_df.empty or set_df.empty else "ok"
+            ledger.record(_key(h, args), status, started_at=started, outputs=_outputs(h, args),
+                          error="empty table(s)" if status == "empty" else None)
+            print(f"[{status}] {h}: winning={len(win_df)} sets={len(set_df)} <- {url}")
+
+        results = asyncio.run(scrape_many(
+            todo, args.mode, args.tier, args.patch, args.lang,
+            concurrency=args.concurrency, min_interval=args.min_interval,
+            opts=opts, on_result=_on_result,
+        ))
+        for h, r in results.items():
+            if isinstance(r, Exception):
+                ledger.record(_key(h, args), "failed", started_at=started, outputs=_outputs(h, args), error=repr(r))
+                print(f"[warn] {h}: {r!r}")
+        todo = [h for h in todo if ledger.get(_key(h, args))["status"] != "ok"]
+        if not todo:
+            break
+        if attempt < args.retries:
+            _sleep_backoff(ledger, [_key(h, args) for h in todo], args)
+    return todo
 
 def main():
     ap = argparse.ArgumentParser()
@@ -8,21 +103,38 @@ def main():
     ap.add_argument("--tier", default="d2_plus")
     ap.add_argument("--patch", default="7")
     ap.add_argument("--lang", default="zh_tw")
+    ap.add_argument("--concurrency", type=int, default=int(os.getenv("LOL_CONCURRENCY", "0")),
+                    help="0 = 逐一以子行程執行；>=1 = 共用一個瀏覽器、同時抓 N 名英雄")
+    ap.add_argument("--min-interval", type=float, default=float(os.getenv("LOL_MIN_INTERVAL", DEF_MIN_INTERVAL)),
+                    help="同網域兩次導覽的最小間隔秒數（僅併發模式）")
+    add_scrape_args(ap)
+    ap.add_argument("--ledger", default=os.getenv("LOL_LEDGER", LEDGER_PATH), help="工作帳本 JSONL 路徑")
+    ap.add_argument("--fresh-hours", type=float, default=DEF_FRESH_HOURS, help="成功結果在幾小時內視為新鮮而略過")
+    ap.add_argument("--retries", type=int, default=2, help="本次執行內失敗重試次數")
+    ap.add_argument("--backoff", type=float, default=DEF_BACKOFF_S, help="退避基準秒數（第 n 次失敗等待 base*2^(n-1)）")
+    ap.add_argument("--force", action="store_true", help="忽略帳本，全部重抓")
     args = ap.parse_args()
+    if args.format != "csv" and not HAVE_ARROW:
+        ap.error("--format parquet/both requires pyarrow (pip install pyarrow)")
 
-    for h in args.heroes:
-        print(f"==> {h}")
-        subprocess.run([
-            sys.executable, "src/scrape_lolalytics.py",
-            "--hero", h,
-            "--mode", args.mode,
-            "--tier", args.tier,
-            "--patch", args.patch,
-            "--lang", args.lang,
-            "--winning_out", f"data/raw/{h}_{args.mode}_{args.tier}_{args.patch}d_winning.csv",
-            "--sets_out",    f"data/raw/{h}_{args.mode}_{args.tier}_{args.patch}d_sets.csv",
-            "--headless"
-        ], check=False)
+    ledger = JobLedger(args.ledger)
+    keys = {h: _key(h, args) for h in args.heroes}
+    state = {k: "todo" for k in keys.values()} if args.force else \
+        ledger.pending(list(keys.values()), max_age_hours=args.fresh_hours, base=args.backoff)
+    heroes = []
+    for h, k in keys.items():
+        if state[k] == "todo":
+            heroes.append(h)
+        else:
+            print(f"[skip] {h}: {state[k]}")
+    print(f"[plan] {len(heroes)} to scrape, {len(args.heroes) - len(heroes)} skipped (ledger: {args.ledger})")
+    if not heroes:
+        return
+
+    failed = run_concurrent(args, heroes, ledger) if args.concurrency > 0 else run_serial(args, heroes, ledger)
+    if failed:
+        print(f"[warn] failed: {' '.join(failed)}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+from .io_schema import BuiltSet
+from .set_table import SetTable
+
+class SetIndex:
+    """top-K 套裝的預先索引：裝備名 → 整數 id，外加 item × set 的布林矩陣。
+
+    支撐度、共現與條件挑選都改成 mask AND / count_nonzero；
+    浮點加總一律按套裝原順序逐一累加，確保與逐列掃描的結果完全一致。
+    """
+
+    def __init__(self, sets: Sequence[BuiltSet] | SetTable):
+        if isinstance(sets, SetTable):
+            self.sets = sets
+            rows, cols, poss = self._from_table(sets)
+        else:
+            self.sets = list(sets)
+            self.item_id: Dict[str, int] = {}
+            rows, cols, poss = [], [], []
+            for j, s in enumerate(self.sets):
+                for pos, it in enumerate(s.items, start=1):
+                    rows.append(self.item_id.setdefault(it, len(self.item_id)))
+                    cols.append(j)
+                    poss.append(pos)
+        n, m = len(self.sets), len(self.item_id)
+        self.member = np.zeros((m, n), dtype=bool)
+        self.member[rows, cols] = True
+        # 逐次出現的 (裝備, 套裝, 1 起算位次)，依套裝、位次排序；同一件在一套內重複出現時各算一次（同逐列掃描）
+        self.occ_item = np.asarray(rows, dtype=np.int64)
+        self.occ_set = np.asarray(cols, dtype=np.int64)
+        self.occ_pos = np.asarray(poss, dtype=np.int64)
+        if isinstance(sets, SetTable):
+            self.win, self.pick = sets.win, sets.pick
+            self.samples = sets.samples.astype(np.int64)
+        else:
+            self.win = np.array([s.set_win_rate for s in self.sets], dtype=float)
+            self.pick = np.array([s.set_pick_rate for s in self.sets], dtype=float)
+            self.samples = np.array([s.set_sample_size for s in self.sets], dtype=np.int64)
+
+    def _from_table(self, table: SetTable) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # 只收子表實際出現的裝備；ids 已靠左排列，位次 = 欄位索引 + 1
+        cols, slot = np.nonzero(table.ids >= 0)
+        used, rows = np.unique(table.ids[cols, slot], return_inverse=True)
+        self.item_id = {table.names[k]: i for i, k in enumerate(used.tolist())}
+        return rows, cols, slot + 1
+
+    def __len__(self) -> int:
+        return len(self.sets)
+
+    def row(self, name) -> np.ndarray:
+        """單件裝備的 set mask；未出現過的名稱（含 NaN）回傳全 False。"""
+        i = self.item_id.get(name)
+        if i is None:
+            return np.zeros(len(self.sets), dtype=bool)
+        return self.member[i]
+
+    def mask(self, names: Iterable[str]) -> np.ndarray:
+        """包含全部 names 的套裝 mask；names 為空時全為 True。"""
+        out = np.ones(len(self.sets), dtype=bool)
+        for name in names:
+            out &= self.row(name)
+        return out
+
+    def subset(self, mask: np.ndarray) -> List[BuiltSet]:
+        return [self.sets[j] for j in np.flatnonzero(mask)]
+
+
+def _seq_sum(a: np.ndarray) -> float:
+    # 與 Python 內建 sum 相同的逐項累加順序（避免 pairwise 加總造成末位差異）
+    return sum(a.tolist())
+
+def support(selected: List[str], index: SetIndex) -> Tuple[float, np.ndarray]:
+    m = index.mask(selected)
+    K = max(len(index), 1)
+    return (int(np.count_nonzero(m)) / K, m)
+
+def cooccur_freq(names: List[str], index: SetIndex) -> Dict[str, float]:
+    K = max(len(index), 1)
+    return {name: int(np.count_nonzero(index.row(name))) / K for name in names}
+
+def sample_weight(names: List[str], index: SetIndex, eps: float = 1e-9) -> Dict[str, float]:
+    total_samples = int(index.samples.sum()) + eps
+    return {name: int(index.samples[index.row(name)].sum()) / total_samples for name in names}
+
+def mean_win(mask: np.ndarray, index: SetIndex) -> float:
+    return np.average(index.win[mask]) if mask.any() else 0.0
+
+def conditional_stats(selected4: List[str], names: List[str], index: SetIndex, eps: float = 1e-9) -> List[Tuple[str, float, float, float]]:
+    """回傳 [(name, 條件 pick, 條件 win, lift)]，語意同 algo._conditional_choice。"""
+    cond = index.mask(selected4)
+    if not cond.any() and len(index):
+        cond = np.ones(len(index), dtype=bool)  # 回退
+    pick_c, win_c = index.pick[cond], index.win[cond]
+    total_pick = _seq_sum(pick_c) + eps
+    stats = []
+    for name in names:
+        has = index.row(name)[cond]
+        pick = _seq_sum(pick_c[has]) / total_pick
+        win_with = np.average(win_c[has]) if has.any() else 0.0
+        win_without = np.average(win_c[~has]) if (~has).any() else 0.0
+        lift = (win_with + eps) / (win_without + eps)
+        stats.append((name, pick, win_with, lift))
+    return stats
+
+def order_by_position(final_items: List[str], index: SetIndex, eps: float = 1e-9) -> List[str]:
+    m = index.mask(final_items)
+    if not m.any():
+        return final_items[:]
+    in_m = m[index.occ_set]
+    avg_pos = {}
+    for it in final_items:
+        # 權重按出現次數累加，與 algo._order_by_position 的逐列掃描相同
+        occ = in_m & (index.occ_item == index.item_id[it])
+        pick = index.pick[index.occ_set[occ]]
+        avg_pos[it] = _seq_sum(index.occ_pos[occ] * pick) / max(_seq_sum(pick), eps)
+    return sorted(final_items, key=lambda x: avg_pos.get(x, 999.0))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+離線預先計算的套裝統計（*.stats.npz）。
+
+每個 sets 檔一份，內容只有 pick_build 會用到的 top-K 套裝（已依 samples、pick 排好序的 SetTable 欄位）：
+pick_build / exact 直接取用，不必讀全部套裝、排序與截斷 —— 建置時間只與 K 有關。
+支撐度需要 4 件同時出現，無法由兩兩共現等彙總還原，所以只存 top-K 列本身。
+
+用法：
+  python -m src.set_stats --glob "data/raw/*_sets.csv" --topk 50 --cover 0.8        # 旁檔 *_sets.stats.npz
+"""
+from __future__ import annotations
+import argparse, glob, json, os
+from typing import Optional
+import numpy as np
+from .columnar import read_table, parquet_for
+from .set_table import SetTable
+
+STATS_SUFFIX = ".stats.npz"
+DEF_TOPK = 50
+DEF_COVER = 0.80
+
+
+def stats_path(sets_csv: str) -> str:
+    """data/raw/x_sets.csv → data/raw/x_sets.stats.npz"""
+    return os.path.splitext(sets_csv)[0] + STATS_SUFFIX
+
+
+class SetStats:
+    __slots__ = ("top", "topk", "cover", "n_sets")
+
+    def __init__(self, top: SetTable, topk: int, cover: float, n_sets: int):
+        self.top = top
+        self.topk = int(topk)
+        self.cover = float(cover)
+        self.n_sets = int(n_sets)
+
+    @classmethod
+    def build(cls, table: SetTable, topk: int = DEF_TOPK, cover: float = DEF_COVER) -> "SetStats":
+        return cls(table.top_k(topk, cover), topk, cover, len(table))
+
+    def __len__(self) -> int:
+        return self.n_sets
+
+    def matches(self, topk: int, cover: float) -> bool:
+        return self.topk == int(topk) and self.cover == float(cover)
+
+    def save(self, path: str) -> None:
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        meta = {"topk": self.topk, "cover": self.cover, "n_sets": self.n_sets}
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp, meta=np.array(json.dumps(meta)),
+            top_names=np.array(self.top.names, dtype=str), top_ids=self.top.ids, top_win=self.top.win,
+            top_pick=self.top.pick, top_samples=self.top.samples,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SetStats":
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            top = SetTable(z["top_names"].tolist(), z["top_ids"], z["top_win"], z["top_pick"], z["top_samples"])
+            return cls(top, meta["topk"], meta["cover"], meta["n_sets"])
+
+
+def stats_for(sets_csv: str, topk: int, cover: float) -> Optional[SetStats]:
+    """sets 旁的統計檔：存在、不比來源舊且 topk/cover 相符才回傳。"""
+    p = stats_path(sets_csv)
+    src = parquet_for(sets_csv) or sets_csv
+    if not os.path.exists(p):
+        return None
+    if os.path.exists(src) and os.path.getmtime(p) < os.path.getmtime(src):
+        return None
+    try:
+        st = SetStats.load(p)
+    except (OSError, ValueError, KeyError):
+        return None
+    return st if st.matches(topk, cover) else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="precompute the top-K sets pick_build reads")
+    ap.add_argument("--glob", dest="sets_glob", required=True, help='per-hero sets, e.g. "data/raw/*_sets.csv"（輸出旁檔 *.stats.npz）')
+    ap.add_argument("--topk", type=int, default=DEF_TOPK)
+    ap.add_argument("--cover", type=float, default=DEF_COVER)
+    args = ap.parse_args()
+
+    targets = {stats_path(p): SetTable.from_frame(read_table(p)) for p in sorted(glob.glob(args.sets_glob))}
+    if not targets:
+        raise SystemExit("[error] no sets found")
+    for path, table in targets.items():
+        st = SetStats.build(table, args.topk, args.cover)
+        st.save(path)
+        print(f"[ok] {path}: sets={len(table)} top={len(st.top)}")
+
+
+if __name__ == "__main__":
+    main()
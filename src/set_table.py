@@ -0,0 +1,94 @@
+from __future__ import annotations
+from typing import Iterator, List, Sequence
+import numpy as np
+import pandas as pd
+from .io_schema import BuiltSet
+
+def top_k_order(samples: np.ndarray, pick: np.ndarray, K: int, cover: float) -> np.ndarray:
+    """依 (samples, pick) 穩定降冪排序，回傳累計 pick 達 cover 或滿 K 為止的列索引。"""
+    order = np.lexsort((-np.asarray(pick, dtype=float), -np.asarray(samples, dtype=np.int64)))
+    cum = np.cumsum(np.asarray(pick, dtype=float)[order])
+    # 累計最大值單調不減，可用 searchsorted 找第一個 >= cover 的位置；NaN 之後不再觸發截止（同逐列累加）
+    n = int(np.searchsorted(np.fmax.accumulate(np.nan_to_num(cum, nan=-np.inf)), cover, side="left")) + 1
+    return order[:min(n, max(K, 1), len(order))]
+
+
+class SetTable:
+    """struct-of-arrays 的套裝表：裝備名只存一份詞彙表，每套以 int16 id 表示。
+
+    ids 為 [n, width]（width ≥ 5），每列靠左排列、不足補 -1；位次即欄位索引 + 1，
+    與 BuiltSet.items（去掉空名稱後的順序）一致。勝率/選用率維持 float64，
+    讓 pick_build 的結果與 List[BuiltSet] 路徑逐位元相同。
+    """
+    __slots__ = ("names", "ids", "win", "pick", "samples")
+
+    def __init__(self, names: Sequence[str], ids: np.ndarray, win: np.ndarray, pick: np.ndarray, samples: np.ndarray):
+        self.names = list(names)
+        self.ids = ids
+        self.win = win
+        self.pick = pick
+        self.samples = samples
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SetTable":
+        """由 sets 表建立：有 item1..5 欄直接取用，否則把 items 的 | 字串一次展開。"""
+        name_cols = [f"item{i}" for i in range(1, 6)]
+        if all(c in df.columns for c in name_cols):
+            wide = df[name_cols].astype(object)
+        else:
+            wide = df["items"].astype(str).str.split("|", expand=True)
+        flat = pd.Series(wide.to_numpy(dtype=object).ravel(), dtype=object).str.strip()
+        codes, vocab = pd.factorize(flat.where(flat != ""))  # 空名稱 / NaN → -1
+        ids = codes.reshape(len(df), -1) if len(df) else np.zeros((0, 5), dtype=np.int64)
+        # 去掉空名稱後靠左排列（穩定排序，保留原順序）
+        ids = np.take_along_axis(ids, np.argsort(ids < 0, axis=1, kind="stable"), axis=1)
+        width = max(5, ids.shape[1])
+        ids = np.pad(ids, ((0, 0), (0, width - ids.shape[1])), constant_values=-1).astype(np.int16)
+        return cls(
+            list(vocab), ids,
+            df["set_win_rate"].to_numpy(dtype=float),
+            df["set_pick_rate"].to_numpy(dtype=float),
+            df["set_sample_size"].to_numpy(dtype=np.int64).astype(np.int32),
+        )
+
+    @classmethod
+    def from_sets(cls, sets: Sequence[BuiltSet]) -> "SetTable":
+        vocab: dict = {}
+        width = max([5] + [len(s.items) for s in sets])
+        ids = np.full((len(sets), width), -1, dtype=np.int16)
+        for j, s in enumerate(sets):
+            ids[j, :len(s.items)] = [vocab.setdefault(it, len(vocab)) for it in s.items]
+        return cls(
+            list(vocab), ids,
+            np.array([s.set_win_rate for s in sets], dtype=float),
+            np.array([s.set_pick_rate for s in sets], dtype=float),
+            np.array([s.set_sample_size for s in sets], dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.win)
+
+    def items_of(self, j: int) -> List[str]:
+        return [self.names[k] for k in self.ids[j] if k >= 0]
+
+    def __getitem__(self, j: int) -> BuiltSet:
+        return BuiltSet(items=self.items_of(j), set_win_rate=float(self.win[j]),
+                        set_pick_rate=float(self.pick[j]), set_sample_size=int(self.samples[j]))
+
+    def __iter__(self) -> Iterator[BuiltSet]:
+        return (self[j] for j in range(len(self)))
+
+    def take(self, idx: np.ndarray) -> "SetTable":
+        """依列索引取子表（共用詞彙表）。"""
+        return SetTable(self.names, self.ids[idx], self.win[idx], self.pick[idx], self.samples[idx])
+
+    def top_k(self, K: int, cover: float) -> "SetTable":
+        """依 (samples, pick) 穩定降冪，累計 pick 達 cover 或滿 K 即停（語意同 algo._topK_sets 的 list 路徑）。"""
+        return self.take(top_k_order(self.samples, self.pick, K, cover))
+
+    def to_sets(self) -> List[BuiltSet]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.win.nbytes + self.pick.nbytes + self.samples.nbytes
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+輕量分段計時（span）。
+
+    tracer = Tracer("data/raw/_trace.jsonl", hero="varus")
+    with tracer.span("topk", sets=len(sets)) as rec:
+        ...
+        rec["kept"] = n          # 區塊內可補上計數
+
+每個 span 結束時記錄 {"span", ...context, ...attrs, "ms"}；有 path 時同時 append 一行 JSON。
+未傳 tracer 的呼叫端使用 NULL_TRACER，不計時也不留紀錄。
+"""
+from __future__ import annotations
+import datetime, json, os, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer:
+    def __init__(self, path: Optional[str] = None, **context: Any):
+        self.path = path
+        self.context = context
+        self.spans: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        rec: Dict[str, Any] = {"span": name, **self.context, **attrs}
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["ms"] = round((time.perf_counter() - t0) * 1e3, 3)
+            self.spans.append(rec)
+            if self.path:
+                write_jsonl(self.path, [rec])
+
+    def child(self, **context: Any) -> "Tracer":
+        """共用紀錄與輸出檔、另加 context 欄位（例如同一行程內多名英雄）。"""
+        t = Tracer(self.path, **{**self.context, **context})
+        t.spans = self.spans
+        return t
+
+    def totals(self) -> Dict[str, float]:
+        """各 span 名稱的累計毫秒數。"""
+        out: Dict[str, float] = {}
+        for r in self.spans:
+            out[r["span"]] = round(out.get(r["span"], 0.0) + r["ms"], 3)
+        return out
+
+
+class _NullTracer(Tracer):
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        yield {}
+
+    def child(self, **context: Any) -> "Tracer":
+        return self
+
+
+NULL_TRACER = _NullTracer()
+
+
+def write_jsonl(path: str, records: List[Dict[str, Any]]) -> None:
+    d = os.path.dirname(os.path.abspath(path))
+    if d:
+        os.makedirs(d, exist_ok=True)
+    ts = datetime.datetime.now().astimezone().isoformat()
+    with open(path, "a", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps({"ts": ts, **r}, ensure_ascii=False, default=str) + "\n")
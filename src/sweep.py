@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+參數掃描：對多組 英雄/模式/分段/視窗 以 topk × cover × 門檻下限的網格跑 pick_build，回報各設定的穩定度與耗時。
+
+- 每組只載入一次 winning/sets；同一組 (topk, cover) 的 top-K 索引只建一次，供所有門檻組合共用；
+- 各組之間以 process pool 平行（workers<=1 時於本行程內執行）；
+- 結果與彙總以 (hero, mode, tier, window) 區分，同一英雄的不同分段/視窗不會互相覆蓋；
+- 穩定度：與該組全網格最常出現的裝備組合（consensus）相同的比例、對 consensus 的平均 Jaccard，
+  以及只差一個參數一格的相鄰設定之間的平均 Jaccard（越高代表結果對該參數越不敏感）。
+
+用法：
+  python -m src.sweep --glob "data/raw/*_sets.csv" --topk 20 50 100 --cover 0.5 0.8 100 --support-floor 0.15 0.25 0.35
+  python -m src.sweep --manifest heroes.csv --out outputs/_sweep.json --csv outputs/_sweep.csv --workers 4
+"""
+from __future__ import annotations
+import argparse, csv, itertools, os, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Optional, Sequence, Tuple
+from . import set_index as sx
+from .algo import DEFAULT_THRESHOLDS, Thresholds, _resolve_top_sets, load_set_table, load_winning_items, pick_build
+from .io_schema import WinningItem
+from .pipeline import BatchJob, _write_json, discover_jobs, read_manifest
+from .set_table import SetTable
+
+TH_FIELDS = [f.name for f in fields(Thresholds)]
+PARAMS = ["topk", "cover"] + TH_FIELDS
+JOB_FIELDS = ["hero", "mode", "tier", "window"]
+ROW_FIELDS = JOB_FIELDS + PARAMS + ["top_sets", "ms", "order"]
+JobKey = Tuple[str, str, str, str]
+
+
+@dataclass(frozen=True)
+class GridPoint:
+    topk: int
+    cover: float
+    thresholds: Thresholds = DEFAULT_THRESHOLDS
+
+    def params(self) -> Dict:
+        return {"topk": self.topk, "cover": self.cover, **asdict(self.thresholds)}
+
+
+def make_grid(topks: Sequence[int], covers: Sequence[float], **floors: Sequence[float]) -> List[GridPoint]:
+    """floors 的鍵為 Thresholds 欄位；未給的欄位沿用預設值。"""
+    axes = [list(floors.get(k) or [getattr(DEFAULT_THRESHOLDS, k)]) for k in TH_FIELDS]
+    return [GridPoint(k, c, Thresholds(*th)) for k, c in itertools.product(topks, covers)
+            for th in itertools.product(*axes)]
+
+
+def job_key(d) -> JobKey:
+    """BatchJob 或結果列 → (hero, mode, tier, window)。"""
+    get = d.get if isinstance(d, dict) else lambda k: getattr(d, k)
+    return tuple(get(k) for k in JOB_FIELDS)
+
+
+def job_label(key: JobKey) -> str:
+    return "/".join("" if v is None else str(v) for v in key)
+
+
+def _time_ms(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, (time.perf_counter() - t0) * 1e3)
+    return out, best
+
+
+def sweep_one(task: Tuple[JobKey, List[WinningItem], SetTable, List[GridPoint], int]) -> Dict:
+    """單一 英雄/模式/分段/視窗 跑完整個網格；回傳逐點結果與各 (topk, cover) 的建索引耗時。"""
+    key, winning, table, grid, repeat = task
+    job = dict(zip(JOB_FIELDS, key))
+    if not winning or not len(table):
+        return {**job, "status": "empty", "rows": [], "index_ms": {}}
+    try:
+        indexes: Dict[Tuple[int, float], sx.SetIndex] = {}
+        index_ms: Dict[str, float] = {}
+        rows = []
+        for gp in grid:
+            ik = (gp.topk, gp.cover)
+            if ik not in indexes:
+                indexes[ik], ms = _time_ms(lambda: sx.SetIndex(_resolve_top_sets(table, gp.topk, gp.cover)), 1)
+                index_ms[f"{gp.topk}/{gp.cover}"] = round(ms, 4)
+            index = indexes[ik]
+            result, ms = _time_ms(lambda: pick_build(winning, table, topk=gp.topk, cover=gp.cover,
+                                                     thresholds=gp.thresholds, top_index=index), repeat)
+            rows.append({**job, **gp.params(), "top_sets": len(index), "ms": round(ms, 4),
+                         "order": result.order})
+    except Exception as e:
+        return {**job, "status": "error", "error": repr(e), "rows": [], "index_ms": {}}
+    return {**job, "status": "ok", "rows": rows, "index_ms": index_ms}
+
+
+def _jaccard(a: Sequence[str], b: Sequence[str]) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _neighbors(grid: List[GridPoint]) -> Dict[int, List[int]]:
+    """只差一個參數、且在該軸上相鄰一格的網格點。"""
+    axes = {p: sorted({gp.params()[p] for gp in grid}) for p in PARAMS}
+    pos = {i: {p: axes[p].index(gp.params()[p]) for p in PARAMS} for i, gp in enumerate(grid)}
+    by_pos = {tuple(v[p] for p in PARAMS): i for i, v in pos.items()}
+    out: Dict[int, List[int]] = {}
+    for i, v in pos.items():
+        out[i] = []
+        for p in PARAMS:
+            for d in (-1, 1):
+                j = by_pos.get(tuple(v[q] + (d if q == p else 0) for q in PARAMS))
+                if j is not None:
+                    out[i].append(j)
+    return out
+
+
+def stability(grid: List[GridPoint], rows: List[Dict]) -> List[Dict]:
+    """依網格點彙總各組：consensus 相同比例、對 consensus 的 Jaccard、相鄰設定 Jaccard 與耗時。"""
+    by_job: Dict[JobKey, Dict[int, List[str]]] = {}
+    ms: Dict[int, List[float]] = {}
+    index_of = {gp: i for i, gp in enumerate(grid)}
+    for r in rows:
+        i = index_of[GridPoint(r["topk"], r["cover"], Thresholds(*(r[k] for k in TH_FIELDS)))]
+        by_job.setdefault(job_key(r), {})[i] = r["order"]
+        ms.setdefault(i, []).append(r["ms"])
+    consensus = {k: Counter(frozenset(o) for o in builds.values()).most_common(1)[0][0]
+                 for k, builds in by_job.items()}
+    nbrs = _neighbors(grid)
+    out = []
+    for i, gp in enumerate(grid):
+        agree, jac, nj = [], [], []
+        for k, builds in by_job.items():
+            if i not in builds:
+                continue
+            agree.append(float(frozenset(builds[i]) == consensus[k]))
+            jac.append(_jaccard(builds[i], consensus[k]))
+            nj += [_jaccard(builds[i], builds[j]) for j in nbrs[i] if j in builds]
+        mean = lambda xs: round(sum(xs) / len(xs), 4) if xs else None
+        out.append({**gp.params(), "jobs": len(agree), "consensus_rate": mean(agree),
+                    "consensus_jaccard": mean(jac), "neighbor_jaccard": mean(nj),
+                    "mean_ms": mean(ms.get(i, [])), "max_ms": round(max(ms[i]), 4) if ms.get(i) else None})
+    return out
+
+
+def run_sweep(jobs: List[BatchJob], grid: List[GridPoint], *, workers: int = 0, repeat: int = 3,
+              out_json: Optional[str] = None, out_csv: Optional[str] = None) -> Dict:
+    t0 = time.perf_counter()
+    tasks = [(job_key(j), load_winning_items(j.winning_csv), load_set_table(j.sets_csv), grid, repeat) for j in jobs]
+    t_load = time.perf_counter() - t0
+    workers = workers or (os.cpu_count() or 1)
+    if workers <= 1 or len(tasks) <= 1:
+        results = [sweep_one(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+            results = list(ex.map(sweep_one, tasks))
+    rows = [r for res in results for r in res["rows"]]
+    settings = stability(grid, rows)
+    summary = {
+        "grid": {p: sorted({gp.params()[p] for gp in grid}) for p in PARAMS},
+        "points": len(grid),
+        "jobs": {job_label(job_key(res)): {k: v for k, v in res.items() if k != "rows"} for res in results},
+        "settings": sorted(settings, key=lambda s: (-(s["neighbor_jaccard"] or 0), -(s["consensus_rate"] or 0),
+                                                    s["mean_ms"] or 0)),
+        "load_s": round(t_load, 4),
+        "total_s": round(time.perf_counter() - t0, 4),
+    }
+    if out_json:
+        _write_json(out_json, summary)
+    if out_csv:
+        os.makedirs(os.path.dirname(os.path.abspath(out_csv)), exist_ok=True)
+        with open(out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=ROW_FIELDS)
+            w.writeheader()
+            for r in rows:
+                w.writerow({**r, "order": "|".join(map(str, r["order"]))})
+    summary["rows"] = rows
+    return summary
+
+
+def main():
+    d = DEFAULT_THRESHOLDS
+    ap = argparse.ArgumentParser(description="grid-search pick_build parameters over many champions")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--glob", dest="sets_glob", help='e.g. "data/raw/*_sets.csv"')
+    src.add_argument("--manifest", help="CSV with columns hero,winning,sets[,mode,tier,window,out]")
+    ap.add_argument("--topk", type=int, nargs="+", default=[50])
+    ap.add_argument("--cover", type=float, nargs="+", default=[0.80])
+    ap.add_argument("--pick-floor", type=float, nargs="+", default=[d.pick_floor], help="PickCut = max(P50, x)")
+    ap.add_argument("--tau-floor", type=float, nargs="+", default=[d.tau_floor], help="Tau = max(median cooccur, x)")
+    ap.add_argument("--support-floor", type=float, nargs="+", default=[d.support_floor], help="SupportCut = max(x, median support)")
+    ap.add_argument("--lift-min", type=float, nargs="+", default=[d.lift_min], help="accept-by-lift threshold")
+    ap.add_argument("--repeat", type=int, default=3, help="timing: best of N pick_build calls per point")
+    ap.add_argument("--workers", type=int, default=0, help="0 = os.cpu_count()")
+    ap.add_argument("--out", default="outputs/_sweep.json")
+    ap.add_argument("--csv", default=None, help="also write one row per hero/mode/tier/window x grid point")
+    ap.add_argument("--show", type=int, default=10, help="print the N most stable settings")
+    args = ap.parse_args()
+
+    jobs = read_manifest(args.manifest) if args.manifest else discover_jobs(args.sets_glob)
+    if not jobs:
+        raise SystemExit("[error] no winning/sets pairs found")
+    grid = make_grid(args.topk, args.cover, pick_floor=args.pick_floor, tau_floor=args.tau_floor,
+                     support_floor=args.support_floor, lift_min=args.lift_min)
+    summary = run_sweep(jobs, grid, workers=args.workers, repeat=args.repeat, out_json=args.out, out_csv=args.csv)
+    for label, res in summary["jobs"].items():
+        if res["status"] != "ok":
+            print(f"[warn] {label}: {res['status']} {res.get('error', '')}".rstrip())
+    for s in summary["settings"][:args.show]:
+        p = " ".join(f"{k}={s[k]}" for k in PARAMS)
+        print(f"[info] {p}  consensus={s['consensus_rate']} neighbor_j={s['neighbor_jaccard']} mean={s['mean_ms']}ms")
+    print(f"[ok] sweep: jobs={len(jobs)} points={summary['points']} load={summary['load_s']}s "
+          f"total={summary['total_s']}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
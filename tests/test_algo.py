@@ -1,4 +1,77 @@
-from src.algo import BuildResult
+import shutil
+import pytest
+from src.algo import BuildResult, load_winning_items, load_built_sets, load_set_table, load_sets, pick_build
+from src.algo import _order_by_position
+from src.io_schema import BuiltSet
+from src.set_index import SetIndex
+from src.set_stats import SetStats, stats_path
+from src.set_table import SetTable
+
+VARUS_WIN = "data/processed/varus_aram_winning.csv"
+VARUS_SETS = "data/processed/varus_aram_sets.csv"
 
 def test_placeholder():
     assert True
+
+def test_set_index_matches_list_scan():
+    winning, sets = load_winning_items(VARUS_WIN), load_built_sets(VARUS_SETS)
+    for topk, cover in [(50, 0.80), (400, 100.0), (20, 5.0)]:
+        scan = pick_build(winning, sets, explain=True, topk=topk, cover=cover, use_index=False)
+        indexed = pick_build(winning, sets, explain=True, topk=topk, cover=cover, use_index=True)
+        assert repr(scan) == repr(indexed)
+    # 同一套內重複的裝備（例如兩件都退回同一名稱）：位次權重逐次出現累加
+    dup = [BuiltSet(["A", "B", "C", "D", "A"], 0.5, 1.0, 10), BuiltSet(["B", "A", "C", "D", "E"], 0.5, 1.0, 10),
+           BuiltSet(["C", "A", "B", "D", "E"], 0.5, 0.3, 10)]
+    final = ["A", "B", "C", "D"]
+    want = _order_by_position(final, dup)
+    assert want == ["B", "A", "C", "D"]
+    assert _order_by_position(final, SetIndex(dup)) == want
+    assert _order_by_position(final, SetIndex(SetTable.from_sets(dup))) == want
+
+def test_set_table_matches_built_sets():
+    winning, sets, table = load_winning_items(VARUS_WIN), load_built_sets(VARUS_SETS), load_set_table(VARUS_SETS)
+    assert table.to_sets() == sets
+    for topk, cover in [(50, 0.80), (400, 100.0)]:
+        want = repr(pick_build(winning, sets, explain=True, topk=topk, cover=cover))
+        assert repr(pick_build(winning, table, explain=True, topk=topk, cover=cover)) == want
+
+def test_precomputed_stats_match_set_table(tmp_path):
+    sets_csv = str(tmp_path / "varus_sets.csv")
+    shutil.copy(VARUS_SETS, sets_csv)
+    winning, table = load_winning_items(VARUS_WIN), load_set_table(sets_csv)
+    SetStats.build(table, 50, 0.80).save(stats_path(sets_csv))
+    stats = load_sets(sets_csv, 50, 0.80)
+    assert isinstance(stats, SetStats)
+    assert repr(pick_build(winning, stats, explain=True)) == repr(pick_build(winning, table, explain=True))
+    with pytest.raises(ValueError):
+        pick_build(winning, stats, topk=400)
+    assert len(stats) == len(table) and len(stats.top) < len(table)
+    assert not isinstance(load_sets(sets_csv, 400, 100.0), SetStats)  # 參數不符就讀整張表
+
+def test_exact_search_matches_brute_force():
+    import itertools
+    from src import set_index as sx
+    from src.algo import _dynamic_candidates, _topK_sets
+    from src.exact_search import ComboScorer, _pool, pick_build_exact
+    winning, table = load_winning_items(VARUS_WIN), load_set_table(VARUS_SETS)
+    C0, _ = _dynamic_candidates(winning)
+    scorer = ComboScorer(_pool(winning, C0, 12), sx.SetIndex(_topK_sets(table, K=400, cover=100.0)))
+    found, stats = scorer.search(5)
+    brute = sorted(((scorer.score(c)[0], c) for c in itertools.combinations(range(len(scorer.names)), 5)), reverse=True)[:5]
+    assert [s for s, _ in found] == pytest.approx([s for s, _ in brute])
+    assert found[0][1] == brute[0][1]
+    assert stats["evaluated"] < len(list(itertools.combinations(range(len(scorer.names)), 5)))
+    result = pick_build_exact(winning, table, explain=True, topk=400, cover=100.0, top_n=3)
+    alts = result.rationale["alternatives"]
+    assert len(result.order) == 5 and len(alts) == 3 and alts[0]["order"] == result.order
+    assert alts[0]["score"] >= alts[1]["score"] >= alts[2]["score"]
+
+def test_numpy_ranking_matches_pandas():
+    import numpy as np
+    import pandas as pd
+    from src.algo import _rank_desc, _topK_sets
+    x = np.array([0.3, 0.1, 0.3, 0.2, 0.1, 0.3])
+    assert _rank_desc(x).tolist() == pd.Series(x).rank(ascending=False, method="average").tolist()
+    sets, table = load_built_sets(VARUS_SETS), load_set_table(VARUS_SETS)
+    for K, cover in [(50, 0.80), (400, 100.0), (0, 5.0)]:
+        assert _topK_sets(sets, K, cover) == table.top_k(K, cover).to_sets()
@@ -0,0 +1,40 @@
+import shutil
+import pandas as pd
+import pytest
+from src.backtest import discover_snapshots, pair_snapshots, run_backtest, score_build
+from src.set_table import SetTable
+
+VARUS_WIN = "data/processed/varus_aram_winning.csv"
+VARUS_SETS = "data/processed/varus_aram_sets.csv"
+
+def test_score_build_against_later_sets():
+    later = SetTable.from_frame(pd.DataFrame({
+        "items": ["a|b|c|d|e", "e|d|c|b|a", "a|b|c|d|x", "x|y|z|w|v"],
+        "set_win_rate": [60.0, 50.0, 40.0, 50.0], "set_pick_rate": [1.0, 1.0, 1.0, 1.0],
+        "set_sample_size": [10, 30, 20, 40],
+    }))
+    s = score_build(["a", "b", "c", "d", "e"], later)
+    assert (s["exact_sets"], s["exact_games"], s["near_games"]) == (2, 40, 60)
+    assert s["exact_win"] == pytest.approx(52.5) and s["base_win"] == pytest.approx(49.0)
+    assert s["exact_lift"] == pytest.approx(3.5) and s["top_jaccard"] == 0.0
+
+def test_backtest_pairs_consecutive_snapshots(tmp_path):
+    root = tmp_path / "snapshots"
+    for d in ("2026-10-15", "2026-10-01", "2026-10-08", "notes"):
+        (root / d).mkdir(parents=True)
+    for d in ("2026-10-01", "2026-10-08", "2026-10-15"):
+        for h in ("varus", "lux"):
+            shutil.copy(VARUS_SETS, root / d / f"{h}_aram_d2_plus_7d_sets.csv")
+            shutil.copy(VARUS_WIN, root / d / f"{h}_aram_d2_plus_7d_winning.csv")
+    pairs = pair_snapshots(discover_snapshots(str(root)))
+    assert [(p.train.hero, p.train.stamp, p.test.stamp) for p in pairs][:2] == [
+        ("lux", "2026-10-01", "2026-10-08"), ("lux", "2026-10-08", "2026-10-15")]
+    out = str(tmp_path / "bt.csv")
+    rows, _ = run_backtest(str(root), workers=1, out=out, label="greedy")
+    assert len(rows) == 4 and all(r["status"] == "ok" for r in rows)
+    _, summary = run_backtest(str(root), engine="exact", topk=400, cover=100.0, workers=1, out=out,
+                              append=True, label="exact")
+    assert summary["label"].tolist() == ["greedy", "exact"] and summary["pairs"].tolist() == [4, 4]
+    assert len(pd.read_csv(out)) == 8
+    run_backtest(str(root), workers=1, out=out, append=True, label="greedy")  # 同參數重跑取代舊列
+    assert len(pd.read_csv(out)) == 8
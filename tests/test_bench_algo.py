@@ -0,0 +1,111 @@
+"""pick_build 各階段與載入器的 benchmark（pytest-benchmark）。
+
+預設不跑 benchmark（pytest.ini: -m "not bench"）；正確性檢查則每次都跑。
+  pytest -m bench --benchmark-storage=tests/benchmarks --benchmark-compare --benchmark-compare-fail=min:25%
+  pytest -m bench --benchmark-storage=tests/benchmarks --benchmark-save=baseline   # 更新基準
+"""
+import pytest
+from scripts.gen_synthetic import synthetic_frames, write_roster
+from src import algo
+from src import set_index as sx
+
+try:
+    import pytest_benchmark  # noqa: F401
+    HAVE_BENCH = True
+except ImportError:
+    HAVE_BENCH = False
+
+def bench(fn):
+    return pytest.mark.bench(pytest.mark.skipif(not HAVE_BENCH, reason="pytest-benchmark not installed")(fn))
+
+VARUS_WIN = "data/processed/varus_aram_winning.csv"
+VARUS_SETS = "data/processed/varus_aram_sets.csv"
+SCALES = {"5k": 5_000, "100k": 100_000}
+ROSTER = 170
+ROSTER_SETS = 2_000
+
+# ---- 正確性（bundled varus fixture） ----
+
+@pytest.mark.parametrize("topk,cover,order", [
+    (50, 0.80, ["魔劍正宗", "夜色緣界", "nan", "席利妲咒怨", "蒐集者"]),
+    (400, 100.0, ["魔劍正宗", "nan", "席利妲咒怨", "蒐集者", "殞落王者之劍"]),
+])
+def test_varus_golden_order(topk, cover, order):
+    winning = algo.load_winning_items(VARUS_WIN)
+    for sets in (algo.load_built_sets(VARUS_SETS), algo.load_set_table(VARUS_SETS)):
+        for use_index in (True, False):
+            res = algo.pick_build(winning, sets, topk=topk, cover=cover, use_index=use_index)
+            assert [str(x) for x in res.order] == order
+
+# ---- 合成資料 ----
+
+@pytest.fixture(scope="module", params=list(SCALES))
+def scale(request, tmp_path_factory):
+    n = SCALES[request.param]
+    win_df, sets_df = synthetic_frames(n, 200, seed=n)
+    d = tmp_path_factory.mktemp(f"syn{request.param}")
+    win_csv, sets_csv = str(d / "winning.csv"), str(d / "sets.csv")
+    win_df.to_csv(win_csv, index=False); sets_df.to_csv(sets_csv, index=False)
+    winning = algo.load_winning_items(win_csv)
+    table = algo.load_set_table(sets_csv)
+    # 全部套裝都進入後續階段，量測最壞情況
+    top = algo._topK_sets(table, K=n, cover=float("inf"))
+    C0, _ = algo._dynamic_candidates(winning)
+    return dict(n=n, win_csv=win_csv, sets_csv=sets_csv, winning=winning, table=table,
+                sets=table.to_sets(), index=sx.SetIndex(top), C0=C0)
+
+@bench
+@pytest.mark.parametrize("loader", ["load_winning_items", "load_built_sets", "load_set_table"])
+def test_bench_loader(benchmark, scale, loader):
+    path = scale["win_csv"] if loader == "load_winning_items" else scale["sets_csv"]
+    benchmark(getattr(algo, loader), path)
+
+@bench
+def test_bench_dynamic_candidates(benchmark, scale):
+    benchmark(algo._dynamic_candidates, scale["winning"])
+
+@bench
+@pytest.mark.parametrize("kind", ["list", "table"])
+def test_bench_topk(benchmark, scale, kind):
+    benchmark(algo._topK_sets, scale["sets"] if kind == "list" else scale["table"], K=50, cover=0.80)
+
+@bench
+def test_bench_set_index(benchmark, scale):
+    benchmark(sx.SetIndex, scale["table"])
+
+@bench
+def test_bench_cooccur(benchmark, scale):
+    benchmark(algo._cooccur_freq, scale["C0"], scale["index"])
+
+@bench
+def test_bench_support(benchmark, scale):
+    names = [w.name for w in scale["C0"][:4]]
+    benchmark(algo._support, names, scale["index"])
+
+@bench
+def test_bench_conditional_choice(benchmark, scale):
+    C0 = scale["C0"]
+    benchmark(algo._conditional_choice, [w.name for w in C0[:2]], C0[2:], scale["index"])
+
+@bench
+def test_bench_order_by_position(benchmark, scale):
+    names = [w.name for w in scale["C0"][:2]]
+    benchmark(algo._order_by_position, names, scale["index"])
+
+@bench
+@pytest.mark.parametrize("kind", ["list", "table"])
+def test_bench_pick_build(benchmark, scale, kind):
+    sets = scale["sets"] if kind == "list" else scale["table"]
+    benchmark(algo.pick_build, scale["winning"], sets, explain=True, topk=scale["n"], cover=float("inf"))
+
+@bench
+def test_bench_roster(benchmark, tmp_path_factory):
+    d = tmp_path_factory.mktemp("roster")
+    heroes = write_roster(str(d), ROSTER, ROSTER_SETS)
+
+    def run_all():
+        for h in heroes:
+            stem = str(d / f"{h}_aram_d2_plus_7d")
+            algo.pick_build(algo.load_winning_items(stem + "_winning.csv"), algo.load_set_table(stem + "_sets.csv"))
+
+    benchmark.pedantic(run_all, rounds=1, iterations=1)
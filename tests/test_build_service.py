@@ -0,0 +1,55 @@
+import asyncio, os, shutil
+from src.algo import load_winning_items, load_set_table, pick_build
+from src.build_service import BuildService, dataset_key
+
+VARUS_WIN = "data/processed/varus_aram_winning.csv"
+VARUS_SETS = "data/processed/varus_aram_sets.csv"
+
+def test_dataset_key_forms():
+    assert dataset_key("varus_aram_d2_plus_7d_sets.csv") == ("varus", "aram", "d2_plus", "7")
+    assert dataset_key("varus_aram_sets.csv")[:2] == ("varus", "aram")
+    assert dataset_key("varus_aram_winning.csv") is None
+
+def test_service_caches_and_reloads(tmp_path):
+    shutil.copy(VARUS_WIN, tmp_path / "varus_aram_d2_plus_7d_winning.csv")
+    shutil.copy(VARUS_SETS, tmp_path / "varus_aram_d2_plus_7d_sets.csv")
+    svc = BuildService(str(tmp_path), cache_size=2)
+    assert svc.reload() == [("varus", "aram", "d2_plus", "7")]
+    want = pick_build(load_winning_items(VARUS_WIN), load_set_table(VARUS_SETS), topk=50, cover=0.8)
+
+    async def go():
+        target = "/build?champion=Varus&mode=aram&tier=d2_plus&patch=7d&topk=50&cover=0.8"
+        (s1, b1), (s2, b2) = await asyncio.gather(svc.handle("GET", target), svc.handle("GET", target))
+        assert s1 == s2 == 200 and b1["build"]["order"] == want.order and b1["build"]["boots"] == want.boots
+        assert svc.misses == 1 and svc.hits == 1  # 並發的相同查詢只算一次
+        assert (await svc.handle("GET", target))[1]["cached"]
+        assert (await svc.handle("GET", "/build?champion=lux"))[0] == 404
+        assert (await svc.handle("GET", "/build?champion=varus&topk=x"))[0] == 400
+
+        sets_csv = str(tmp_path / "varus_aram_d2_plus_7d_sets.csv")
+        st = os.stat(sets_csv)
+        os.utime(sets_csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert svc.reload() == [("varus", "aram", "d2_plus", "7")] and not svc.cache
+        assert not (await svc.handle("GET", target))[1]["cached"]
+        assert svc.reload() == []  # 未變動不重讀
+
+    asyncio.run(go())
+
+def test_cancelled_originator_does_not_cancel_joined_request(tmp_path):
+    shutil.copy(VARUS_WIN, tmp_path / "varus_aram_d2_plus_7d_winning.csv")
+    shutil.copy(VARUS_SETS, tmp_path / "varus_aram_d2_plus_7d_sets.csv")
+    svc = BuildService(str(tmp_path))
+    svc.reload()
+    key = ("varus", "aram", "d2_plus", "7")
+
+    async def go():
+        first = asyncio.ensure_future(svc.build(key))
+        await asyncio.sleep(0)  # 讓 first 先發起計算
+        second = asyncio.ensure_future(svc.build(key))
+        await asyncio.sleep(0)
+        first.cancel()  # 發起者斷線
+        payload, joined = await second
+        assert joined and first.cancelled()
+        assert (await svc.build(key)) == (payload, True) and not svc._inflight
+
+    asyncio.run(go())
@@ -0,0 +1,45 @@
+import os, shutil
+import pandas as pd
+import pytest
+from src.algo import load_built_sets, load_winning_items
+from src.columnar import SetsChunkWriter
+from src.scrape_lolalytics import _set_digest, write_outputs
+
+pytest.importorskip("pyarrow")
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "processed")
+
+def test_parquet_sidecar_loads_same_as_csv(tmp_path):
+    win_csv, sets_csv = str(tmp_path / "varus_winning.csv"), str(tmp_path / "varus_sets.csv")
+    shutil.copy(os.path.join(DATA, "varus_aram_winning.csv"), win_csv)
+    shutil.copy(os.path.join(DATA, "varus_aram_sets.csv"), sets_csv)
+    want_win, want_sets = load_winning_items(win_csv), load_built_sets(sets_csv)
+
+    write_outputs(pd.read_csv(win_csv), pd.read_csv(sets_csv), win_csv, sets_csv, "parquet")
+    pq_sets = pd.read_parquet(str(tmp_path / "varus_sets.parquet"))
+    assert str(pq_sets["item_id1"].dtype) == "Int32" and pq_sets["item_id2"].notna().all()
+
+    os.remove(win_csv); os.remove(sets_csv)  # 只剩 parquet 時仍可用原 CSV 路徑讀取
+    assert load_winning_items(win_csv) == want_win
+    assert load_built_sets(sets_csv) == want_sets
+
+def test_sets_chunk_writer_matches_full_write(tmp_path):
+    sets = pd.read_csv(os.path.join(DATA, "varus_aram_sets.csv"))
+    full, streamed = str(tmp_path / "full_sets.csv"), str(tmp_path / "stream_sets.csv")
+    write_outputs(pd.DataFrame(), sets, str(tmp_path / "w.csv"), full, "both")
+    with SetsChunkWriter(streamed, "both", chunk_rows=37) as w:
+        for row in sets.to_dict("records"):
+            w.append(row)
+    assert w.rows == len(sets)
+    assert pd.read_csv(streamed).equals(pd.read_csv(full))
+    assert pd.read_parquet(str(tmp_path / "stream_sets.parquet")).equals(pd.read_parquet(str(tmp_path / "full_sets.parquet")))
+
+    with SetsChunkWriter(str(tmp_path / "none_sets.csv"), "both"):
+        pass  # 沒有任何列也要留下含表頭的檔案
+    assert list(pd.read_csv(str(tmp_path / "none_sets.csv")).columns) == list(sets.columns)
+
+def test_set_digest_keys_on_item_ids():
+    imgs = [f"https://cdn5.lolalytics.com/item64/{i}.webp" for i in (3153, 3046, 3085, 3031, 3036)]
+    assert _set_digest(["a"] * 5, imgs) == _set_digest(["b"] * 5, imgs)
+    assert _set_digest(["a"] * 5, imgs) != _set_digest(["a"] * 5, imgs[::-1])
+    assert _set_digest(list("abcde"), [""] * 5) != _set_digest(list("abcdf"), [""] * 5)
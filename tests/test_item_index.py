@@ -0,0 +1,56 @@
+import os, shutil, subprocess, sys
+import pandas as pd
+from src.fix_boots import pick_boot_from_winning
+from src.item_index import ItemIndex, load_item_history, load_item_index, read_items_map_version, snapshot_path
+
+REF = "data/ref"
+
+def _copy_ref(tmp_path):
+    for name in ("items_map.csv", "item_aliases.csv", "items_map_meta.json"):
+        shutil.copy(os.path.join(REF, name), tmp_path / name)
+    return str(tmp_path / "items_map.csv"), str(tmp_path / "item_aliases.csv")
+
+def test_snapshot_matches_sources_and_tracks_changes(tmp_path):
+    items_map, aliases = _copy_ref(tmp_path)
+    fresh = ItemIndex.from_files(items_map, aliases)
+    snap = load_item_index(items_map, aliases)
+    assert os.path.exists(snapshot_path(items_map)) and snapshot_path(items_map).endswith("items_index_15.19.1.pkl")
+    assert snap._state() == fresh._state()
+    assert load_item_index(items_map, aliases) is snap  # 同一行程內重用
+    assert snap.find("3006")[1] == "Berserker's Greaves" and snap.find("BOOTS")[0] == 1001
+
+    with open(aliases, "a", encoding="utf-8") as f:
+        f.write("狂戰士,,3006\n")
+    changed = load_item_index(items_map, aliases)
+    assert changed is not snap and changed.find("狂戰士")[0] == 3006
+
+def test_fix_boots_uses_item_tags(tmp_path):
+    win = tmp_path / "w.csv"
+    pd.DataFrame({"name": ["鞋子", "鬼蟹", "狂戰士護脛", "無盡之刃"],
+                  "pick_rate": [0.9, 0.5, 0.3, 0.8], "win_rate": [0.5, 0.5, 0.5, 0.5]}).to_csv(win, index=False)
+    assert pick_boot_from_winning(win) == "狂戰士護脛"  # 名稱比對認不出「鬼蟹」
+    assert pick_boot_from_winning(win, load_item_index(*_copy_ref(tmp_path))) == "鬼蟹"
+
+def test_find_en_matches_the_old_linear_lookup(tmp_path):
+    items_map, aliases = _copy_ref(tmp_path)
+    idx = load_item_index(items_map, aliases)
+    m = pd.read_csv(items_map, dtype={"item_id": int, "en_name": str, "zh_tw_name": str})
+    for tok in ["3006", "berserker's greaves", "BERSERKER'S GREAVES", "狂戰士護脛", "boots", "Berserkers Greaves"]:
+        hit = m[m["item_id"] == int(tok)] if tok.isdigit() else m[m["en_name"].str.lower() == tok.lower()]
+        want = int(hit.iloc[0]["item_id"]) if len(hit) else None
+        assert (idx.find_en(tok) or (None,))[0] == want, tok
+    assert idx.find_en("Berserker's Greaves")[0] == 3006  # 同名（如 ARAM 223006）取第一筆
+
+def test_history_resolves_by_patch_and_date(tmp_path):
+    subprocess.run([sys.executable, "scripts/build_items_map.py", "--offline", "--all-versions",
+                    "--dump-dir", "tests/fixtures/ddragon", "--out", str(tmp_path / "items_map.csv")],
+                   check=True, capture_output=True)
+    hist = load_item_history(str(tmp_path), None)
+    assert hist.versions == ["15.18.1", "15.19.1"] and read_items_map_version(str(tmp_path / "items_map.csv")) == "15.19.1"
+    assert len(hist.intervals[3006]) == 1 and len(hist.intervals[3153]) == 2  # 未改名者只佔一段
+    assert hist.version_for(patch="15.18") == "15.18.1" and hist.version_for(patch="16.1") == "15.19.1"
+    assert hist.version_for(date="2025-09-20") == "15.18.1" and hist.version_for(date="2025-10-01") == "15.19.1"
+    assert hist.item(3153, "15.18.1")[1] == "破敗王者之刃" and hist.item(6701, "15.18.1") is None
+    old, new = hist.at("15.18.1"), hist.at("15.19.1")
+    assert old.find("破敗王者之刃")[0] == 3153 and new.find("破敗王者之刃") is None and new.find("機會")[0] == 6701
+    assert new._state() == ItemIndex.from_files(str(tmp_path / "items_map.csv"), None)._state()
@@ -0,0 +1,38 @@
+from src.lolalytics_payload import parse_winning, parse_sets_5
+
+NAMES = {3031: "無盡之刃", 3094: "疾射火砲", 3046: "幻影之舞", 3072: "飲血劍", 3036: "多米尼克爵士", 6676: "蒐集者"}
+
+def test_parse_winning_from_nested_payload():
+    payload = {"data": {"winning": [{"id": iid, "wr": 55.5, "pr": 12.0, "n": 100} for iid in NAMES]}}
+    df = parse_winning([{"unrelated": [1, 2, 3]}, payload], NAMES)
+    assert list(df.columns) == ["img", "name", "win_rate", "pick_rate", "sample_size"]
+    assert len(df) == len(NAMES)
+    assert df.iloc[0]["name"] == "無盡之刃" and df.iloc[0]["win_rate"] == 0.555
+    assert df.iloc[0]["img"].endswith("/item64/3031.webp")
+
+def test_parse_sets_from_keyed_payload_stops_after_small_sample():
+    sets = {
+        "3031_3094_3046_3072_3036": [58.1, 3.2, 120],
+        "3094_3031_3046_3072_6676": [52.0, 1.0, 40],
+        "2003_3031_3046_3072_6676": [50.0, 1.0, 30],
+        "3031_3094_3072_3046_6676": [40.0, 0.1, 1],
+        "3031_3094_3036_3046_6676": [40.0, 0.1, 1],
+    }
+    df = parse_sets_5([{"a_5": sets}], NAMES)
+    assert df["set_sample_size"].tolist() == [120, 40, 1]
+    assert df.iloc[0]["items"] == "無盡之刃|疾射火砲|幻影之舞|飲血劍|多米尼克爵士"
+
+def test_parse_sets_honors_min_games_and_top_n():
+    sets = {
+        "3031_3094_3046_3072_3036": [58.1, 3.2, 120],
+        "3094_3031_3046_3072_6676": [52.0, 1.0, 40],
+        "3031_3094_3072_3046_6676": [45.0, 0.4, 8],
+        "3031_3094_3036_3046_6676": [40.0, 0.1, 1],
+    }
+    assert parse_sets_5([{"a_5": sets}], NAMES, min_games=50)["set_sample_size"].tolist() == [120, 40]
+    assert parse_sets_5([{"a_5": sets}], NAMES, top_n=2)["set_sample_size"].tolist() == [120, 40]
+    assert parse_sets_5([{"a_5": sets}], NAMES, min_games=0)["set_sample_size"].tolist() == [120, 40, 8, 1]
+
+def test_unrecognized_payload_yields_empty_tables():
+    assert parse_winning([{"x": 1}], NAMES).empty
+    assert parse_sets_5([[1, 2, 3]], NAMES).empty
@@ -0,0 +1,34 @@
+import filecmp, os, shutil, subprocess, sys
+
+FIXTURE = "tests/fixtures/normalize"
+
+def _run(raw, out, workers, *extra):
+    subprocess.run([sys.executable, "scripts/normalize_outputs_batch.py", "--in-dir", str(raw), "--out-dir", str(out),
+                    "--workers", str(workers), *extra], check=True, capture_output=True)
+
+def test_process_pool_matches_sequential(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    for h in ("varus", "lux", "jinx"):
+        shutil.copy("data/processed/varus_aram_sets.csv", raw / f"{h}_aram_d2_plus_7d_sets.csv")
+        shutil.copy("data/samples/winning_items.sample.csv", raw / f"{h}_aram_d2_plus_7d_winning.csv")
+    _run(raw, tmp_path / "seq", 1)
+    _run(raw, tmp_path / "pool", 3)
+    names = ["all_sets_normalized.csv", "all_winning_normalized.csv", "_audit_items_missing.csv", "_audit_rates.csv",
+             "lux/sets_normalized.csv", "varus/winning_normalized.csv"]
+    match, mismatch, errors = filecmp.cmpfiles(tmp_path / "seq", tmp_path / "pool", names, shallow=False)
+    assert match == names, (mismatch, errors)
+    assert (tmp_path / "pool" / "all_sets_normalized.csv").read_text(encoding="utf-8").count("source_file,") == 1
+
+def test_fixture_matches_frozen_outputs(tmp_path):
+    # 邊界：缺 id / 查無此物、NaN 儲存格、中文名與別名、"1,234" 與 "55.2%"、無 tier 的檔名、單欄套裝字串
+    # expected/ 由改寫前（逐列 iterrows）的版本產生；兩種執行方式都必須逐位元組相同
+    ref = tmp_path / "ref"
+    shutil.copytree(os.path.join(FIXTURE, "ref"), ref)  # 快照 .pkl 寫在 items_map 旁，不弄髒 fixture
+    expected = os.path.join(FIXTURE, "expected")
+    names = sorted(os.path.relpath(os.path.join(d, f), expected) for d, _, fs in os.walk(expected) for f in fs)
+    for workers in (1, 2):
+        out = tmp_path / f"out{workers}"
+        _run(os.path.join(FIXTURE, "raw"), out, workers, "--format", "csv",
+             "--items-map", str(ref / "items_map.csv"), "--item-aliases", str(ref / "item_aliases.csv"))
+        match, mismatch, errors = filecmp.cmpfiles(expected, out, names, shallow=False)
+        assert match == names, (workers, mismatch, errors)
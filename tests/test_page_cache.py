@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+from src.page_cache import PageCache
+from src.scrape_lolalytics import ScrapeOptions, scrape, _build_url
+
+WIN = pd.DataFrame([{"img": "https://cdn5.lolalytics.com/item64/3031.webp", "name": "無盡之刃", "win_rate": 0.55, "pick_rate": 0.1, "sample_size": 0}])
+SETS = pd.DataFrame([{"items": "a|b|c|d|e", "items_img": "1|2|3|4|5", "set_win_rate": 58.1, "set_pick_rate": 3.2, "set_sample_size": 120}])
+
+def test_offline_replay_rebuilds_tables_without_browser(tmp_path):
+    cache = PageCache(str(tmp_path), ttl_s=0)
+    url = _build_url("varus", "aram", "d2_plus", "7", "zh_tw")
+    cache.put(url, WIN, SETS)
+    assert cache.get(url) is None  # ttl=0：一般模式視為過期
+    win_df, sets_df, got = scrape("varus", "aram", "d2_plus", "7", "zh_tw", opts=ScrapeOptions(cache=cache, offline=True))
+    assert got == url
+    pd.testing.assert_frame_equal(win_df, WIN)
+    pd.testing.assert_frame_equal(sets_df, SETS)
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path), ttl_s=3600, max_mb=1)
+    for i in range(3):
+        cache.put(f"u{i}", WIN, SETS)
+        os.utime(cache._path(f"u{i}"), (i, i))
+    assert cache.get("u0") is not None  # 命中後變成最近使用
+    # 壓縮後大小會因時間戳不同差幾個位元組，上限取 u0 + u2 的實際大小
+    cache.max_bytes = os.path.getsize(cache._path("u0")) + os.path.getsize(cache._path("u2"))
+    assert cache.evict() == 1
+    assert cache.get("u1") is None and cache.get("u0") is not None and cache.get("u2") is not None
+
+def test_scrape_many_keeps_going_when_on_result_fails(tmp_path):
+    import asyncio
+    from src.scrape_lolalytics import scrape_many
+    cache = PageCache(str(tmp_path), ttl_s=0)
+    for h in ("lux", "varus"):
+        cache.put(_build_url(h, "aram", "d2_plus", "7", "zh_tw"), WIN, SETS)
+    written = []
+
+    def on_result(hero, win_df, sets_df, url):
+        if hero == "lux":
+            raise OSError("disk full")
+        written.append(hero)
+
+    results = asyncio.run(scrape_many(["lux", "varus"], "aram", "d2_plus", "7", "zh_tw",
+                                      opts=ScrapeOptions(cache=cache, offline=True), on_result=on_result))
+    assert isinstance(results["lux"], OSError) and written == ["varus"]
+    assert results["varus"][2] == _build_url("varus", "aram", "d2_plus", "7", "zh_tw")
+
+def test_truncated_sets_are_not_replayed_as_complete(tmp_path, monkeypatch):
+    import src.scrape_lolalytics as sl
+    full = pd.concat([SETS] * 12, ignore_index=True).assign(set_sample_size=range(120, 0, -10))
+    cache = PageCache(str(tmp_path), ttl_s=3600)
+    url = _build_url("varus", "aram", "d2_plus", "7", "zh_tw")
+    cache.put(url, WIN, full.head(5), top_n=5)  # 先前的 --top-n 5 執行寫入的快取
+    fetched = []
+
+    async def fake_scrape(hero, mode, tier, patch, lang, opts):
+        fetched.append(opts.top_n)
+        return WIN, full, url
+    monkeypatch.setattr(sl, "_scrape_async", fake_scrape)
+
+    assert len(scrape("varus", "aram", "d2_plus", "7", "zh_tw", opts=ScrapeOptions(cache=cache, top_n=3))[1]) == 3
+    assert fetched == []  # 較小的 top_n 可由快取截斷取得
+    _, sets_df, _ = scrape("varus", "aram", "d2_plus", "7", "zh_tw", opts=ScrapeOptions(cache=cache))
+    assert fetched == [0] and len(sets_df) == 12  # 不限列數的要求不可拿截短的快取
+    cache.put(url, WIN, full)
+    _, sets_df, _ = scrape("varus", "aram", "d2_plus", "7", "zh_tw", opts=ScrapeOptions(cache=cache, min_games=50))
+    assert fetched == [0] and sets_df["set_sample_size"].tolist() == [120, 110, 100, 90, 80, 70, 60, 50, 40]
@@ -0,0 +1,77 @@
+import json, shutil
+import pytest
+from src.pipeline import discover_jobs, read_manifest, run, run_batch
+
+def test_run_batch_writes_outputs_and_summary(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    for h in ("varus", "lux"):
+        shutil.copy("data/processed/varus_aram_sets.csv", raw / f"{h}_aram_d2_plus_7d_sets.csv")
+        shutil.copy("data/processed/varus_aram_winning.csv", raw / f"{h}_aram_d2_plus_7d_winning.csv")
+    out = tmp_path / "outputs"
+    jobs = discover_jobs(str(raw / "*_sets.csv"), str(out))
+    assert [j.hero for j in jobs] == ["lux", "varus"]
+    summary = run_batch(jobs, explain=False, topk=50, cover=0.8, workers=1, summary_json=str(out / "_batch_summary.json"))
+    assert summary["counts"]["ok"] == 2
+    data = json.loads((out / "varus_aram_7d.json").read_text(encoding="utf-8"))
+    assert data["spec"] == {"mode": "ARAM", "tier": "d2_plus", "window": "7d"}
+    assert len(data["build"]["order"]) == 5
+
+def test_run_batch_trace_records_stages(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    shutil.copy("data/processed/varus_aram_sets.csv", raw / "varus_aram_d2_plus_7d_sets.csv")
+    shutil.copy("data/processed/varus_aram_winning.csv", raw / "varus_aram_d2_plus_7d_winning.csv")
+    trace = tmp_path / "trace.jsonl"
+    summary = run_batch(discover_jobs(str(raw / "*_sets.csv"), str(tmp_path / "out")), explain=False,
+                        topk=400, cover=100.0, workers=1, trace=str(trace))
+    spans = [json.loads(line) for line in trace.read_text(encoding="utf-8").splitlines()]
+    assert [s["span"] for s in spans] == ["load", "candidates", "topk", "index", "cooccur", "expansion", "conditional", "ordering"]
+    assert all(s["hero"] == "varus" and s["ms"] >= 0 for s in spans)
+    assert set(summary["stages_ms"]) == {s["span"] for s in spans}
+
+def test_run_batch_skips_unchanged_inputs(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    for h in ("varus", "lux"):
+        shutil.copy("data/processed/varus_aram_sets.csv", raw / f"{h}_aram_d2_plus_7d_sets.csv")
+        shutil.copy("data/processed/varus_aram_winning.csv", raw / f"{h}_aram_d2_plus_7d_winning.csv")
+    jobs = discover_jobs(str(raw / "*_sets.csv"), str(tmp_path / "out"))
+    kw = dict(explain=False, topk=50, cover=0.8, workers=1)
+    assert run_batch(jobs, **kw)["counts"]["ok"] == 2
+    assert run_batch(jobs, **kw)["counts"]["skipped"] == 2
+    with open(raw / "lux_aram_d2_plus_7d_sets.csv", "a", encoding="utf-8") as f:
+        f.write("a|b|c|d|e,,50.0,0.01,3\n")
+    counts = run_batch(jobs, **kw)["counts"]
+    assert (counts["ok"], counts["skipped"]) == (1, 1)
+    assert run_batch(jobs, **{**kw, "topk": 40})["counts"]["ok"] == 2
+
+def test_run_batch_rejects_tiers_sharing_an_output(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    for tier in ("all", "d2_plus"):
+        shutil.copy("data/processed/varus_aram_sets.csv", raw / f"varus_aram_{tier}_7d_sets.csv")
+        shutil.copy("data/processed/varus_aram_winning.csv", raw / f"varus_aram_{tier}_7d_winning.csv")
+    out = tmp_path / "out"
+    jobs = discover_jobs(str(raw / "*_sets.csv"), str(out))
+    assert len({j.out_json for j in jobs}) == 1
+    with pytest.raises(ValueError, match="duplicate output"):
+        run_batch(jobs, explain=False, topk=50, cover=0.8, workers=1)
+    assert not out.exists()
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("hero,winning,sets,tier,out\n" + "".join(
+        f"varus,{raw}/varus_aram_{t}_7d_winning.csv,{raw}/varus_aram_{t}_7d_sets.csv,{t},{out}/varus_aram_{t}_7d.json\n"
+        for t in ("all", "d2_plus")), encoding="utf-8")
+    summary = run_batch(read_manifest(str(manifest), str(out)), explain=False, topk=50, cover=0.8, workers=1)
+    assert summary["counts"]["ok"] == 2
+    assert sorted(p.name for p in out.glob("varus_*.json")) == ["varus_aram_all_7d.json", "varus_aram_d2_plus_7d.json"]
+
+def test_single_and_batch_runs_share_manifest_keys(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    shutil.copy("data/processed/varus_aram_sets.csv", raw / "varus_aram_d2_plus_7d_sets.csv")
+    shutil.copy("data/processed/varus_aram_winning.csv", raw / "varus_aram_d2_plus_7d_winning.csv")
+    jobs = discover_jobs(str(raw / "*_sets.csv"), str(tmp_path / "out"))
+    job = jobs[0]
+    kw = dict(explain=False, topk=50, cover=0.8)
+    summary = run_batch(jobs, workers=1, **kw)
+    assert summary["counts"]["ok"] == 1 and summary["params"]["engine"] == "greedy"
+    assert not run(job.winning_csv, job.sets_csv, job.out_json, **kw)  # src.main 視 batch 的產出為最新
+    assert run(job.winning_csv, job.sets_csv, job.out_json, force=True, **kw)
+    assert run_batch(jobs, workers=1, **kw)["counts"]["skipped"] == 1
+    assert run(job.winning_csv, job.sets_csv, job.out_json, engine="exact", **kw)  # 引擎不同就重算
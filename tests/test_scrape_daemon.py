@@ -0,0 +1,63 @@
+import argparse, asyncio, os, socket, threading
+import pytest
+import pandas as pd
+import src.scrape_daemon as sd
+from src.scrape_daemon import ScrapeDaemon, daemon_request
+from src.scrape_lolalytics import ScrapeOptions, _build_url, _main_via_daemon
+
+WIN = pd.DataFrame([{"img": "https://cdn5.lolalytics.com/item64/3031.webp", "name": "無盡之刃", "win_rate": 0.55, "pick_rate": 0.1, "sample_size": 0}])
+SETS = pd.DataFrame([{"items": "a|b|c|d|e", "items_img": "1|2|3|4|5", "set_win_rate": 58.1, "set_pick_rate": 3.2, "set_sample_size": 120}])
+
+class FakeWarm:
+    """代替已暖機的瀏覽器：記下收到的工作、回傳固定表格。"""
+    opts = ScrapeOptions()
+
+    def __init__(self):
+        self.calls = []
+
+    async def scrape(self, hero, mode, tier, patch, lang, opts=None):
+        self.calls.append((hero, opts.top_n))
+        return WIN, SETS, _build_url(hero, mode, tier, patch, lang)
+
+    def stats(self):
+        return {"zh_tw": 1}
+
+def test_daemon_serves_jobs_over_socket(tmp_path):
+    warm = FakeWarm()
+    daemon = ScrapeDaemon(warm)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(daemon._on_conn, "127.0.0.1", 0))
+    addr = "127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    try:
+        win_out, sets_out = str(tmp_path / "w.csv"), str(tmp_path / "s.csv")
+        for _ in range(2):  # 同一個 daemon 連續處理多個工作
+            resp = daemon_request(addr, {"hero": "varus", "winning_out": win_out, "sets_out": sets_out, "top_n": 7})
+            assert resp["ok"] and resp["winning"] == 1 and resp["sets"] == 1
+        assert warm.calls == [("varus", 7), ("varus", 7)]
+        pd.testing.assert_frame_equal(pd.read_csv(sets_out), SETS)
+        assert daemon_request(addr, {"hero": "varus"})["error"] == "missing winning_out, sets_out"
+        assert daemon_request(addr, {"cmd": "ping"})["jobs"] == 2
+    finally:
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+
+def test_cli_falls_back_only_when_daemon_refuses(monkeypatch):
+    args = argparse.Namespace(daemon="127.0.0.1:1", hero="varus", mode="aram", tier="all", patch="30", lang="zh_tw",
+                              winning_out="w.csv", sets_out="out/s.csv", format="csv", stream_sets=False,
+                              min_games=0, top_n=None)
+    sent = []
+
+    def refuse(addr, job):
+        sent.append(job)
+        raise ConnectionRefusedError(111, "refused")
+    monkeypatch.setattr(sd, "daemon_request", refuse)
+    assert _main_via_daemon(args) is None  # 回到本機抓取
+    assert sent[0]["winning_out"] == os.path.abspath("w.csv") and sent[0]["sets_out"] == os.path.abspath("out/s.csv")
+
+    def hang(addr, job):
+        raise socket.timeout("timed out")
+    monkeypatch.setattr(sd, "daemon_request", hang)
+    with pytest.raises(SystemExit) as e:  # 服務可能仍在寫檔，不可再本機重抓
+        _main_via_daemon(args)
+    assert e.value.code == 1
@@ -0,0 +1,18 @@
+from src.scrape_ledger import JobLedger, job_key
+
+def test_ledger_skips_fresh_success_and_backs_off_failures(tmp_path):
+    win, sets = tmp_path / "w.csv", tmp_path / "s.csv"
+    win.write_text("name\na\n", encoding="utf-8"); sets.write_text("items\nx\ny\n", encoding="utf-8")
+    path = str(tmp_path / "ledger.jsonl")
+    ok_key, bad_key = job_key("Varus", "aram", "d2_plus", "7", "zh_tw"), job_key("lux", "aram", "d2_plus", "7", "zh_tw")
+    ledger = JobLedger(path)
+    ledger.record(ok_key, "ok", started_at="2026-01-01T00:00:00+00:00", outputs={"winning": str(win), "sets": str(sets)})
+    ledger.record(bad_key, "failed", started_at="2026-01-01T00:00:00+00:00", outputs={}, error="exit=1")
+
+    reloaded = JobLedger(path)
+    assert reloaded.get(ok_key)["rows"] == {"winning": 1, "sets": 2}
+    assert reloaded.pending([ok_key, bad_key], base=60) == {ok_key: "fresh", bad_key: "backoff"}
+    assert reloaded.pending([bad_key], base=0)[bad_key] == "todo"
+
+    sets.write_text("items\nchanged\n", encoding="utf-8")
+    assert not reloaded.is_fresh(ok_key)
@@ -0,0 +1,48 @@
+import json, shutil
+import pandas as pd
+from src.algo import Thresholds, load_set_table, load_winning_items, pick_build
+from src.pipeline import discover_jobs
+from src.sweep import job_key, make_grid, run_sweep
+
+VARUS_WIN = "data/processed/varus_aram_winning.csv"
+VARUS_SETS = "data/processed/varus_aram_sets.csv"
+
+def test_sweep_grid_matches_pick_build(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    for h in ("varus", "lux"):
+        shutil.copy("data/processed/varus_aram_sets.csv", raw / f"{h}_aram_d2_plus_7d_sets.csv")
+        shutil.copy("data/processed/varus_aram_winning.csv", raw / f"{h}_aram_d2_plus_7d_winning.csv")
+    grid = make_grid([50, 400], [0.8, 100.0], support_floor=[0.15, 0.35], lift_min=[1.0, 1.05])
+    assert len(grid) == 16
+    out = tmp_path / "sweep.json"
+    summary = run_sweep(discover_jobs(str(raw / "*_sets.csv")), grid, workers=1, repeat=1, out_json=str(out))
+    assert len(summary["rows"]) == 2 * 16
+    winning, table = load_winning_items(VARUS_WIN), load_set_table(VARUS_SETS)
+    for r in summary["rows"]:
+        th = Thresholds(r["pick_floor"], r["tau_floor"], r["support_floor"], r["lift_min"])
+        want = pick_build(winning, table, topk=r["topk"], cover=r["cover"], thresholds=th)
+        assert r["order"] == want.order
+    saved = json.loads(out.read_text(encoding="utf-8"))
+    assert len(saved["settings"]) == 16
+    for s in saved["settings"]:
+        assert s["jobs"] == 2 and s["consensus_rate"] in (0.0, 1.0)  # 兩英雄資料相同
+        assert 0.0 <= s["neighbor_jaccard"] <= 1.0 and s["mean_ms"] >= 0
+
+def test_sweep_keeps_tiers_and_windows_of_one_hero_apart(tmp_path):
+    raw = tmp_path / "raw"; raw.mkdir()
+    full = pd.read_csv(VARUS_SETS)
+    names = ["varus_aram_d2_plus_7d", "varus_aram_all_7d", "varus_aram_d2_plus_14d", "lux_aram_d2_plus_7d"]
+    for n, name in enumerate(names):
+        full.head(15 + 10 * n).to_csv(raw / f"{name}_sets.csv", index=False)  # 每組資料不同
+        shutil.copy(VARUS_WIN, raw / f"{name}_winning.csv")
+    grid = make_grid([50], [0.8, 100.0])
+    jobs = discover_jobs(str(raw / "*_sets.csv"))
+    summary = run_sweep(jobs, grid, workers=1, repeat=1)
+    assert sorted(summary["jobs"]) == sorted(["varus/aram/d2_plus/7d", "varus/aram/all/7d", "varus/aram/d2_plus/14d",
+                                              "lux/aram/d2_plus/7d"])
+    assert len(summary["rows"]) == 4 * 2 and all(s["jobs"] == 4 for s in summary["settings"])
+    winning = load_winning_items(VARUS_WIN)
+    by_key = {job_key(j): j for j in jobs}
+    for r in summary["rows"]:
+        want = pick_build(winning, load_set_table(by_key[job_key(r)].sets_csv), topk=r["topk"], cover=r["cover"])
+        assert r["order"] == want.order
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+from src.scrape_lolalytics import AssetSizeBook, TrafficStats, _asset_kind
+
+IMG = "https://cdn5.lolalytics.com/item64/3031.webp"
+FONT = "https://lolalytics.com/fonts/a.woff2"
+
+def test_blocked_savings_estimated_from_unblocked_run(tmp_path):
+    path = str(tmp_path / "asset_sizes.json")
+    assert _asset_kind(SimpleNamespace(resource_type="image", url=IMG)) == "image"
+    assert _asset_kind(SimpleNamespace(resource_type="xhr", url="https://a.lolalytics.com/x.json")) is None
+
+    before = TrafficStats(AssetSizeBook(path), blocking=True)
+    before.block("image", IMG)
+    assert before.savings() == {"bytes": None, "known": 0, "blocked": 1, "seconds": None}
+
+    # 不阻擋的一次：記下資源大小與載入耗時
+    off = TrafficStats(AssetSizeBook(path), blocking=False)
+    off.assets = {IMG: ("image", 3000), "https://cdn5.lolalytics.com/item64/1001.webp": ("image", 1000), FONT: ("font", 500)}
+    off.load_s = 4.0
+    off.learn()
+
+    on = TrafficStats(AssetSizeBook(path), blocking=True)
+    for kind, url in [("image", IMG), ("image", "https://cdn5.lolalytics.com/item64/9999.webp"), ("media", "https://x/v.mp4")]:
+        on.block(kind, url)
+    on.load_s = 1.5
+    sv = on.savings()
+    # 見過的 URL 用實際大小，沒見過的用同類型平均（2000），沒有類型紀錄的不計
+    assert sv["bytes"] == 3000 + 2000 and (sv["known"], sv["blocked"]) == (2, 3)
+    assert sv["seconds"] == 2.5
+    assert "saved=~4.9KB (2/3 sized) time_saved=~2.50s" in on.summary()